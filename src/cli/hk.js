@@ -11,6 +11,7 @@ const os = require('os');
 const XLSX = require('xlsx');
 const { DateTime } = require('luxon');
 const { nanoid } = require('nanoid');
+const { loadOrders } = require('../pdf/order_store');
 
 const IST = 'Asia/Kolkata';
 
@@ -102,12 +103,9 @@ function loadRefs(baseDir) {
   const locations = readOrInit('locations.json', defaults.locations);
   const tags = readOrInit('tags.json', defaults.tags);
 
-  // Optional: parsed order cache (email/PDF parsers). Used for Instamart/Blinkit-style breakdown.
-  const ordersParsed = (() => {
-    const fp = path.join(baseDir, 'orders_parsed.json');
-    if (!fs.existsSync(fp)) return null;
-    try { return JSON.parse(fs.readFileSync(fp, 'utf8')); } catch { return null; }
-  })();
+  // Optional: parsed orders (email/PDF parsers, via the order store). Used for the Instamart breakdown;
+  // null when there are none on disk.
+  const ordersParsed = loadOrders(baseDir, { merchants: ['SWIGGY_INSTAMART'] });
 
   return { refsDir, sources, aliases, merchants, mappings, locations, tags, ordersParsed };
 }
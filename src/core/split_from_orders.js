@@ -9,17 +9,19 @@
  *   - group_id kept (or generated) to tie them together.
  * - If item totals don't sum exactly, add a final "Other charges" row for the remainder.
  * - For Instamart: only split if ALL items can be categorized cleanly; otherwise keep original row intact.
+ * - PDF invoices whose items do not add up (validation.confidence < --min-confidence, from
+ *   hk_pdf/validate.py) are not split either; the row stays intact.
  *
  * Usage:
  *   node src/core/split_from_orders.js --base-dir ~/HisabKitab --file ~/HisabKitab/HK_2026-01-Week2.xlsx
  */
 
-const fs = require('fs');
 const path = require('path');
 const os = require('os');
 const XLSX = require('xlsx');
 const { DateTime } = require('luxon');
 const { nanoid } = require('nanoid');
+const { loadOrders } = require('../pdf/order_store');
 
 const IST = 'Asia/Kolkata';
 
@@ -28,26 +30,46 @@ function expandHome(p){
   return p.startsWith('~/') ? path.join(os.homedir(), p.slice(2)) : p;
 }
 
-function readJsonSafe(fp, fallback){
-  try { return JSON.parse(fs.readFileSync(fp,'utf8')); } catch { return fallback; }
-}
-
 function parseArgs(argv){
   const args = argv.slice(2);
   const get = (k) => { const i=args.indexOf(k); return i===-1?null:(args[i+1]||null); };
   return {
     baseDir: expandHome(get('--base-dir') || '~/HisabKitab'),
     file: expandHome(get('--file') || ''),
-    tol: Number(get('--tol') || 2)
+    tol: Number(get('--tol') || 2),
+    minConfidence: Number(get('--min-confidence') || 0.5)
   };
 }
 
-function amtClose(a,b,tol){
-  return Math.abs(Number(a) - Number(b)) <= tol;
+// Integer paise: PDF orders carry exact *_paise fields (hk_pdf/money.py); other amounts are rounded once.
+function toPaise(x){
+  return Math.round(Number(x) * 100);
+}
+
+function orderPaise(o){
+  return o.total_paise ?? toPaise(o.total);
+}
+
+// Orders without a validation (email parsers) are taken as they are.
+function lowConfidence(order, minConfidence){
+  const c = order.validation?.confidence;
+  return c != null && Number(c) < minConfidence;
 }
 
+// PDF parsers emit ISO invoice dates (hk_pdf/dates.py); older records and email
+// parsers may not, so other shapes go through Luxon once per distinct string.
+const ISO_DATE = /^\d{4}-\d{2}-\d{2}$/;
+const dateIsoMemo = new Map();
+
 function orderDateToISO(s){
   if(!s) return null;
+  s = String(s);
+  if (ISO_DATE.test(s)) return s;
+  if (!dateIsoMemo.has(s)) dateIsoMemo.set(s, parseDateToISO(s));
+  return dateIsoMemo.get(s);
+}
+
+function parseDateToISO(s){
   // Blinkit: 28-Jan-2026
   let dt = DateTime.fromFormat(String(s), 'dd-LLL-yyyy', { zone: IST });
   if(dt.isValid) return dt.toISODate();
@@ -82,7 +104,7 @@ function flattenItems(order){
         if(amt == null) continue;
         const n = cleanProductName(it.name);
         if(!n) continue;
-        out.push({ name: n, amount: Number(amt) });
+        out.push({ name: n, amount: Number(amt), paise: it.total_paise ?? toPaise(amt) });
       }
     }
     return out.filter(x => Number.isFinite(x.amount) && x.amount > 0);
@@ -96,7 +118,7 @@ function flattenItems(order){
       const n = cleanProductName(it.name);
       if (!n) continue;
       if (amt == null) continue;
-      out.push({ name: n, amount: Number(amt) });
+      out.push({ name: n, amount: Number(amt), paise: it.amount_paise ?? toPaise(amt) });
     }
     return out.filter(x => Number.isFinite(x.amount) && x.amount > 0);
   }
@@ -109,7 +131,7 @@ function flattenItems(order){
       const n = cleanProductName(it.name);
       if (!n) continue;
       if (amt == null) continue;
-      out.push({ name: n, amount: Number(amt) });
+      out.push({ name: n, amount: Number(amt), paise: it.amount_paise ?? toPaise(amt) });
     }
     return out.filter(x => Number.isFinite(x.amount) && x.amount > 0);
   }
@@ -122,7 +144,7 @@ function flattenItems(order){
       const n = cleanProductName(it.name);
       if (!n) continue;
       if (amt == null) continue;
-      out.push({ name: n, amount: Number(amt) });
+      out.push({ name: n, amount: Number(amt), paise: it.amount_paise ?? toPaise(amt) });
     }
     return out.filter(x => Number.isFinite(x.amount) && x.amount > 0);
   }
@@ -142,10 +164,16 @@ function pickOrdersForAmount(byDate, date, amt, tol){
     }
   } catch {}
 
-  // 1) exact match (single invoice)
+  // 1) single invoice: an exact paise match on any candidate date first, then within tol
+  const amtPaise = toPaise(amt);
+  const tolPaise = toPaise(tol);
+  for (const d of dates) {
+    const m = (byDate.get(d) || []).find(o => o.total != null && orderPaise(o) === amtPaise);
+    if (m) return { orders: [m], matchedDate: d, mode: 'single' };
+  }
   for (const d of dates) {
     const cand = (byDate.get(d) || []).filter(o => o.total != null);
-    const m = cand.find(o => amtClose(o.total, amt, tol));
+    const m = cand.find(o => Math.abs(orderPaise(o) - amtPaise) <= tolPaise);
     if (m) return { orders: [m], matchedDate: d, mode: 'single' };
   }
 
@@ -156,19 +184,22 @@ function pickOrdersForAmount(byDate, date, amt, tol){
     // small N, brute force
     const n = Math.min(same.length, 12);
     const arr = same.slice(0, n);
+    const paise = arr.map(orderPaise);
     for (let mask = 1; mask < (1 << n); mask++) {
       let sum = 0;
       const picked = [];
       for (let i = 0; i < n; i++) {
         if (mask & (1 << i)) {
-          sum += Number(arr[i].total);
+          sum += paise[i];
           picked.push(arr[i]);
         }
       }
-      if (amtClose(sum, amt, tol)) {
-        // prefer fewer invoices; then prefer exact-date match
-        if (!best || picked.length < best.orders.length || (picked.length === best.orders.length && d === dateIso)) {
-          best = { orders: picked, matchedDate: d, mode: 'subset' };
+      const off = Math.abs(sum - amtPaise);
+      if (off <= tolPaise) {
+        // prefer an exact sum; then fewer invoices; then exact-date match
+        const exact = off === 0;
+        if (!best || (exact && !best.exact) || (exact === best.exact && (picked.length < best.orders.length || (picked.length === best.orders.length && d === dateIso)))) {
+          best = { orders: picked, matchedDate: d, mode: 'subset', exact };
         }
       }
     }
@@ -194,11 +225,11 @@ function categorizeInstamartItem(name){
   return null;
 }
 
-function splitWorkbook(filePath, baseDir, tol){
-  const ordersPath = path.join(baseDir, 'orders_parsed.json');
-  const ordersDoc = readJsonSafe(ordersPath, { orders: [] });
+function splitWorkbook(filePath, baseDir, tol, minConfidence = 0.5){
+  const merchants = ['BLINKIT','AMAZON','SWIGGY','ZOMATO','SWIGGY_INSTAMART'];
+  const ordersDoc = loadOrders(baseDir, { merchants }) || { orders: [] };
   const orders = (ordersDoc.orders || [])
-    .filter(o => ['BLINKIT','AMAZON','SWIGGY','ZOMATO','SWIGGY_INSTAMART'].includes(String(o.merchant||'').toUpperCase()));
+    .filter(o => merchants.includes(String(o.merchant||'').toUpperCase()));
 
   const byDate = new Map();
   for(const o of orders){
@@ -217,6 +248,7 @@ function splitWorkbook(filePath, baseDir, tol){
     : (wb.SheetNames.filter(isMonthlySheetName).length ? wb.SheetNames.filter(isMonthlySheetName) : [wb.SheetNames[0]]);
 
   let changed = 0;
+  let lowConfidenceSkipped = 0;
   let totalIn = 0;
   let totalOut = 0;
 
@@ -258,6 +290,7 @@ function splitWorkbook(filePath, baseDir, tol){
 
       const picked = pickOrdersForAmount(byDate, date, amt, tol);
       if (!picked || !picked.orders || !picked.orders.length) { out.push(r); continue; }
+      if (picked.orders.some(o => lowConfidence(o, minConfidence))) { lowConfidenceSkipped++; out.push(r); continue; }
 
       // Combine items across one or more invoices/orders
       let items = [];
@@ -277,7 +310,7 @@ function splitWorkbook(filePath, baseDir, tol){
       }
 
       const groupId = r[kGroupId] ? String(r[kGroupId]) : nanoid();
-      const sum = items.reduce((s, x) => s + (Number(x.amount) || 0), 0);
+      const sumPaise = items.reduce((s, x) => s + (Number.isFinite(x.paise) ? x.paise : 0), 0);
 
       for (const it of (categorized || items)) {
         out.push({
@@ -295,13 +328,13 @@ function splitWorkbook(filePath, baseDir, tol){
         });
       }
 
-      const diff = Number(amt) - Number(sum);
-      if (Number.isFinite(diff) && Math.abs(diff) > tol) {
+      const diff = toPaise(amt) - sumPaise;
+      if (Number.isFinite(diff) && Math.abs(diff) > toPaise(tol)) {
         out.push({
           ...r,
           [kTxnId]: nanoid(),
           [kGroupId]: groupId,
-          [kAmount]: Math.round(diff * 100) / 100,
+          [kAmount]: diff / 100,
           [kRaw]: `Other charges (${mc})`,
           [kNotes]: (String(r[kRaw] || '') + ' | remainder').slice(0, 300),
           [kParseStatus]: 'split_from_invoice',
@@ -323,16 +356,16 @@ function splitWorkbook(filePath, baseDir, tol){
 
   XLSX.writeFile(wb, filePath);
 
-  return { rows: totalIn, outRows: totalOut, changed, ordersUsed: changed, ordersTotal: orders.length, sheetsProcessed: sheets.length };
+  return { rows: totalIn, outRows: totalOut, changed, ordersUsed: changed, ordersTotal: orders.length, lowConfidenceSkipped, sheetsProcessed: sheets.length };
 }
 
 function main(){
-  const { baseDir, file, tol } = parseArgs(process.argv);
+  const { baseDir, file, tol, minConfidence } = parseArgs(process.argv);
   if(!file){
-    console.error('Usage: node split_from_orders.js --file <xlsx> [--base-dir ~/HisabKitab]');
+    console.error('Usage: node split_from_orders.js --file <xlsx> [--base-dir ~/HisabKitab] [--min-confidence 0.5]');
     process.exit(2);
   }
-  const res = splitWorkbook(file, baseDir, tol);
+  const res = splitWorkbook(file, baseDir, tol, minConfidence);
   process.stdout.write(JSON.stringify({ ok:true, file, ...res }, null, 2) + '\n');
 }
 
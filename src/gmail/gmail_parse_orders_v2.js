@@ -6,7 +6,8 @@
  *   - match (fromContains, subjectContains)
  *   - parser: { type: 'email'|'pdf', id: '...' }
  *
- * Output: ~/HisabKitab/orders_parsed.json
+ * Output: the order store (~/HisabKitab/orders_parsed.sqlite, src/pdf/hk_pdf/store.py), exported to
+ * ~/HisabKitab/orders_parsed.json; with HK_PDF_STORE=0 (or no python) the JSON file is merged directly
  *
  * Usage:
  *   node src/gmail/gmail_parse_orders_v2.js --base-dir ~/HisabKitab --label HisabKitab --max 500
@@ -17,6 +18,7 @@ const path = require('path');
 const os = require('os');
 const { google } = require('googleapis');
 const { getParser } = require('../parsers');
+const { ingestOrders } = require('../pdf/order_store');
 
 function expandHome(p){
   if(!p) return p;
@@ -118,25 +120,30 @@ function findPdfParts(payload){
   return out;
 }
 
-async function savePdfAttachments(gmail, baseDir, merchantKey, msgId, pdfParts){
+// Fetch each PDF attachment for parsing from memory. The copy under
+// <baseDir>/attachments is written in the background (await `archive` before
+// finishing); HK_PDF_ARCHIVE=0 skips it. pdfPath is the archive path either way.
+async function fetchPdfAttachments(gmail, baseDir, merchantKey, msgId, pdfParts, archive){
   const outDir = path.join(baseDir, 'attachments', merchantKey.toLowerCase(), msgId);
-  fs.mkdirSync(outDir, { recursive: true });
+  const keep = process.env.HK_PDF_ARCHIVE !== '0';
 
-  const saved = [];
+  const fetched = [];
   for(const p of pdfParts){
     const att = await gmail.users.messages.attachments.get({ userId:'me', messageId: msgId, id: p.attachmentId });
-    const data = att.data.data.replace(/-/g,'+').replace(/_/g,'/');
-    const buf = Buffer.from(data, 'base64');
+    const data = att.data.data;
     const rawName = p.filename || (merchantKey.toLowerCase() + '.pdf');
     const safeName = String(rawName)
       .replace(/[\\/]+/g, '_')
       .replace(/\s+/g, ' ')
       .trim();
-    const outPath = path.join(outDir, safeName);
-    fs.writeFileSync(outPath, buf);
-    saved.push(outPath);
+    const pdfPath = path.join(outDir, safeName);
+    if (keep) {
+      archive.push(fs.promises.mkdir(outDir, { recursive: true })
+        .then(() => fs.promises.writeFile(pdfPath, Buffer.from(data, 'base64url'))));
+    }
+    fetched.push({ pdfPath, data });
   }
-  return saved;
+  return fetched;
 }
 
 function buildGmailQueryForMerchant(key, mc){
@@ -247,6 +254,7 @@ async function main(){
 
   const outEvents = [];
   const unknown = [];
+  const archive = []; // pending attachment writes (fetchPdfAttachments)
 
   for(const m of msgs){
     // Optimization: fetch metadata first (fast). Only fetch full for matched messages.
@@ -316,9 +324,9 @@ async function main(){
         outEvents.push({ merchant: matchedKey, parse_status: 'error', parse_error: 'expected pdf attachment but none found', messageId: msgMeta.messageId, subject });
         continue;
       }
-      const saved = await savePdfAttachments(gmail, baseDir, matchedKey, msgMeta.messageId, pdfs);
-      for(const pdfPath of saved){
-        const events = parser.parse({ msg: msgMeta, pdfPath, cfg: matchedCfg });
+      const fetched = await fetchPdfAttachments(gmail, baseDir, matchedKey, msgMeta.messageId, pdfs, archive);
+      for(const { pdfPath, data } of fetched){
+        const events = await parser.parse({ msg: msgMeta, pdfPath, pdfData: data, cfg: matchedCfg });
         for(const e of events) outEvents.push(e);
       }
     } else {
@@ -347,6 +355,15 @@ async function main(){
     }
   }
 
+  await Promise.all(archive);
+
+  // The store upserts this run's events (unknown merged by messageId) and re-exports the file.
+  const stored = ingestOrders(baseDir, outEvents, unknown, { exportJson: true, mergeUnknown: true });
+  if (stored) {
+    process.stdout.write(JSON.stringify({ ok: true, count: outEvents.length, saved: stored.outPath, unknown: unknown.length, total: stored.total, unknown_total: stored.unknown_total }, null, 2) + '\n');
+    return;
+  }
+
   const outPath = path.join(baseDir, 'orders_parsed.json');
 
   // Merge with existing (append/update by stable key).
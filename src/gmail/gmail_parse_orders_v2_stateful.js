@@ -3,12 +3,19 @@
  *
  * - Reads merchant rules from ~/HisabKitab/refs/email_merchants.json
  * - Iterates per merchant with Gmail query (within label) and paginates
- * - Saves state after each page: ~/HisabKitab/orders_parse_state.json
- * - Merges into ~/HisabKitab/orders_parsed.json incrementally
+ * - Journals every finished message (append-only, fsynced): ~/HisabKitab/orders_parse_journal.ndjson
+ * - Checkpoints after each page: merges the journaled events, then atomically saves the state
+ *   (~/HisabKitab/orders_parse_state.json: pageToken plus the messages already done on a page
+ *   cut short by --max), then truncates the journal. A run killed anywhere resumes from the
+ *   journal and state without fetching or parsing any finished message again.
+ * - Merges into the order store (~/HisabKitab/orders_parsed.sqlite, src/pdf/hk_pdf/store.py) incrementally;
+ *   with HK_PDF_STORE=0 (or no python) it rewrites ~/HisabKitab/orders_parsed.json as before
  *
  * Usage:
  *   node src/gmail/gmail_parse_orders_v2_stateful.js --base-dir ~/HisabKitab --label HisabKitab --max 200
  *   (run repeatedly until done)
+ *   orders_parsed.json is re-exported from the store once at the end of the run (web/server reads the file);
+ *   --no-export-json leaves it alone
  */
 
 const fs = require('fs');
@@ -16,6 +23,7 @@ const path = require('path');
 const os = require('os');
 const { google } = require('googleapis');
 const { getParser } = require('../parsers');
+const { ingestOrders, exportOrders } = require('../pdf/order_store');
 
 function expandHome(p){
   if(!p) return p;
@@ -30,9 +38,46 @@ function readJsonSafe(fp, fallback){
   try { return JSON.parse(fs.readFileSync(fp,'utf8')); } catch { return fallback; }
 }
 
-function writeJson(fp, obj){
+// tmp + fsync + rename: a kill leaves either the old file or the new one, never a torn one.
+function writeJsonAtomic(fp, obj){
   fs.mkdirSync(path.dirname(fp), { recursive:true });
-  fs.writeFileSync(fp, JSON.stringify(obj, null, 2) + '\n', 'utf8');
+  const tmp = fp + '.tmp';
+  const fd = fs.openSync(tmp, 'w');
+  try {
+    fs.writeSync(fd, JSON.stringify(obj, null, 2) + '\n');
+    fs.fsyncSync(fd);
+  } finally {
+    fs.closeSync(fd);
+  }
+  fs.renameSync(tmp, fp);
+}
+
+// Append-only NDJSON journal. entries: what a killed run left behind (a torn last
+// line is cut off); append() returns once the line is on disk.
+function openJournal(fp){
+  fs.mkdirSync(path.dirname(fp), { recursive:true });
+  let raw = '';
+  try { raw = fs.readFileSync(fp, 'utf8'); } catch {}
+  const entries = [];
+  let good = 0;
+  for (const line of raw.split('\n').slice(0, -1)) {
+    try { entries.push(JSON.parse(line)); } catch { break; }
+    good += Buffer.byteLength(line, 'utf8') + 1;
+  }
+  const fd = fs.openSync(fp, 'a+');
+  fs.ftruncateSync(fd, good);
+  return {
+    entries,
+    append(entry){
+      fs.writeSync(fd, JSON.stringify(entry) + '\n');
+      fs.fsyncSync(fd);
+    },
+    truncate(){
+      fs.ftruncateSync(fd, 0);
+      fs.fsyncSync(fd);
+    },
+    close(){ fs.closeSync(fd); }
+  };
 }
 
 function parseArgs(argv){
@@ -43,7 +88,9 @@ function parseArgs(argv){
     label: get('--label') || 'HisabKitab',
     max: Number(get('--max') || 200),
     merchant: (get('--merchant') || '').trim().toUpperCase(),
-    statePath: expandHome(get('--state') || '~/HisabKitab/orders_parse_state.json')
+    statePath: expandHome(get('--state') || '~/HisabKitab/orders_parse_state.json'),
+    journalPath: expandHome(get('--journal') || '~/HisabKitab/orders_parse_journal.ndjson'),
+    exportJson: !args.includes('--no-export-json')
   };
 }
 
@@ -120,22 +167,27 @@ function findPdfParts(payload){
   return out;
 }
 
-async function savePdfAttachments(gmail, baseDir, merchantKey, msgId, pdfParts){
+// Fetch each PDF attachment for parsing from memory. The copy under
+// <baseDir>/attachments is written in the background (await `archive` before
+// finishing); HK_PDF_ARCHIVE=0 skips it. pdfPath is the archive path either way.
+async function fetchPdfAttachments(gmail, baseDir, merchantKey, msgId, pdfParts, archive){
   const outDir = path.join(baseDir, 'attachments', merchantKey.toLowerCase(), msgId);
-  fs.mkdirSync(outDir, { recursive: true });
+  const keep = process.env.HK_PDF_ARCHIVE !== '0';
 
-  const saved = [];
+  const fetched = [];
   for(const p of pdfParts){
     const att = await gmail.users.messages.attachments.get({ userId:'me', messageId: msgId, id: p.attachmentId });
-    const data = att.data.data.replace(/-/g,'+').replace(/_/g,'/');
-    const buf = Buffer.from(data, 'base64');
+    const data = att.data.data;
     const rawName = p.filename || (merchantKey.toLowerCase() + '.pdf');
     const safeName = String(rawName).replace(/[\\/]+/g, '_').replace(/\s+/g, ' ').trim();
-    const outPath = path.join(outDir, safeName);
-    fs.writeFileSync(outPath, buf);
-    saved.push(outPath);
+    const pdfPath = path.join(outDir, safeName);
+    if (keep) {
+      archive.push(fs.promises.mkdir(outDir, { recursive: true })
+        .then(() => fs.promises.writeFile(pdfPath, Buffer.from(data, 'base64url'))));
+    }
+    fetched.push({ pdfPath, data });
   }
-  return saved;
+  return fetched;
 }
 
 function buildGmailQueryForMerchant(key, mc){
@@ -169,6 +221,10 @@ function buildGmailQueryForMerchant(key, mc){
 }
 
 function mergeOrders(baseDir, outEvents, unknown){
+  // The store upserts only this run's events; without it, rewrite the whole file.
+  const stored = ingestOrders(baseDir, outEvents, unknown || []);
+  if (stored) return stored;
+
   const outPath = path.join(baseDir, 'orders_parsed.json');
   const existing = readJsonSafe(outPath, { orders: [], unknown: [] });
 
@@ -189,12 +245,79 @@ function mergeOrders(baseDir, outEvents, unknown){
   // Keep unknown from THIS run only (do not accumulate forever)
   const mergedUnknown = unknown || [];
 
-  fs.writeFileSync(outPath, JSON.stringify({ ok: true, count: mergedOrders.length, orders: mergedOrders, unknown: mergedUnknown }, null, 2));
+  // Atomic: the journal is truncated right after this checkpoint, so a torn file would lose orders.
+  writeJsonAtomic(outPath, { ok: true, count: mergedOrders.length, orders: mergedOrders, unknown: mergedUnknown });
   return { outPath, total: mergedOrders.length, unknown_total: mergedUnknown.length };
 }
 
+// One Gmail message -> { events, unknown, counted } (counted: it matched the merchant rule and has a parser).
+async function parseMessage(gmail, baseDir, k, mc, m, archive){
+  const events = [];
+  const unknown = [];
+
+  // metadata first
+  const meta = await gmail.users.messages.get({ userId:'me', id:m.id, format:'metadata', metadataHeaders:['From','Subject','Date'] });
+  const h = meta.data.payload?.headers || [];
+  const from = header(h,'From');
+  const subject = header(h,'Subject');
+
+  const msgMeta = {
+    messageId: meta.data.id,
+    threadId: meta.data.threadId,
+    internalDateMs: Number(meta.data.internalDate || 0),
+    from,
+    subject
+  };
+
+  // guard: ensure it matches
+  if(!matchesRule(from, subject, mc.match || {})) {
+    return { events, unknown, counted: false };
+  }
+
+  const parserId = mc?.parser?.id;
+  if(!parserId){
+    unknown.push({ messageId: msgMeta.messageId, from, subject, error:'missing parser.id' });
+    return { events, unknown, counted: false };
+  }
+
+  const parser = getParser(parserId);
+
+  if(mc?.parser?.type === 'pdf'){
+    const full = await gmail.users.messages.get({ userId:'me', id:m.id, format:'full' });
+    const pdfs = findPdfParts(full.data.payload);
+    if(!pdfs.length){
+      events.push({ merchant: k, parse_status:'error', parse_error:'expected pdf attachment but none found', messageId: msgMeta.messageId, subject });
+      return { events, unknown, counted: false };
+    }
+    const fetched = await fetchPdfAttachments(gmail, baseDir, k, msgMeta.messageId, pdfs, archive);
+    for(const { pdfPath, data } of fetched){
+      const parsed = (await parser.parse({ msg: msgMeta, pdfPath, pdfData: data, cfg: mc })) || [];
+      for(const e of parsed) events.push(e);
+    }
+  } else {
+    // email parser: snippet first, then full
+    const snippet = String(meta.data.snippet || '');
+    let parsed = [];
+    try { parsed = parser.parse({ msg: msgMeta, text: snippet, html: snippet, htmlRaw: '', cfg: mc }) || []; } catch { parsed = []; }
+    const useful = Array.isArray(parsed) && parsed.some(e => (e.parse_status==='ok') || (e.items && e.items.length) || (e.total != null));
+    if(!useful){
+      const full = await gmail.users.messages.get({ userId:'me', id:m.id, format:'full' });
+      const parts = collectTextParts(full.data.payload);
+      const tp = parts.find(p => p.mimeType === 'text/plain');
+      const th = parts.find(p => p.mimeType === 'text/html');
+      const plainText = tp ? tp.text : '';
+      const htmlText = th ? th.text : '';
+      const htmlStripped = th ? stripHtml(th.text) : '';
+      parsed = parser.parse({ msg: msgMeta, text: plainText || htmlStripped || snippet, html: htmlStripped || snippet, htmlRaw: htmlText || '', cfg: mc }) || [];
+    }
+    for(const e of (parsed || [])) events.push(e);
+  }
+
+  return { events, unknown, counted: true };
+}
+
 async function main(){
-  const { baseDir, label, max, merchant, statePath } = parseArgs(process.argv);
+  const { baseDir, label, max, merchant, statePath, journalPath, exportJson } = parseArgs(process.argv);
   const cfgPath = path.join(baseDir, 'refs', 'email_merchants.json');
   const cfg = readJson(cfgPath);
 
@@ -206,12 +329,42 @@ async function main(){
   if(!lbl) throw new Error(`Label '${label}' not found`);
 
   const state = readJsonSafe(statePath, { perMerchant: {}, done: {} });
+  state.perMerchant = state.perMerchant || {};
 
   const keys = merchant ? [merchant] : Object.keys(cfg).filter(k => cfg[k]?.enabled);
 
   let processed = 0;
-  const outEvents = [];
+  let wrote = 0;
   const unknown = [];
+  const archive = []; // pending attachment writes (fetchPdfAttachments)
+
+  // Messages a killed run finished after its last checkpoint: not fetched again,
+  // their events go out with the first checkpoint.
+  const journal = openJournal(journalPath);
+  const journaled = new Set();
+  let pending = [];
+  for (const j of journal.entries) {
+    journaled.add(j.merchant + '::' + j.messageId);
+    pending = pending.concat(j.events || []);
+    for (const u of (j.unknown || [])) unknown.push(u);
+  }
+  const resumed = journal.entries.length;
+  let mergeRes = null;
+  let mergedUnknown = -1;
+
+  // Merge what is journaled, save the state, then drop the journal (in that order:
+  // a crash in between only replays upserts).
+  const checkpoint = async () => {
+    await Promise.all(archive.splice(0));
+    if (pending.length || unknown.length !== mergedUnknown) {
+      mergeRes = mergeOrders(baseDir, pending, unknown);
+      mergedUnknown = unknown.length;
+    }
+    wrote += pending.length;
+    pending = [];
+    writeJsonAtomic(statePath, state);
+    journal.truncate();
+  };
 
   for(const k of keys){
     if(processed >= max) break;
@@ -219,7 +372,7 @@ async function main(){
     if(!mc?.enabled) continue;
 
     const q = buildGmailQueryForMerchant(k, mc);
-    const st = state.perMerchant?.[k] || { pageToken: null, done: false };
+    const st = state.perMerchant[k] || { pageToken: null, done: false };
     if(st.done) continue;
 
     const batchSize = Math.min(25, max - processed);
@@ -232,91 +385,37 @@ async function main(){
     });
 
     const msgs = listRes.data.messages || [];
-    let nextToken = listRes.data.nextPageToken || null;
+    const nextToken = listRes.data.nextPageToken || null;
+    const seen = new Set(st.seen || []);
+    let complete = true;
 
     for(const m of msgs){
-      // Save progress aggressively: treat our pageToken as "start from here" for the next run.
-      // Gmail page tokens are page-level; we still update after each message to reduce rework.
-      // (Worst case: we reprocess a few messages; merge logic dedupes.)
-      state.perMerchant = state.perMerchant || {};
-      state.perMerchant[k] = state.perMerchant[k] || { pageToken: st.pageToken || null, done: false };
-      writeJson(statePath, state);
-
-      // metadata first
-      const meta = await gmail.users.messages.get({ userId:'me', id:m.id, format:'metadata', metadataHeaders:['From','Subject','Date'] });
-      const h = meta.data.payload?.headers || [];
-      const from = header(h,'From');
-      const subject = header(h,'Subject');
-
-      const msgMeta = {
-        messageId: meta.data.id,
-        threadId: meta.data.threadId,
-        internalDateMs: Number(meta.data.internalDate || 0),
-        from,
-        subject
-      };
-
-      // guard: ensure it matches
-      if(!matchesRule(from, subject, mc.match || {})) {
-        continue;
-      }
-
-      const parserId = mc?.parser?.id;
-      if(!parserId){
-        unknown.push({ messageId: msgMeta.messageId, from, subject, error:'missing parser.id' });
-        continue;
-      }
-
-      const parser = getParser(parserId);
-
-      if(mc?.parser?.type === 'pdf'){
-        const full = await gmail.users.messages.get({ userId:'me', id:m.id, format:'full' });
-        const pdfs = findPdfParts(full.data.payload);
-        if(!pdfs.length){
-          outEvents.push({ merchant: k, parse_status:'error', parse_error:'expected pdf attachment but none found', messageId: msgMeta.messageId, subject });
-          continue;
-        }
-        const saved = await savePdfAttachments(gmail, baseDir, k, msgMeta.messageId, pdfs);
-        for(const pdfPath of saved){
-          const events = parser.parse({ msg: msgMeta, pdfPath, cfg: mc }) || [];
-          for(const e of events) outEvents.push(e);
-        }
-      } else {
-        // email parser: snippet first, then full
-        const snippet = String(meta.data.snippet || '');
-        let events = [];
-        try { events = parser.parse({ msg: msgMeta, text: snippet, html: snippet, htmlRaw: '', cfg: mc }) || []; } catch { events = []; }
-        const useful = Array.isArray(events) && events.some(e => (e.parse_status==='ok') || (e.items && e.items.length) || (e.total != null));
-        if(!useful){
-          const full = await gmail.users.messages.get({ userId:'me', id:m.id, format:'full' });
-          const parts = collectTextParts(full.data.payload);
-          const tp = parts.find(p => p.mimeType === 'text/plain');
-          const th = parts.find(p => p.mimeType === 'text/html');
-          const plainText = tp ? tp.text : '';
-          const htmlText = th ? th.text : '';
-          const htmlStripped = th ? stripHtml(th.text) : '';
-          events = parser.parse({ msg: msgMeta, text: plainText || htmlStripped || snippet, html: htmlStripped || snippet, htmlRaw: htmlText || '', cfg: mc }) || [];
-        }
-        for(const e of (events || [])) outEvents.push(e);
-      }
-
-      processed++;
-      if(processed >= max) break;
+      if (seen.has(m.id) || journaled.has(k + '::' + m.id)) { seen.add(m.id); continue; }
+      if (processed >= max) { complete = false; break; }
+
+      const res = await parseMessage(gmail, baseDir, k, mc, m, archive);
+      // The journal line must not point at PDFs that are not on disk yet.
+      await Promise.all(archive.splice(0));
+      journal.append({ merchant: k, messageId: m.id, events: res.events, unknown: res.unknown });
+      pending = pending.concat(res.events);
+      for (const u of res.unknown) unknown.push(u);
+      seen.add(m.id);
+      if (res.counted) processed++;
     }
 
-    // update state
-    state.perMerchant = state.perMerchant || {};
-    state.perMerchant[k] = state.perMerchant[k] || {};
-    state.perMerchant[k].pageToken = nextToken;
-    state.perMerchant[k].done = !nextToken;
-
-    writeJson(statePath, state);
+    // A page cut short by --max is resumed from its start, skipping the messages already done.
+    state.perMerchant[k] = complete
+      ? { pageToken: nextToken, done: !nextToken }
+      : { pageToken: st.pageToken || null, done: false, seen: [...seen] };
+    await checkpoint();
 
     if(processed >= max) break;
   }
 
-  const mergeRes = mergeOrders(baseDir, outEvents, unknown);
-  process.stdout.write(JSON.stringify({ ok:true, processed, wrote: outEvents.length, unknown: unknown.length, state: statePath, saved: mergeRes.outPath, total: mergeRes.total, unknown_total: mergeRes.unknown_total }, null, 2) + '\n');
+  if (pending.length || !mergeRes) await checkpoint();
+  journal.close();
+  const exported = exportJson ? exportOrders(baseDir) : null;
+  process.stdout.write(JSON.stringify({ ok:true, processed, resumed, wrote, unknown: unknown.length, state: statePath, saved: mergeRes.outPath, exported: exported ? exported.outPath : null, total: mergeRes.total, unknown_total: mergeRes.unknown_total }, null, 2) + '\n');
 }
 
 main().catch(err => { console.error(err); process.exit(1); });
@@ -1,28 +1,24 @@
 // Blinkit PDF order parser wrapper around python implementation.
 
-const path = require('path');
-const { spawnSync } = require('child_process');
+const { runPdfParser, pdfSource } = require('../../pdf/run_pdf_parser');
 
 module.exports = {
   id: 'BLINKIT_PDF_V1',
   kind: 'order',
 
-  parse(ctx) {
-    const py = process.env.HK_PDF_PY || path.join(process.env.HOME, 'clawd', '.venv-pdf', 'bin', 'python');
-    const script = path.join(process.env.HOME, 'clawd', 'hisab-kitab', 'src', 'pdf', 'parse_blinkit_invoice.py');
-
-    const r = spawnSync(py, [script, ctx.pdfPath], { encoding: 'utf8' });
-    if (r.status !== 0) {
+  async parse(ctx) {
+    const r = await runPdfParser('blinkit', pdfSource(ctx));
+    if (!r.ok) {
       return [{
         merchant: 'BLINKIT',
         parse_status: 'error',
-        parse_error: r.stderr || 'python failed',
+        parse_error: r.error || 'python failed',
         pdfPath: ctx.pdfPath,
         messageId: ctx.msg?.messageId
       }];
     }
 
-    const parsed = JSON.parse(r.stdout);
+    const parsed = r.parsed;
     return [{
       merchant: 'BLINKIT',
       parse_status: 'ok',
@@ -30,9 +26,13 @@ module.exports = {
       internalDateMs: ctx.msg?.internalDateMs,
       order_id: parsed.order_id,
       invoice_number: parsed.invoice_number,
+      date: parsed.date ?? null,
       invoice_date: parsed.invoice_date,
+      invoice_date_ms: parsed.invoice_date_ms ?? null,
       total: parsed.overall_total ?? parsed.grand_total,
+      total_paise: parsed.overall_total_paise ?? parsed.grand_total_paise ?? null,
       invoices: parsed.invoices || [],
+      validation: parsed.validation || null,
       pdfPath: ctx.pdfPath
     }];
   }
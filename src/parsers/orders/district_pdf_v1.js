@@ -1,31 +1,24 @@
 // District/TicketNew PDF invoice parser wrapper around python implementation.
 
-const path = require('path');
-const { spawnSync } = require('child_process');
+const { runPdfParser, pdfSource } = require('../../pdf/run_pdf_parser');
 
 module.exports = {
   id: 'DISTRICT_PDF_V1',
   kind: 'order',
 
-  parse(ctx) {
-    const py = process.env.HK_PDF_PY || path.join(process.env.HOME, 'clawd', '.venv-pdf', 'bin', 'python');
-    const script = path.join(process.env.HOME, 'clawd', 'hisab-kitab', 'src', 'pdf', 'parse_district_invoice.py');
-
-    const r = spawnSync(py, [script, ctx.pdfPath], { encoding: 'utf8' });
-    if (r.status !== 0) {
+  async parse(ctx) {
+    const r = await runPdfParser('district', pdfSource(ctx));
+    if (!r.ok) {
       return [{
         merchant: 'DISTRICT',
         parse_status: 'error',
-        parse_error: r.stderr || 'python failed',
+        parse_error: r.error || 'python failed',
         pdfPath: ctx.pdfPath,
         messageId: ctx.msg?.messageId
       }];
     }
 
-    let parsed = null;
-    try { parsed = JSON.parse(r.stdout); } catch {
-      return [{ merchant: 'DISTRICT', parse_status: 'error', parse_error: 'invalid json from python', pdfPath: ctx.pdfPath, messageId: ctx.msg?.messageId }];
-    }
+    const parsed = r.parsed;
 
     if (!parsed || parsed.ok === false) return [];
 
@@ -40,9 +33,13 @@ module.exports = {
       internalDateMs: ctx.msg?.internalDateMs,
       order_id: parsed.order_id || null,
       invoice_number: parsed.invoice_no || null,
+      date: parsed.date || null,
       invoice_date: parsed.invoice_date || null,
+      invoice_date_ms: parsed.invoice_date_ms ?? null,
       total,
+      total_paise: parsed.total_paise ?? null,
       items,
+      validation: parsed.validation || null,
       pdfPath: ctx.pdfPath
     }];
   }
@@ -1,32 +1,25 @@
 // Swiggy Instamart PDF invoice parser wrapper around the Swiggy python implementation.
 // We reuse the Swiggy invoice parser, but tag the output merchant as SWIGGY_INSTAMART.
 
-const path = require('path');
-const { spawnSync } = require('child_process');
+const { runPdfParser, pdfSource } = require('../../pdf/run_pdf_parser');
 
 module.exports = {
   id: 'SWIGGY_INSTAMART_PDF_V1',
   kind: 'order',
 
-  parse(ctx) {
-    const py = process.env.HK_PDF_PY || path.join(process.env.HOME, 'clawd', '.venv-pdf', 'bin', 'python');
-    const script = path.join(process.env.HOME, 'clawd', 'hisab-kitab', 'src', 'pdf', 'parse_swiggy_invoice.py');
-
-    const r = spawnSync(py, [script, ctx.pdfPath], { encoding: 'utf8' });
-    if (r.status !== 0) {
+  async parse(ctx) {
+    const r = await runPdfParser('swiggy', pdfSource(ctx));
+    if (!r.ok) {
       return [{
         merchant: 'SWIGGY_INSTAMART',
         parse_status: 'error',
-        parse_error: r.stderr || 'python failed',
+        parse_error: r.error || 'python failed',
         pdfPath: ctx.pdfPath,
         messageId: ctx.msg?.messageId
       }];
     }
 
-    let parsed = null;
-    try { parsed = JSON.parse(r.stdout); } catch (e) {
-      return [{ merchant: 'SWIGGY_INSTAMART', parse_status: 'error', parse_error: 'invalid json from python', pdfPath: ctx.pdfPath, messageId: ctx.msg?.messageId }];
-    }
+    const parsed = r.parsed;
 
     if (!parsed || parsed.ok === false) return [];
 
@@ -42,8 +35,11 @@ module.exports = {
       order_id: parsed.order_id || null,
       invoice_number: null,
       invoice_date: null,
+      invoice_date_ms: null,
       total,
+      total_paise: parsed.total_paise ?? null,
       items,
+      validation: parsed.validation || null,
       pdfPath: ctx.pdfPath
     }];
   }
@@ -1,31 +1,24 @@
 // Swiggy PDF invoice parser wrapper around python implementation.
 
-const path = require('path');
-const { spawnSync } = require('child_process');
+const { runPdfParser, pdfSource } = require('../../pdf/run_pdf_parser');
 
 module.exports = {
   id: 'SWIGGY_PDF_V1',
   kind: 'order',
 
-  parse(ctx) {
-    const py = process.env.HK_PDF_PY || path.join(process.env.HOME, 'clawd', '.venv-pdf', 'bin', 'python');
-    const script = path.join(process.env.HOME, 'clawd', 'hisab-kitab', 'src', 'pdf', 'parse_swiggy_invoice.py');
-
-    const r = spawnSync(py, [script, ctx.pdfPath], { encoding: 'utf8' });
-    if (r.status !== 0) {
+  async parse(ctx) {
+    const r = await runPdfParser('swiggy', pdfSource(ctx));
+    if (!r.ok) {
       return [{
         merchant: 'SWIGGY',
         parse_status: 'error',
-        parse_error: r.stderr || 'python failed',
+        parse_error: r.error || 'python failed',
         pdfPath: ctx.pdfPath,
         messageId: ctx.msg?.messageId
       }];
     }
 
-    let parsed = null;
-    try { parsed = JSON.parse(r.stdout); } catch (e) {
-      return [{ merchant: 'SWIGGY', parse_status: 'error', parse_error: 'invalid json from python', pdfPath: ctx.pdfPath, messageId: ctx.msg?.messageId }];
-    }
+    const parsed = r.parsed;
 
     if (!parsed || parsed.ok === false) return [];
 
@@ -41,8 +34,11 @@ module.exports = {
       order_id: parsed.order_id || null,
       invoice_number: null,
       invoice_date: null,
+      invoice_date_ms: null,
       total,
+      total_paise: parsed.total_paise ?? null,
       items,
+      validation: parsed.validation || null,
       pdfPath: ctx.pdfPath
     }];
   }
@@ -1,29 +1,25 @@
 // Zepto PDF order parser wrapper around python implementation.
 
-const path = require('path');
-const { spawnSync } = require('child_process');
+const { runPdfParser, pdfSource } = require('../../pdf/run_pdf_parser');
 
 module.exports = {
   id: 'ZEPTO_PDF_V1',
   kind: 'order',
 
-  parse(ctx) {
-    // ctx: { pdfPath, msg }
-    const py = process.env.HK_PDF_PY || path.join(process.env.HOME, 'clawd', '.venv-pdf', 'bin', 'python');
-    const script = path.join(process.env.HOME, 'clawd', 'hisab-kitab', 'src', 'pdf', 'parse_zepto_invoice.py');
-
-    const r = spawnSync(py, [script, ctx.pdfPath], { encoding: 'utf8' });
-    if (r.status !== 0) {
+  async parse(ctx) {
+    // ctx: { pdfPath, pdfData?, msg }
+    const r = await runPdfParser('zepto', pdfSource(ctx));
+    if (!r.ok) {
       return [{
         merchant: 'ZEPTO',
         parse_status: 'error',
-        parse_error: r.stderr || 'python failed',
+        parse_error: r.error || 'python failed',
         pdfPath: ctx.pdfPath,
         messageId: ctx.msg?.messageId
       }];
     }
 
-    const parsed = JSON.parse(r.stdout);
+    const parsed = r.parsed;
     return [{
       merchant: 'ZEPTO',
       parse_status: 'ok',
@@ -31,11 +27,15 @@ module.exports = {
       internalDateMs: ctx.msg?.internalDateMs,
       order_id: parsed.order_number,
       invoice_number: parsed.invoice_number,
-      invoice_date: parsed.date,
+      date: parsed.date ?? null,
+      invoice_date: parsed.invoice_date,
+      invoice_date_ms: parsed.invoice_date_ms ?? null,
       total: parsed.invoice_value,
+      total_paise: parsed.invoice_value_paise ?? null,
       item_total: parsed.item_total,
       handling_fee: parsed.handling_fee,
       items: parsed.items || [],
+      validation: parsed.validation || null,
       pdfPath: ctx.pdfPath
     }];
   }
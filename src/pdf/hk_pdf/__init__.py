@@ -0,0 +1,9 @@
+"""Shared runtime for the invoice PDF parsers in src/pdf.
+
+The parse_*_invoice.py scripts stay runnable on their own; this package lets a
+single interpreter load all of them once and serve many PDFs.
+
+Run from src/pdf (or with src/pdf on PYTHONPATH), e.g.:
+  python -m hk_pdf zepto:/path/a.pdf blinkit:/path/b.pdf   # batch, NDJSON out
+  python -m hk_pdf.server                                   # long-lived server
+"""
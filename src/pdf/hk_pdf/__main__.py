@@ -0,0 +1,134 @@
+"""Batch entry point: parse many PDFs in one interpreter, one NDJSON line per PDF.
+
+Usage (from src/pdf):
+  python -m hk_pdf zepto:/path/a.pdf blinkit:/path/b.pdf
+  python -m hk_pdf --manifest pdfs.txt
+  find ... | python -m hk_pdf --stdin
+
+Manifest / stdin lines are either JSON objects ({"parser", "path", "id"?}) or
+"<parser> <path>" (tab or space separated). Blank lines and # comments are skipped.
+
+Each output line is {"id", "parser", "path", "status": "ok", "result": {...}} or
+{"id", "parser", "path", "status": "error", "error": "..."}, where `result` is
+exactly what parse_<parser>_invoice.py prints for that PDF.
+
+--pattern-stats dumps hk_pdf.patterns call/hit counts to stderr when done
+(combine with --no-cache, cached results never touch the regexes).
+
+--canonical writes each result as the hk_pdf.schema record instead (one
+Invoice/LineItem shape for every merchant, amounts in paise); a request line
+can also ask for it alone with "canonical": true.
+
+Every PDF is parsed under hk_pdf.limits (--no-limits turns them off); one over
+a limit gets result {"ok": false, "reason": "timeout" | "too_many_pages" | ...}.
+"""
+
+import argparse
+import json
+import sys
+
+from . import cache as parse_cache
+from . import ndjson, patterns, registry
+from .document import Document
+from .limits import Limits
+from .server import handle_request
+
+
+def parse_spec(spec):
+    """'zepto:/a/b.pdf' -> {'parser': 'zepto', 'path': '/a/b.pdf'}"""
+    parser, sep, pdf_path = spec.partition(':')
+    if not sep or not parser or not pdf_path:
+        raise ValueError(f'expected <parser>:<path>, got {spec!r}')
+    return {'parser': parser, 'path': pdf_path}
+
+
+def parse_manifest_line(line):
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('{'):
+        return json.loads(line)
+    parts = line.split(None, 1)
+    if len(parts) != 2:
+        raise ValueError(f'expected "<parser> <path>", got {line!r}')
+    return {'parser': parts[0], 'path': parts[1]}
+
+
+def iter_requests(args):
+    for spec in args.pdfs:
+        yield parse_spec(spec)
+    if args.manifest:
+        with open(args.manifest, encoding='utf8') as f:
+            for line in f:
+                req = parse_manifest_line(line)
+                if req is not None:
+                    yield req
+    if args.stdin:
+        for line in sys.stdin:
+            req = parse_manifest_line(line)
+            if req is not None:
+                yield req
+
+
+def run(requests, out, cache=None, limits=None, canonical=False):
+    n = 0
+    doc = None
+    try:
+        for req in requests:
+            req = dict(req)
+            req.setdefault('id', n)
+            if canonical:
+                req['canonical'] = True
+            # Consecutive requests for the same PDF (e.g. swiggy + swiggy_instamart) share one Document.
+            pdf_path = str(req.get('path') or '')
+            if doc is None or doc.path != pdf_path:
+                if doc is not None:
+                    doc.close()
+                doc = Document(pdf_path) if pdf_path else None
+            res = handle_request(req, cache=cache, doc=doc, limits=limits)
+            res['parser'] = req.get('parser')
+            res['path'] = req.get('path')
+            ndjson.write(out, res)
+            n += 1
+    finally:
+        if doc is not None:
+            doc.close()
+    return n
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m hk_pdf', description='Parse many invoice PDFs, one NDJSON line each.')
+    ap.add_argument('pdfs', nargs='*', metavar='PARSER:PATH')
+    ap.add_argument('--manifest', help='file with one request per line')
+    ap.add_argument('--stdin', action='store_true', help='read requests from stdin')
+    ap.add_argument('--no-cache', action='store_true', help='do not use the parse-result cache')
+    ap.add_argument('--no-limits', action='store_true', help='no per-PDF time/page/size/memory limits (hk_pdf.limits)')
+    ap.add_argument('--canonical', action='store_true', help='write hk_pdf.schema records instead of parser JSON')
+    ap.add_argument('--pattern-stats', action='store_true', help='print per-pattern call/hit counts to stderr at the end')
+    args = ap.parse_args(argv)
+
+    if not args.pdfs and not args.manifest and not args.stdin:
+        ap.print_usage(sys.stderr)
+        return 2
+
+    registry.load_all()
+    cache = None if args.no_cache else parse_cache.open_default()
+    pdf_limits = None if args.no_limits else Limits.from_env()
+
+    # Parsers must never write to the NDJSON stream.
+    out = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        run(iter_requests(args), out, cache=cache, limits=pdf_limits, canonical=args.canonical)
+    except ValueError as e:
+        print(f'hk_pdf: {e}', file=sys.stderr)
+        return 2
+    finally:
+        sys.stdout = out
+    if args.pattern_stats:
+        print(json.dumps(patterns.stats(), indent=2), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""PDF extraction backends behind hk_pdf.document.Document.
+
+A backend opens one PDF (a path, the PDF bytes or an mmap of it) and answers
+some of: page_count, metadata, text(i), words(i), tables(i, settings, bbox),
+release(i). Two exist:
+
+- pdfplumber: everything; pure python, so slow (text, words and the table
+  strategies used by the Zepto/Blinkit parsers need it).
+- pdfium (optional, `pip install pypdfium2`): page count, metadata and plain
+  text only, but in C. Parsers that only read text (District, EatClub, redBus,
+  Zomato) and the router use it via Document.fast_text.
+
+HK_PDF_TEXT_BACKEND=pdfplumber|pdfium picks the fast-text backend; the default
+is pdfium when pypdfium2 is importable. `python -m hk_pdf.equiv` checks both
+give identical parser output on a corpus before you rely on it.
+"""
+
+import ctypes
+import io
+import mmap
+import os
+
+TEXT_BACKENDS = ('pdfplumber', 'pdfium')
+
+
+def pdfium_available():
+    try:
+        import pypdfium2  # type: ignore  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def default_text_backend():
+    env = (os.environ.get('HK_PDF_TEXT_BACKEND') or '').strip().lower()
+    if env:
+        if env not in TEXT_BACKENDS:
+            raise ValueError(f'HK_PDF_TEXT_BACKEND must be one of {", ".join(TEXT_BACKENDS)}, got {env!r}')
+        return env
+    return 'pdfium' if pdfium_available() else 'pdfplumber'
+
+
+def normalize_text(t):
+    """pdfium text -> pdfplumber's shape: '\\n' line breaks, no trailing blanks."""
+    t = (t or '').replace('\r\n', '\n').replace('\r', '\n')
+    return '\n'.join(ln.rstrip() for ln in t.split('\n')).strip('\n')
+
+
+class PdfplumberBackend:
+    name = 'pdfplumber'
+
+    def __init__(self, source):
+        import pdfplumber  # type: ignore
+
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        self._pdf = pdfplumber.open(source)
+        self.pages = list(self._pdf.pages)
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+    @property
+    def metadata(self):
+        return self._pdf.metadata or {}
+
+    def text(self, i):
+        return self.pages[i].extract_text() or ''
+
+    def words(self, i):
+        return self.pages[i].extract_words() or []
+
+    def tables(self, i, settings, bbox=None):
+        page = self.pages[i]
+        if bbox is not None:
+            page = page.crop(bbox)
+        return page.extract_tables(settings) or []
+
+    def release(self, i):
+        """Drop page i's cached layout objects (chars, edges, text map)."""
+        self.pages[i].close()
+
+    def close(self):
+        self._pdf.close()
+
+
+class PdfiumBackend:
+    name = 'pdfium'
+
+    def __init__(self, source):
+        import pypdfium2 as pdfium  # type: ignore
+
+        if isinstance(source, mmap.mmap):
+            # pdfium takes a ctypes array over the mapping, not the mmap itself.
+            source = (ctypes.c_char * len(source)).from_buffer(source)
+        self._pdf = pdfium.PdfDocument(source)
+
+    @property
+    def page_count(self):
+        return len(self._pdf)
+
+    @property
+    def metadata(self):
+        return {k: v for k, v in self._pdf.get_metadata_dict().items() if v}
+
+    def text(self, i):
+        page = self._pdf[i]
+        textpage = page.get_textpage()
+        try:
+            return normalize_text(textpage.get_text_range())
+        finally:
+            textpage.close()
+            page.close()
+
+    def close(self):
+        self._pdf.close()
+        # Drops the buffer export so the caller can close an mmap source.
+        self._pdf = None
+
+
+def open_backend(name, source):
+    if name == 'pdfium':
+        return PdfiumBackend(source)
+    if name == 'pdfplumber':
+        return PdfplumberBackend(source)
+    raise ValueError(f'unknown PDF backend: {name}')
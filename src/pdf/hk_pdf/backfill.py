@@ -0,0 +1,292 @@
+"""Rebuild orders_parsed.json from <baseDir>/attachments/ on a process pool.
+
+savePdfAttachments stores PDFs as <baseDir>/attachments/<merchant>/<messageId>/<file>.pdf.
+Each merchant directory is mapped to a parser (refs/email_merchants.json
+parser.id, else the directory name) and every PDF is parsed in a worker
+process. Results are merged by messageId::pdfPath exactly like mergeOrders,
+in a stable (merchant, messageId, file) order, so the output does not depend
+on worker scheduling. They go into the order store (hk_pdf.store,
+<baseDir>/orders_parsed.sqlite), which is exported to orders_parsed.json (or
+--out) once at the end of the run unless --no-export; with HK_PDF_STORE=0
+orders_parsed.json is rewritten as before.
+
+Reruns are incremental and a killed run resumes (hk_pdf.manifest): PDFs whose
+size/mtime or sha256 match the manifest of clean parses are skipped (--full
+re-parses them), and every finished PDF is journaled before it is
+checkpointed into the store, so a SIGKILL loses no parsed PDF.
+
+Every PDF is parsed under hk_pdf.limits (HK_PDF_TIMEOUT etc.; --no-limits
+turns them off). Pool workers run their tasks on their main thread, so the
+timeout watchdog applies; a PDF over a limit becomes an error event and is
+not recorded in the manifest, so the next run tries it again.
+
+Usage (from src/pdf):
+  python -m hk_pdf.backfill --base-dir ~/HisabKitab [--workers 8] [--merchant zepto] [--dry-run] [--full] [--no-export] [--no-limits]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from . import cache as parse_cache
+from . import manifest, orders, registry, store, templates
+from .limits import Limits
+
+# attachments/<dir> -> JS parser id, used when refs/email_merchants.json has no entry.
+DEFAULT_DIR_PARSERS = {
+    'zepto': 'ZEPTO_PDF_V1',
+    'blinkit': 'BLINKIT_PDF_V1',
+    'swiggy': 'SWIGGY_PDF_V1',
+    'swiggy_instamart': 'SWIGGY_INSTAMART_PDF_V1',
+    'instamart': 'SWIGGY_INSTAMART_PDF_V1',
+    'zomato': 'ZOMATO_PDF_V1',
+    'district': 'DISTRICT_PDF_V1',
+    'eatclub': 'EATCLUB_PDF_V1',
+    'redbus': 'REDBUS_PDF_V1',
+}
+
+
+def dir_parsers(base_dir):
+    """attachments/<dir> -> JS parser id, from refs/email_merchants.json with defaults."""
+    out = dict(DEFAULT_DIR_PARSERS)
+    try:
+        with open(os.path.join(base_dir, 'refs', 'email_merchants.json'), encoding='utf8') as f:
+            cfg = json.load(f)
+    except Exception:
+        cfg = {}
+    for key, mc in (cfg or {}).items():
+        pid = ((mc or {}).get('parser') or {}).get('id')
+        if pid in orders.PDF_PARSER_IDS:
+            out[key.lower()] = pid
+    return out
+
+
+def find_jobs(base_dir, merchant=None):
+    """Yield (parser_id, message_id, pdf_path) in a stable order."""
+    root = os.path.join(base_dir, 'attachments')
+    if not os.path.isdir(root):
+        return
+    parsers = dir_parsers(base_dir)
+    for mdir in sorted(os.listdir(root)):
+        if merchant and mdir != merchant.lower():
+            continue
+        parser_id = parsers.get(mdir)
+        mpath = os.path.join(root, mdir)
+        if not parser_id or not os.path.isdir(mpath):
+            continue
+        for msg_id in sorted(os.listdir(mpath)):
+            msg_dir = os.path.join(mpath, msg_id)
+            if not os.path.isdir(msg_dir):
+                continue
+            for fn in sorted(os.listdir(msg_dir)):
+                if fn.lower().endswith('.pdf'):
+                    yield parser_id, msg_id, os.path.join(msg_dir, fn)
+
+
+_cache = None
+_limits = None
+
+# Journal entries between checkpoints (store ingest + manifest + journal truncate).
+CHECKPOINT_EVERY = 64
+
+
+def run_job(job):
+    """Parse one PDF into a journal entry (hk_pdf.manifest); events is None when its sha256 is unchanged."""
+    parser_id, msg_id, pdf_path, prev_sha = job
+    parser, merchant = orders.PDF_PARSER_IDS[parser_id]
+    entry = {
+        'path': pdf_path,
+        'message_id': msg_id,
+        'parser_id': parser_id,
+        'version': registry.parser_version(parser),
+        'ok': True,
+        'unchanged': False,
+        'events': None,
+    }
+    try:
+        entry['size'], entry['mtime_ns'] = manifest.stat_key(pdf_path)
+        entry['sha256'] = parse_cache.file_digest(pdf_path)
+        if entry['sha256'] == prev_sha:
+            entry['unchanged'] = True
+            return entry
+        parsed = registry.parse_pdf(parser, pdf_path, cache=_cache, limits=_limits)
+        events = orders.to_order_events(parser_id, parsed, msg_id, pdf_path)
+    except Exception as e:
+        events = [orders.error_event(merchant, f'{type(e).__name__}: {e}', pdf_path, msg_id)]
+    entry['events'] = events
+    entry['ok'] = 'sha256' in entry and not any(e.get('parse_status') == 'error' for e in events)
+    return entry
+
+
+def _init_worker(cache_path, base_dir=None, pdf_limits=None):
+    global _cache, _limits
+    registry.load_all()
+    _limits = pdf_limits
+    # Learned table layouts live next to the data they were learned from.
+    templates.configure(base_dir)
+    # One sqlite connection per process; WAL lets the workers write concurrently.
+    _cache = parse_cache.ParseCache(cache_path) if cache_path else None
+
+
+def run_jobs(jobs, workers, cache_path=None, base_dir=None, pdf_limits=None):
+    """Parse jobs on `workers` processes; yields run_job() entries in job order as they finish."""
+    if workers <= 1:
+        _init_worker(cache_path, base_dir, pdf_limits)
+        for j in jobs:
+            yield run_job(j)
+        return
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(cache_path, base_dir, pdf_limits)) as pool:
+        # imap keeps input order; one PDF per task, so each is journaled as soon as it is done
+        # and long PDFs do not starve a worker's queue.
+        yield from pool.imap(run_job, jobs, chunksize=1)
+
+
+def plan(jobs, known, full=False):
+    """Split find_jobs() output into (to_parse, skipped) against the manifest rows `known`.
+
+    to_parse carries the manifest sha256 when only the stat changed, so the
+    worker can skip a PDF whose content did not.
+    """
+    versions = {}
+    to_parse, skipped = [], 0
+    for parser_id, msg_id, pdf_path in jobs:
+        prev = None if full else known.get(pdf_path)
+        if prev is not None:
+            parser = orders.PDF_PARSER_IDS[parser_id][0]
+            if parser not in versions:
+                versions[parser] = registry.parser_version(parser)
+            try:
+                size, mtime_ns = manifest.stat_key(pdf_path)
+            except OSError:
+                prev = None
+            else:
+                if manifest.unchanged(prev, size, mtime_ns, parser_id, versions[parser]):
+                    skipped += 1
+                    continue
+                if tuple(prev[3:]) != (parser_id, versions[parser]):
+                    prev = None
+        to_parse.append((parser_id, msg_id, pdf_path, prev[2] if prev is not None else None))
+    return to_parse, skipped
+
+
+class _Checkpoints:
+    """Journal every entry; every CHECKPOINT_EVERY of them, save events + manifest, then truncate."""
+
+    def __init__(self, base_dir, out_path):
+        self.order_store = store.open_default(base_dir)
+        self.merge_path = None
+        if self.order_store is None:
+            self.merge_path = out_path or os.path.join(base_dir, 'orders_parsed.json')
+        self.manifest = manifest.Manifest(os.path.join(base_dir, manifest.MANIFEST_NAME))
+        self.journal = manifest.Journal(os.path.join(base_dir, manifest.JOURNAL_NAME))
+        self.pending = []
+
+    def add(self, entry):
+        self.journal.append(entry)
+        self.pending.append(entry)
+        if len(self.pending) >= CHECKPOINT_EVERY:
+            self.flush()
+
+    def flush(self):
+        events = [e for entry in self.pending for e in entry['events'] or ()]
+        if events:
+            if self.order_store is not None:
+                self.order_store.ingest(events)
+            else:
+                orders.merge_orders(self.merge_path, events)
+        self.manifest.record([entry for entry in self.pending if entry['ok']])
+        self.journal.truncate()
+        self.pending = []
+
+    def close(self):
+        self.journal.close()
+        self.manifest.close()
+        if self.order_store is not None:
+            self.order_store.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m hk_pdf.backfill')
+    ap.add_argument('--base-dir', default='~/HisabKitab')
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--merchant', help='only this attachments/<merchant> directory')
+    ap.add_argument('--out', help='where to export (without a store: merge) orders_parsed.json, '
+                    'default <baseDir>/orders_parsed.json')
+    ap.add_argument('--no-export', action='store_true', help='leave orders_parsed.json alone (store only)')
+    ap.add_argument('--dry-run', action='store_true', help='parse but do not write')
+    ap.add_argument('--full', action='store_true', help='re-parse PDFs the manifest says are unchanged')
+    ap.add_argument('--no-cache', action='store_true', help='do not use the parse-result cache')
+    ap.add_argument('--no-limits', action='store_true', help='no per-PDF time/page/size/memory limits (hk_pdf.limits)')
+    args = ap.parse_args(argv)
+
+    base_dir = os.path.abspath(os.path.expanduser(args.base_dir))
+
+    t0 = time.time()
+    jobs = list(find_jobs(base_dir, args.merchant))
+    sink = None if args.dry_run else _Checkpoints(base_dir, args.out)
+    try:
+        resumed = sink.journal.replay() if sink else []
+        if resumed:
+            # A killed run's PDFs count as done; their entries go out with the first checkpoint.
+            sink.pending.extend(resumed)
+        done = {entry['path'] for entry in resumed}
+        known = {} if args.full else (sink.manifest.load() if sink else _read_manifest(base_dir))
+        to_parse, skipped = plan([j for j in jobs if j[2] not in done], known, args.full)
+
+        wrote = errors = unchanged = 0
+        cache_path = None if args.no_cache else parse_cache.default_path(base_dir)
+        pdf_limits = None if args.no_limits else Limits.from_env()
+        for entry in run_jobs(to_parse, max(1, args.workers), cache_path, base_dir, pdf_limits):
+            events = entry['events'] or ()
+            unchanged += entry['unchanged']
+            wrote += len(events)
+            errors += sum(1 for e in events if e.get('parse_status') == 'error')
+            if sink:
+                sink.add(entry)
+
+        summary = {
+            'ok': True,
+            'pdfs': len(jobs),
+            'parsed': len(to_parse) - unchanged,
+            'skipped': skipped + unchanged,
+            'resumed': len(resumed),
+            'wrote': wrote,
+            'errors': errors,
+            'workers': max(1, args.workers),
+        }
+        if sink:
+            sink.flush()
+            if sink.order_store is None:
+                res = orders.read_orders(sink.merge_path)
+                summary.update({'saved': sink.merge_path, 'total': len(res.get('orders') or [])})
+            else:
+                summary.update({'saved': sink.order_store.path, 'total': sink.order_store.count()})
+                if not args.no_export:
+                    out_path = args.out or os.path.join(base_dir, 'orders_parsed.json')
+                    summary['exported'] = sink.order_store.export_json(out_path)['outPath']
+    finally:
+        if sink:
+            sink.close()
+    summary['seconds'] = round(time.time() - t0, 2)
+
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+def _read_manifest(base_dir):
+    # --dry-run: read the manifest if there is one, create nothing.
+    db_path = os.path.join(base_dir, manifest.MANIFEST_NAME)
+    if not os.path.exists(db_path):
+        return {}
+    m = manifest.Manifest(db_path)
+    try:
+        return m.load()
+    finally:
+        m.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
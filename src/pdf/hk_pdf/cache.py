@@ -0,0 +1,161 @@
+"""Content-addressed parse-result cache (SQLite).
+
+Rows are keyed by (sha256 of the PDF bytes, parser name, parser version), so
+re-parsing an unchanged attachment is a single lookup no matter where the file
+lives, and bumping a parser's PARSER_VERSION only invalidates that parser's rows.
+
+Location: $HK_PDF_CACHE, else ~/HisabKitab/pdf_parse_cache.sqlite.
+HK_PDF_CACHE=0 disables it.
+
+  python -m hk_pdf.cache                # entry counts per parser/version
+  python -m hk_pdf.cache --prune        # drop rows from older parser versions
+  python -m hk_pdf.cache --clear [--parser zepto]
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+DEFAULT_PATH = '~/HisabKitab/pdf_parse_cache.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_cache (
+  sha256 TEXT NOT NULL,
+  parser TEXT NOT NULL,
+  version INTEGER NOT NULL,
+  result TEXT NOT NULL,
+  created_at INTEGER NOT NULL,
+  PRIMARY KEY (sha256, parser, version)
+);
+CREATE INDEX IF NOT EXISTS parse_cache_parser ON parse_cache (parser, version);
+"""
+
+
+def file_digest(pdf_path):
+    h = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_digest(source):
+    """sha256 of a PDF given as a path, bytes / mmap or hk_pdf.document.Document."""
+    data = source if isinstance(source, (bytes, bytearray, mmap.mmap)) else getattr(source, 'data', None)
+    if data is not None:
+        return hashlib.sha256(data).hexdigest()
+    return file_digest(getattr(source, 'path', source))
+
+
+class ParseCache:
+    def __init__(self, db_path):
+        self.path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def get(self, digest, parser, version):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT result FROM parse_cache WHERE sha256=? AND parser=? AND version=?',
+                (digest, parser, version),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, digest, parser, version, result):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO parse_cache (sha256, parser, version, result, created_at) VALUES (?,?,?,?,?)',
+                (digest, parser, version, json.dumps(result), int(time.time())),
+            )
+            self._db.commit()
+
+    def prune(self, versions):
+        """Delete rows whose version differs from versions[parser]."""
+        n = 0
+        with self._lock:
+            for parser, version in versions.items():
+                cur = self._db.execute('DELETE FROM parse_cache WHERE parser=? AND version<>?', (parser, version))
+                n += cur.rowcount
+            self._db.commit()
+        return n
+
+    def clear(self, parser=None):
+        with self._lock:
+            if parser:
+                cur = self._db.execute('DELETE FROM parse_cache WHERE parser=?', (parser,))
+            else:
+                cur = self._db.execute('DELETE FROM parse_cache')
+            self._db.commit()
+        return cur.rowcount
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT parser, version, COUNT(*) FROM parse_cache GROUP BY parser, version ORDER BY parser, version'
+            ).fetchall()
+        return [{'parser': p, 'version': v, 'rows': c} for p, v, c in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def default_path(base_dir=None):
+    env = os.environ.get('HK_PDF_CACHE')
+    if env:
+        return None if env == '0' else os.path.expanduser(env)
+    if base_dir:
+        return os.path.join(os.path.expanduser(base_dir), 'pdf_parse_cache.sqlite')
+    return os.path.expanduser(DEFAULT_PATH)
+
+
+def open_default(base_dir=None):
+    """Open the configured cache, or None if disabled/unavailable."""
+    db_path = default_path(base_dir)
+    if not db_path:
+        return None
+    try:
+        return ParseCache(db_path)
+    except Exception as e:
+        print(f'hk_pdf: parse cache disabled ({e})', file=sys.stderr)
+        return None
+
+
+def main(argv=None):
+    from . import registry
+
+    ap = argparse.ArgumentParser(prog='python -m hk_pdf.cache')
+    ap.add_argument('--base-dir')
+    ap.add_argument('--prune', action='store_true', help='drop rows from older parser versions')
+    ap.add_argument('--clear', action='store_true')
+    ap.add_argument('--parser', help='with --clear: only this parser')
+    args = ap.parse_args(argv)
+
+    cache = open_default(args.base_dir)
+    if cache is None:
+        print('hk_pdf: parse cache is disabled', file=sys.stderr)
+        return 1
+
+    out = {'ok': True, 'path': cache.path}
+    if args.prune:
+        out['pruned'] = cache.prune(registry.parser_versions())
+    if args.clear:
+        out['cleared'] = cache.clear(args.parser)
+    out['entries'] = cache.stats()
+    print(json.dumps(out, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
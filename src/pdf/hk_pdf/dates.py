@@ -0,0 +1,68 @@
+"""Invoice dates -> canonical ISO date and epoch ms, shared by the parsers.
+
+to_iso() reads every shape the merchants print, day first:
+
+  15-04-2025, 13/12/2025          (Zepto, redBus, District, EatClub)
+  12-Jan-2026, 13th Jan, 2026     (Blinkit, District, redBus "13 January 2026")
+  12-01-2026 18:05:11             (EatClub order time; the time is ignored)
+  2026-01-12                      (already ISO)
+
+with one anchored regex per shape instead of a strptime attempt (and a caught
+exception) per format, and memoizes by the raw string: a run sees the same
+few dates over and over. epoch_ms() is midnight IST of the date, which is what
+the JS side used to get from Luxon for every order.
+"""
+
+import datetime as _dt
+from functools import lru_cache
+
+from .patterns import COMMON as C
+
+IST = _dt.timezone(_dt.timedelta(hours=5, minutes=30), 'IST')
+
+MONTHS = {m: i for i, m in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+
+
+def _ymd(s):
+    m = C.date_ymd.match(s)
+    if m:
+        return int(m.group(1)), int(m.group(2)), int(m.group(3))
+    m = C.date_dmy.match(s)
+    if m:
+        return int(m.group(3)), int(m.group(2)), int(m.group(1))
+    m = C.date_d_mon_y.match(s)
+    if m:
+        month = MONTHS.get(m.group(2)[:3].lower())
+        if month is not None:
+            return int(m.group(3)), month, int(m.group(1))
+    return None
+
+
+@lru_cache(maxsize=4096)
+def to_iso(s):
+    """'13th Jan, 2026' -> '2026-01-13'; None for anything that is not a valid date."""
+    if not s:
+        return None
+    ymd = _ymd(s.strip())
+    if ymd is None:
+        return None
+    try:
+        return _dt.date(*ymd).isoformat()
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def epoch_ms(iso):
+    """Midnight IST of an ISO date as epoch milliseconds (None passes through)."""
+    if iso is None:
+        return None
+    d = _dt.date.fromisoformat(iso)
+    return int(_dt.datetime(d.year, d.month, d.day, tzinfo=IST).timestamp()) * 1000
+
+
+def stamp(s):
+    """(ISO date, epoch ms) for a printed date."""
+    iso = to_iso(s)
+    return iso, epoch_ms(iso)
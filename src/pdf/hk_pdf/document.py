@@ -0,0 +1,199 @@
+"""One opened PDF with lazily computed, memoized per-page extraction.
+
+Parsers take a Document (or a path / PDF bytes, via open_document) instead of
+calling pdfplumber directly, so page text, words and table candidates are
+computed at most once per page no matter how many passes or parsers look at
+them.
+
+Backends (hk_pdf.backends) open on first use: a text-only parser reading
+fast_text never loads pdfplumber when pdfium is available.
+
+pdfplumber keeps every parsed page's layout objects until the PDF is closed.
+Parsers that walk a long PDF page by page use stream(), which releases each
+page's layout cache as soon as the caller moves on; the memoized text, words
+and tables (all small) are kept, so peak memory no longer grows with the page
+count.
+"""
+
+import mmap
+from contextlib import contextmanager
+
+from . import backends, limits, templates
+from .words import TextTable, WordIndex, Words
+
+
+MEMORY_PATH = '<memory>'
+
+
+def _settings_key(settings):
+    return tuple(sorted((settings or {}).items()))
+
+
+class Document:
+    def __init__(self, source, text_backend=None):
+        """source: a path, or the PDF itself as bytes or an mmap (parsed from memory; path is '<memory>')."""
+        if isinstance(source, mmap.mmap):
+            self.data = source
+            self.path = MEMORY_PATH
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self.data = bytes(source)
+            self.path = MEMORY_PATH
+        else:
+            self.data = None
+            self.path = str(source)
+        self.text_backend = text_backend or backends.default_text_backend()
+        self._plumber = None
+        self._fast = None
+        self._text = {}
+        self._fast_text = {}
+        self._words = {}
+        self._text_table = TextTable()
+        self._word_index = {}
+        self._tables = {}
+
+    def open(self):
+        # Nothing to do up front; each backend opens when first needed.
+        return self
+
+    def close(self):
+        for b in (self._plumber, self._fast):
+            if b is not None:
+                b.close()
+        self._plumber = None
+        self._fast = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def source(self):
+        """What the backends open: the bytes for an in-memory PDF, else the path."""
+        return self.data if self.data is not None else self.path
+
+    def _pdfplumber(self):
+        if self._plumber is None:
+            self._plumber = backends.PdfplumberBackend(self.source)
+        return self._plumber
+
+    def _any(self):
+        """Whichever backend is already open (fast one preferred when neither is)."""
+        if self._plumber is not None:
+            return self._plumber
+        if self.text_backend == 'pdfplumber':
+            return self._pdfplumber()
+        if self._fast is None:
+            self._fast = backends.open_backend(self.text_backend, self.source)
+        return self._fast
+
+    @property
+    def page_count(self):
+        return self._any().page_count
+
+    @property
+    def metadata(self):
+        """Document info dict (Title/Producer/Creator/...); no page parsing."""
+        return self._any().metadata
+
+    def page(self, i):
+        """The pdfplumber page (for width/height and custom crops)."""
+        return self._pdfplumber().pages[i]
+
+    def page_text(self, i):
+        """page.extract_text() or ''"""
+        t = self._text.get(i)
+        if t is None:
+            limits.checkpoint()
+            t = self._pdfplumber().text(i)
+            self._text[i] = t
+        return t
+
+    @property
+    def text(self):
+        """All page texts joined with newlines."""
+        return '\n'.join(self.page_text(i) for i in range(self.page_count))
+
+    def fast_page_text(self, i):
+        """Page text from the configured text backend (page_text() for pdfplumber)."""
+        if self.text_backend == 'pdfplumber':
+            return self.page_text(i)
+        t = self._fast_text.get(i)
+        if t is None:
+            limits.checkpoint()
+            if self._fast is None:
+                self._fast = backends.open_backend(self.text_backend, self.source)
+            t = self._fast.text(i)
+            self._fast_text[i] = t
+        return t
+
+    @property
+    def fast_text(self):
+        """Like text, for parsers that need nothing but plain text."""
+        return '\n'.join(self.fast_page_text(i) for i in range(self.page_count))
+
+    def words(self, i):
+        """page.extract_words() with default settings, as compact Words."""
+        w = self._words.get(i)
+        if w is None:
+            limits.checkpoint()
+            w = Words.from_dicts(self._pdfplumber().words(i), self._text_table)
+            self._words[i] = w
+        return w
+
+    def word_index(self, i):
+        """WordIndex over words(i) for same-line / below-y lookups."""
+        idx = self._word_index.get(i)
+        if idx is None:
+            idx = WordIndex(self.words(i))
+            self._word_index[i] = idx
+        return idx
+
+    def release(self, i):
+        """Free page i's pdfplumber layout cache; memoized results stay."""
+        if self._plumber is not None:
+            self._plumber.release(i)
+
+    def stream(self):
+        """Page indexes in order; each page is released once the loop moves past it."""
+        for i in range(self.page_count):
+            try:
+                yield i
+            finally:
+                self.release(i)
+
+    def tables(self, i, settings, bbox=None, template=None):
+        """extract_tables(settings) on the page, optionally cropped to bbox.
+
+        With template='<merchant>' a learned layout (hk_pdf.templates) is used
+        when this page matches one; the result then holds only the first table.
+        """
+        key = (i, bbox, _settings_key(settings))
+        tb = self._tables.get(key)
+        if tb is None:
+            limits.checkpoint()
+            store = templates.get_store() if template else None
+            if store is not None:
+                tb = templates.tables(self._pdfplumber(), i, settings, bbox, self.words(i), template, store)
+            else:
+                tb = self._pdfplumber().tables(i, settings, bbox)
+            self._tables[key] = tb
+        return tb
+
+
+@contextmanager
+def open_document(source):
+    """Yield a Document for a path or PDF bytes, or pass an existing Document through.
+
+    Only documents opened here are closed on exit, so a caller can share one
+    Document across several parsers.
+    """
+    if isinstance(source, Document):
+        yield source.open()
+        return
+    doc = Document(source)
+    try:
+        yield doc.open()
+    finally:
+        doc.close()
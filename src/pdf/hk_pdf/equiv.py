@@ -0,0 +1,91 @@
+"""Check that the pdfium and pdfplumber text backends give identical parser output.
+
+Every PDF is parsed twice, once per text backend, and the router fingerprint is
+compared too. One JSON line is printed per mismatch, then a summary; the exit
+status is 1 if anything differed.
+
+Usage (from src/pdf):
+  python -m hk_pdf.equiv --base-dir ~/HisabKitab [--merchant zomato]
+  python -m hk_pdf.equiv redbus:/path/a.pdf zomato:/path/b.pdf
+"""
+
+import argparse
+import json
+import sys
+
+from . import backends, backfill, orders, registry, router
+from .__main__ import parse_spec
+from .document import Document
+
+
+def _run(parser, pdf_path, text_backend):
+    doc = Document(pdf_path, text_backend=text_backend)
+    try:
+        try:
+            result = registry.get_parser(parser).parse(doc)
+        except Exception as e:
+            result = {'exception': f'{type(e).__name__}: {e}'}
+        return result, router.fingerprint(doc)
+    finally:
+        doc.close()
+
+
+def diff_keys(a, b):
+    if not isinstance(a, dict) or not isinstance(b, dict):
+        return [] if a == b else ['']
+    return sorted(k for k in set(a) | set(b) if a.get(k) != b.get(k))
+
+
+def compare(parser, pdf_path):
+    """None when both backends agree, else a description of the difference."""
+    ref, ref_fp = _run(parser, pdf_path, 'pdfplumber')
+    got, got_fp = _run(parser, pdf_path, 'pdfium')
+    if ref == got and ref_fp == got_fp:
+        return None
+    out = {'parser': parser, 'path': pdf_path}
+    if ref != got:
+        out['fields'] = diff_keys(ref, got)
+        out['pdfplumber'] = ref
+        out['pdfium'] = got
+    if ref_fp != got_fp:
+        out['fingerprint'] = {'pdfplumber': ref_fp, 'pdfium': got_fp}
+    return out
+
+
+def iter_jobs(args):
+    for spec in args.pdfs:
+        req = parse_spec(spec)
+        yield req['parser'], req['path']
+    if args.base_dir:
+        for parser_id, _msg_id, pdf_path in backfill.find_jobs(args.base_dir, args.merchant):
+            yield orders.PDF_PARSER_IDS[parser_id][0], pdf_path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m hk_pdf.equiv', description='Compare parser output across text backends.')
+    ap.add_argument('pdfs', nargs='*', metavar='PARSER:PATH')
+    ap.add_argument('--base-dir', help='check every PDF under <base-dir>/attachments')
+    ap.add_argument('--merchant', help='with --base-dir: only this attachments/<merchant> directory')
+    args = ap.parse_args(argv)
+
+    if not args.pdfs and not args.base_dir:
+        ap.print_usage(sys.stderr)
+        return 2
+    if not backends.pdfium_available():
+        print('hk_pdf.equiv: pypdfium2 is not installed, nothing to compare', file=sys.stderr)
+        return 2
+
+    checked = 0
+    mismatched = 0
+    for parser, pdf_path in iter_jobs(args):
+        checked += 1
+        d = compare(parser, pdf_path)
+        if d is not None:
+            mismatched += 1
+            print(json.dumps(d, ensure_ascii=False))
+    print(json.dumps({'ok': mismatched == 0, 'checked': checked, 'mismatched': mismatched}))
+    return 1 if mismatched else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
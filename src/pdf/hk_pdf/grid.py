@@ -0,0 +1,310 @@
+"""Geometric table reconstruction from page words (optional numpy).
+
+Some invoice tables are only recoverable from text by regexes over flattened
+lines plus guesses about which neighbouring line holds a wrapped description.
+build() instead loads a page's words into numpy arrays (x0, x1, top, bottom),
+clusters rows by baseline gaps and columns by gaps in the x-coverage histogram,
+and returns a Grid whose columns parsers look up by header name. Each step is
+a handful of vectorized passes, so hundreds of rows per page cost little more
+than a few.
+
+numpy is optional (`pip install numpy`). Without it the same steps run in
+plain Python (ENGINE == 'python'), slower but with identical grids and
+records, so a parse result (and its cache entry) does not depend on whether
+numpy is installed.
+"""
+
+import math
+import statistics
+from bisect import bisect_left
+from itertools import accumulate, groupby
+
+from .words import FIELDS, Words
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+# Baselines closer than this (pt) are one row; matches the text table
+# strategy's snap tolerance.
+ROW_TOL = 3.0
+
+# An x-stripe still counts as a column gutter when at most this share of rows
+# crosses it (full-width totals/footer lines below a table).
+SPILL = 0.1
+
+
+ENGINE = 'numpy' if np is not None else 'python'
+
+
+def _hard_wrap(prev, nxt, width):
+    # A description wrapped mid-word ("...Fresh M" / "ilk 500 ml") when the line
+    # is as long as the column's longest line, ends in a letter and the next
+    # one goes on in lowercase.
+    return len(prev) >= width and prev[-1:].isalpha() and nxt[:1].islower()
+
+
+def join_fragments(parts, width):
+    """Wrapped cell fragments, top to bottom, as one string (see _hard_wrap)."""
+    if not parts:
+        return ''
+    out = [parts[0]]
+    for prev, part in zip(parts, parts[1:]):
+        if not _hard_wrap(prev, part, width):
+            out.append(' ')
+        out.append(part)
+    return ''.join(out)
+
+
+class Grid:
+    """header: list of header cell strings; rows/tops: body rows and their tops."""
+
+    __slots__ = ('header', 'rows', 'tops', 'bounds', 'engine')
+
+    def __init__(self, header, rows, tops, bounds, engine=ENGINE):
+        self.header = header
+        self.rows = rows
+        self.tops = tops
+        self.bounds = bounds
+        self.engine = engine
+
+    def column(self, *needles, last=False):
+        """Index of the first (or last) header cell containing every needle (lowercase)."""
+        found = None
+        for i, h in enumerate(self.header):
+            low = h.lower()
+            if all(n in low for n in needles):
+                if not last:
+                    return i
+                found = i
+        return found
+
+    def records(self, anchor):
+        """Merge wrapped lines into items.
+
+        anchor(row) says whether a body row starts an item (e.g. it has a serial
+        number). Every other row is joined, cell by cell, to the anchor row
+        nearest to it vertically, so descriptions wrapped above and/or below
+        the numbered line stay with their item. Rows before the first and
+        after the last anchor attach to it as well. Fragments are joined with
+        a space, or without one where a word was wrapped mid-way (_hard_wrap).
+        """
+        owner, n = (self._owners_np if self.engine == 'numpy' else self._owners_py)(anchor)
+        if not n:
+            return []
+        ncols = len(self.bounds) + 1
+        widths = [max((len(r[ci]) for r in self.rows), default=0) for ci in range(ncols)]
+        merged = [[[] for _ in range(ncols)] for _ in range(n)]
+        for ri in sorted(range(len(self.rows)), key=self.tops.__getitem__):
+            dst = merged[owner[ri]]
+            for ci, cell in enumerate(self.rows[ri]):
+                if cell:
+                    dst[ci].append(cell)
+        return [[join_fragments(parts, widths[ci]) for ci, parts in enumerate(rec)] for rec in merged]
+
+    def _owners_np(self, anchor):
+        """Anchor index owning each row (nearest by top, ties to the one above), anchor count."""
+        is_anchor = np.fromiter((bool(anchor(r)) for r in self.rows), bool, len(self.rows))
+        anchors = np.flatnonzero(is_anchor)
+        if not len(anchors):
+            return None, 0
+        tops = self.tops
+        a_tops = tops[anchors]
+        # nearest anchor per row; ties go to the anchor above
+        j = np.clip(np.searchsorted(a_tops, tops), 1, max(len(anchors) - 1, 1))
+        if len(anchors) == 1:
+            owner = np.zeros(len(tops), int)
+        else:
+            below = a_tops[j] - tops
+            above = tops - a_tops[j - 1]
+            owner = np.where(above <= below, j - 1, j)
+        owner[anchors] = np.arange(len(anchors))
+        return owner.tolist(), len(anchors)
+
+    def _owners_py(self, anchor):
+        anchors = [i for i, r in enumerate(self.rows) if anchor(r)]
+        if not anchors:
+            return None, 0
+        tops = self.tops
+        a_tops = [tops[a] for a in anchors]
+        hi = max(len(anchors) - 1, 1)
+        owner = []
+        for t in tops:
+            if len(anchors) == 1:
+                owner.append(0)
+                continue
+            j = min(max(bisect_left(a_tops, t), 1), hi)
+            owner.append(j - 1 if t - a_tops[j - 1] <= a_tops[j] - t else j)
+        for k, a in enumerate(anchors):
+            owner[a] = k
+        return owner, len(anchors)
+
+
+def build(words, top=None, bottom=None, header_height=None, row_tol=ROW_TOL, col_gap=None, spill=SPILL,
+          engine=None):
+    """Grid over the words whose top lies in [top, bottom), or None if there are none.
+
+    Header: rows starting within header_height of the first row (default: the
+    first row only), merged cell by cell. col_gap is the narrowest empty
+    x-stripe that separates columns; the default, half the median word height,
+    is wider than a word space and narrower than a column gutter. Stripes
+    crossed by up to spill * rows words still separate columns.
+
+    engine: 'numpy' or 'python' (default ENGINE); both give the same Grid.
+    """
+    if not isinstance(words, Words):
+        words = Words.from_dicts(words)
+    if not len(words):
+        return None
+    if (engine or ENGINE) == 'python':
+        return _build_py(words, top, bottom, header_height, row_tol, col_gap, spill)
+    # zero-copy views of the Words columns
+    x0, x1, tp, bt = (np.frombuffer(getattr(words, f), float) for f in FIELDS)
+    keep = np.ones(len(x0), bool)
+    if top is not None:
+        keep &= tp >= top
+    if bottom is not None:
+        keep &= tp < bottom
+    sel = np.flatnonzero(keep)
+    n = len(sel)
+    if not n:
+        return None
+    x0, x1, tp, bt = x0[sel], x1[sel], tp[sel], bt[sel]
+    texts = words.table.texts
+    text = [texts[words.text_ids[k]] for k in sel.tolist()]
+
+    # rows: sort baselines, break wherever the gap to the previous one exceeds row_tol
+    order = np.argsort(bt, kind='stable')
+    brk = np.zeros(n, bool)
+    brk[1:] = np.diff(bt[order]) > row_tol
+    row = np.empty(n, int)
+    row[order] = np.cumsum(brk)
+    nrows = int(row.max()) + 1
+    row_top = np.full(nrows, np.inf)
+    np.minimum.at(row_top, row, tp)
+
+    nhead = 1
+    if header_height is not None:
+        nhead = max(1, int(np.count_nonzero(row_top < row_top[0] + header_height)))
+    head = row < nhead
+    body = ~head if nhead < nrows else head
+
+    # columns: x-coverage histogram of the body words at 1pt resolution;
+    # near-empty stripes of col_gap+ points are gutters
+    if col_gap is None:
+        col_gap = max(2.0, float(np.median(bt - tp)) / 2)
+    lo = np.floor(x0[body]).astype(int)
+    hi = np.ceil(x1[body]).astype(int)
+    origin = int(lo.min())
+    cov = np.zeros(int(hi.max()) - origin + 2, int)
+    np.add.at(cov, lo - origin, 1)
+    np.add.at(cov, hi - origin, -1)
+    empty = np.cumsum(cov)[:-1] <= int((nrows - nhead) * spill)
+    edges = np.diff(np.concatenate(([0], empty.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    wide = (ends - starts) >= col_gap
+    bounds = (starts[wide] + ends[wide]) / 2 + origin
+    col = np.searchsorted(bounds, (x0 + x1) / 2)
+    ncols = len(bounds) + 1
+
+    # header labels are often wider than their column: place each phrase
+    # (words closer than col_gap on one row) by its centre
+    hk = np.flatnonzero(head)
+    hk = hk[np.lexsort((x0[hk], row[hk]))]
+    pbrk = np.ones(len(hk), bool)
+    pbrk[1:] = (row[hk][1:] != row[hk][:-1]) | (x0[hk][1:] - x1[hk][:-1] >= col_gap)
+    pid = np.cumsum(pbrk) - 1
+    p0 = np.full(pid[-1] + 1, np.inf)
+    p1 = np.full(pid[-1] + 1, -np.inf)
+    np.minimum.at(p0, pid, x0[hk])
+    np.maximum.at(p1, pid, x1[hk])
+    col[hk] = np.searchsorted(bounds, (p0 + p1) / 2)[pid]
+
+    # cells: words ordered by row, column, then x
+    cells = [[''] * ncols for _ in range(nrows)]
+    for (r, c), grp in groupby(np.lexsort((x0, col, row)), key=lambda k: (row[k], col[k])):
+        cells[r][c] = ' '.join(text[k] for k in grp)
+
+    header = [' '.join(p for p in parts if p) for parts in zip(*cells[:nhead])]
+    return Grid(header, cells[nhead:], row_top[nhead:], bounds)
+
+
+def _build_py(words, top, bottom, header_height, row_tol, col_gap, spill):
+    """build() step for step in plain Python (same floats, same tie-breaking)."""
+    sel = [k for k, t in enumerate(words.top)
+           if (top is None or t >= top) and (bottom is None or t < bottom)]
+    n = len(sel)
+    if not n:
+        return None
+    x0 = [words.x0[k] for k in sel]
+    x1 = [words.x1[k] for k in sel]
+    tp = [words.top[k] for k in sel]
+    bt = [words.bottom[k] for k in sel]
+    texts = words.table.texts
+    text = [texts[words.text_ids[k]] for k in sel]
+
+    order = sorted(range(n), key=bt.__getitem__)
+    row = [0] * n
+    r = 0
+    for prev, k in zip([None] + order, order):
+        if prev is not None and bt[k] - bt[prev] > row_tol:
+            r += 1
+        row[k] = r
+    nrows = r + 1
+    row_top = [float('inf')] * nrows
+    for k in range(n):
+        if tp[k] < row_top[row[k]]:
+            row_top[row[k]] = tp[k]
+
+    nhead = 1
+    if header_height is not None:
+        nhead = max(1, sum(1 for t in row_top if t < row_top[0] + header_height))
+    head = [rw < nhead for rw in row]
+    body = [not h for h in head] if nhead < nrows else head
+
+    if col_gap is None:
+        col_gap = max(2.0, float(statistics.median(b - t for b, t in zip(bt, tp))) / 2)
+    bk = [k for k in range(n) if body[k]]
+    lo = [math.floor(x0[k]) for k in bk]
+    hi = [math.ceil(x1[k]) for k in bk]
+    origin = min(lo)
+    cov = [0] * (max(hi) - origin + 2)
+    for a in lo:
+        cov[a - origin] += 1
+    for b in hi:
+        cov[b - origin] -= 1
+    limit = int((nrows - nhead) * spill)
+    empty = [c <= limit for c in list(accumulate(cov))[:-1]]
+    bounds = []
+    start = None
+    for i, e in enumerate(empty + [False]):
+        if e and start is None:
+            start = i
+        elif not e and start is not None:
+            if i - start >= col_gap:
+                bounds.append((start + i) / 2 + origin)
+            start = None
+    col = [bisect_left(bounds, (a + b) / 2) for a, b in zip(x0, x1)]
+    ncols = len(bounds) + 1
+
+    hk = sorted((k for k in range(n) if head[k]), key=lambda k: (row[k], x0[k]))
+    phrases = []
+    for i, k in enumerate(hk):
+        if i == 0 or row[k] != row[hk[i - 1]] or x0[k] - x1[hk[i - 1]] >= col_gap:
+            phrases.append([k])
+        else:
+            phrases[-1].append(k)
+    for ks in phrases:
+        c = bisect_left(bounds, (min(x0[k] for k in ks) + max(x1[k] for k in ks)) / 2)
+        for k in ks:
+            col[k] = c
+
+    cells = [[''] * ncols for _ in range(nrows)]
+    ordered = sorted(range(n), key=lambda k: (row[k], col[k], x0[k]))
+    for (r, c), grp in groupby(ordered, key=lambda k: (row[k], col[k])):
+        cells[r][c] = ' '.join(text[k] for k in grp)
+
+    header = [' '.join(p for p in parts if p) for parts in zip(*cells[:nhead])]
+    return Grid(header, cells[nhead:], row_top[nhead:], bounds, 'python')
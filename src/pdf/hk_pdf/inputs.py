@@ -0,0 +1,109 @@
+"""PDF input other than a saved file: raw bytes on stdin or Gmail base64url.
+
+Gmail hands attachments over as base64url text. Parsers can take that (or raw
+PDF bytes) directly and parse from memory, so the fetch -> parse path needs no
+temporary file:
+
+  parse_zepto_invoice.py - < invoice.pdf
+  parse_zepto_invoice.py --base64url - < attachment.b64
+  server request: {"id": 1, "parser": "zepto", "data": "<base64url>"}
+
+Base64url is decoded incrementally (Base64urlDecoder), in 64 KiB reads from
+stdin; padding is optional and standard base64 ('+/') is accepted too.
+
+A local server can also be handed the PDF without any copy: an open file
+descriptor (SCM_RIGHTS, see hk_pdf.server) or the name of a POSIX shared-memory
+segment (/dev/shm/<name>) the caller already wrote it to. Either is mapped
+with map_fd() and parsed straight from the mapping.
+"""
+
+import base64
+import mmap
+import os
+import sys
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 16
+
+SHM_DIR = '/dev/shm'
+
+_DROP = b' \t\r\n='
+
+
+class Base64urlDecoder:
+    """Incremental base64url decoder: feed() text chunks, then finish()."""
+
+    def __init__(self):
+        self._pending = b''
+
+    def feed(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('ascii')
+        data = self._pending + bytes(chunk).translate(None, _DROP)
+        n = len(data) - len(data) % 4
+        self._pending = data[n:]
+        return base64.urlsafe_b64decode(data[:n]) if n else b''
+
+    def finish(self):
+        rest = self._pending
+        self._pending = b''
+        if not rest:
+            return b''
+        if len(rest) == 1:
+            raise ValueError('truncated base64url data')
+        return base64.urlsafe_b64decode(rest + b'=' * (-len(rest) % 4))
+
+
+def decode_base64url(data):
+    dec = Base64urlDecoder()
+    return dec.feed(data) + dec.finish()
+
+
+def read_stream(f, base64url=False):
+    """All of binary stream f as PDF bytes (decoding base64url as it is read)."""
+    if not base64url:
+        return f.read()
+    dec = Base64urlDecoder()
+    out = bytearray()
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+        out += dec.feed(chunk)
+    out += dec.finish()
+    return bytes(out)
+
+
+def split_args(argv):
+    """parse_*_invoice.py argv -> (set of --flags, positional args); '-' is positional."""
+    flags = {a for a in argv if a.startswith('--')}
+    return flags, [a for a in argv if not a.startswith('--')]
+
+
+def source_arg(arg, base64url=False):
+    """A parser script's <pdf> argument: '-' reads the PDF from stdin, else a path."""
+    if arg == '-':
+        return read_stream(sys.stdin.buffer, base64url=base64url)
+    pdf_path = Path(arg)
+    if not pdf_path.exists():
+        raise SystemExit(f'File not found: {pdf_path}')
+    return pdf_path
+
+
+def map_fd(fd, size=None):
+    """Map the PDF open on fd (a file or shm segment); fd may be closed afterwards.
+
+    The mapping is private copy-on-write, which pdfium needs for a writable
+    buffer; nothing is ever written, so no page is copied. `size` trims a
+    segment rounded up past the end of the PDF.
+    """
+    return mmap.mmap(fd, int(size or 0), access=mmap.ACCESS_COPY)
+
+
+def map_shm(name, size=None):
+    """Map the POSIX shared-memory segment `name` (shm_open naming, leading '/' optional)."""
+    name = str(name).lstrip('/')
+    if not name or '/' in name or name in ('.', '..'):
+        raise ValueError(f'bad shared memory name: {name!r}')
+    fd = os.open(os.path.join(SHM_DIR, name), os.O_RDONLY)
+    try:
+        return map_fd(fd, size)
+    finally:
+        os.close(fd)
@@ -0,0 +1,168 @@
+"""Per-PDF resource limits, so one pathological PDF cannot stall a whole run.
+
+A parse that breaches a limit stops and returns a structured result instead
+of its normal output:
+
+  {"ok": false, "reason": "timeout" | "too_many_pages" | "too_large" | "oom"}
+
+Limits (environment, 0 disables one):
+  HK_PDF_TIMEOUT      wall-clock seconds per PDF (default 60)
+  HK_PDF_MAX_PAGES    pages per PDF (default 1000)
+  HK_PDF_MAX_BYTES    PDF size in bytes (default 50 MiB)
+  HK_PDF_MAX_RSS_MB   resident memory of the parsing process (default 1536)
+
+Size and page count are checked before parsing. Time and memory are checked
+at every page the Document extracts and, in the main thread, every
+TICK seconds by a SIGALRM watchdog, which also catches pdfminer spinning
+inside one page (e.g. a broken xref). Running out of memory outright
+(MemoryError) is reported as "oom" too.
+
+Signals only reach the main thread: a parse run under limits in any other
+thread gets the per-page checks but no hard timeout, so one stuck inside a
+page is not interrupted. The socket server therefore runs its parses on the
+main thread (hk_pdf.server); other callers should do the same.
+
+A breach raises LimitExceeded, a BaseException: the parsers' `except
+Exception` fallbacks let it through, so a parse cut short never comes back
+as a (cached) partial result.
+
+registry.parse_pdf(..., limits=Limits.from_env()) applies them; the server,
+the batch runner and the backfill do that for every PDF.
+"""
+
+import os
+import signal
+import threading
+import time
+
+REASONS = ('timeout', 'too_many_pages', 'too_large', 'oom')
+
+TICK = 0.25
+
+_local = threading.local()
+
+
+class LimitExceeded(BaseException):
+    # BaseException, like KeyboardInterrupt: the parsers' own `except Exception`
+    # fallbacks must not turn a breach into a partial result (which would be cached).
+    def __init__(self, reason, detail=''):
+        super().__init__(f'{reason}: {detail}' if detail else reason)
+        self.reason = reason
+
+
+def _env_number(name, default):
+    raw = os.environ.get(name)
+    if raw is None or not raw.strip():
+        return default
+    return float(raw)
+
+
+def rss_mb():
+    """Current resident set size in MiB (peak RSS where /proc is missing)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def failure(reason):
+    return {'ok': False, 'reason': reason}
+
+
+def is_failure(out):
+    return isinstance(out, dict) and out.get('ok') is False and out.get('reason') in REASONS
+
+
+class Limits:
+    def __init__(self, timeout=60, max_pages=1000, max_bytes=50 << 20, max_rss_mb=1536):
+        self.timeout = timeout or None
+        self.max_pages = max_pages or None
+        self.max_bytes = max_bytes or None
+        self.max_rss_mb = max_rss_mb or None
+
+    @classmethod
+    def from_env(cls):
+        d = cls()
+        return cls(
+            timeout=_env_number('HK_PDF_TIMEOUT', d.timeout or 0),
+            max_pages=int(_env_number('HK_PDF_MAX_PAGES', d.max_pages or 0)),
+            max_bytes=int(_env_number('HK_PDF_MAX_BYTES', d.max_bytes or 0)),
+            max_rss_mb=_env_number('HK_PDF_MAX_RSS_MB', d.max_rss_mb or 0),
+        )
+
+    def over_rss(self):
+        return self.max_rss_mb is not None and rss_mb() > self.max_rss_mb
+
+    def check_document(self, doc):
+        """Size and page count, before any page is parsed."""
+        if self.max_bytes is not None:
+            size = len(doc.data) if doc.data is not None else os.path.getsize(doc.path)
+            if size > self.max_bytes:
+                raise LimitExceeded('too_large', f'{size} bytes')
+        if self.max_pages is not None and doc.page_count > self.max_pages:
+            raise LimitExceeded('too_many_pages', f'{doc.page_count} pages')
+
+    def run(self, fn, doc):
+        """fn(doc) under these limits, or failure(reason) when one is breached."""
+        try:
+            self.check_document(doc)
+            with _Watch(self):
+                return fn(doc)
+        except LimitExceeded as e:
+            return failure(e.reason)
+        except MemoryError:
+            return failure('oom')
+
+
+class _Watch:
+    """Deadline + RSS checks for one parse: checkpoint() calls, plus SIGALRM ticks in the main thread."""
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.deadline = None
+        self._armed = False
+        self._fired = False
+        self._prev = None
+
+    def check(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise LimitExceeded('timeout', f'over {self.limits.timeout:g}s')
+        if self.limits.over_rss():
+            raise LimitExceeded('oom', f'RSS over {self.limits.max_rss_mb:g} MiB')
+
+    def _tick(self, signum, frame):
+        # Interrupt the parse once; later ticks must not hit its cleanup.
+        if self._fired:
+            return
+        try:
+            self.check()
+        except LimitExceeded:
+            self._fired = True
+            raise
+
+    def __enter__(self):
+        if self.limits.timeout is not None:
+            self.deadline = time.monotonic() + self.limits.timeout
+        _local.watch = self
+        if threading.current_thread() is threading.main_thread() and hasattr(signal, 'setitimer'):
+            self._prev = signal.signal(signal.SIGALRM, self._tick)
+            signal.setitimer(signal.ITIMER_REAL, TICK, TICK)
+            self._armed = True
+        return self
+
+    def __exit__(self, *exc):
+        if self._armed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._prev)
+            self._armed = False
+        _local.watch = None
+
+
+def checkpoint():
+    """Raise LimitExceeded if the parse running in this thread is over a limit."""
+    watch = getattr(_local, 'watch', None)
+    if watch is not None:
+        watch.check()
@@ -0,0 +1,118 @@
+"""Change manifest + write-ahead journal, for incremental and resumable backfills.
+
+Manifest (SQLite, <baseDir>/backfill_manifest.sqlite): one row per PDF that
+last parsed cleanly, with its size, mtime, sha256, parser and parser version.
+A PDF whose size and mtime still match is skipped without being read; one
+whose stat changed is hashed and skipped if its sha256 did not (the row gets
+the new stat). Bumping a parser's PARSER_VERSION re-parses its PDFs.
+
+Journal (<baseDir>/backfill_journal.ndjson): append-only, one fsynced line
+per finished PDF:
+
+  {"path", "message_id", "parser_id", "version", "size", "mtime_ns", "sha256",
+   "ok", "unchanged", "events": [...]}
+
+At each checkpoint the journaled events go into the order store, the clean
+entries into the manifest (one transaction) and only then is the journal
+truncated. A run killed at any point resumes from the journal: the PDFs in it
+are not parsed again. Replaying entries that were already checkpointed is
+harmless, both writes are upserts; a torn last line (killed mid-write) is
+dropped.
+"""
+
+import os
+import sqlite3
+import time
+
+from . import ndjson
+
+MANIFEST_NAME = 'backfill_manifest.sqlite'
+JOURNAL_NAME = 'backfill_journal.ndjson'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+  path TEXT PRIMARY KEY,
+  size INTEGER NOT NULL,
+  mtime_ns INTEGER NOT NULL,
+  sha256 TEXT NOT NULL,
+  parser_id TEXT NOT NULL,
+  version INTEGER NOT NULL,
+  updated_at INTEGER NOT NULL
+);
+"""
+
+
+def stat_key(pdf_path):
+    st = os.stat(pdf_path)
+    return st.st_size, st.st_mtime_ns
+
+
+class Manifest:
+    def __init__(self, db_path):
+        self.path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def load(self):
+        """path -> (size, mtime_ns, sha256, parser_id, version)."""
+        rows = self._db.execute('SELECT path, size, mtime_ns, sha256, parser_id, version FROM files')
+        return {r[0]: r[1:] for r in rows}
+
+    def record(self, entries):
+        """Upsert journal entries (callers pass only the clean ones) in one transaction."""
+        now = int(time.time())
+        with self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256, parser_id, version, updated_at) '
+                'VALUES (?,?,?,?,?,?,?)',
+                [(e['path'], e['size'], e['mtime_ns'], e['sha256'], e['parser_id'], e['version'], now)
+                 for e in entries],
+            )
+
+    def close(self):
+        self._db.close()
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._f = open(path, 'a+b')
+
+    def replay(self):
+        """Entries a killed run left behind; a torn tail is cut off so appends start clean."""
+        self._f.seek(0)
+        out = []
+        good = 0
+        for line in self._f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                out.append(ndjson.loads(line))
+            except ValueError:
+                break
+            good += len(line)
+        self._f.truncate(good)
+        return out
+
+    def append(self, entry):
+        self._f.write(ndjson.dumps(entry).encode('utf8') + b'\n')
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def truncate(self):
+        self._f.truncate(0)
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        self._f.close()
+
+
+def unchanged(prev, size, mtime_ns, parser_id, version):
+    """True when a manifest row still describes the PDF without reading it."""
+    return prev is not None and tuple(prev[:2]) == (size, mtime_ns) and tuple(prev[3:]) == (parser_id, version)
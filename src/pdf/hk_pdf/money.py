@@ -0,0 +1,100 @@
+"""Money as integer paise, shared by the parsers.
+
+Amounts go straight from PDF text to int paise ("₹ 1,234.50", "Rs. 99",
+"+5.00", "-20", orphan decimals like ".5" and "12."), are summed as integers, and only become
+rupees (float) for the parsers' existing JSON fields. with_paise() puts the
+exact <field>_paise value next to each of those, so consumers can compare
+amounts exactly instead of within a tolerance.
+
+  money.to_paise('₹ 1,234.50')            -> 123450
+  money.to_paise('Total 40.00 incl. GST', search=True) -> 4000
+  money.rupees('1,234.5')                 -> 1234.5
+
+Rounding: an amount finer than a paisa is rounded to the nearest paisa, a
+half paisa away from zero (ROUNDING: '12.345' -> 1235, '12.344' -> 1234,
+'-0.005' -> -1). to_paise(..., strict=True) refuses such text instead (None),
+for callers that must not accept a silently rounded amount; numbers (floats
+from arithmetic) are always rounded.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from .patterns import COMMON as C
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+# total() sums batches at least this long as a numpy int64 array.
+NUMPY_MIN = 4096
+
+ROUNDING = ROUND_HALF_UP
+_PAISA = Decimal('0.01')
+
+
+def _decimal(s, search, strict=False):
+    if s is None or isinstance(s, bool):
+        return None
+    if isinstance(s, (int, float, Decimal)):
+        d = Decimal(str(s))
+        return d if d.is_finite() else None
+    t = C.currency.sub('', str(s)).strip()
+    m = C.amount.search(t) if search else C.amount.fullmatch(t)
+    if not m:
+        return None
+    d = Decimal(m.group(2).replace(',', ''))
+    if strict and d != d.quantize(_PAISA):
+        return None
+    # A sign before the first amount in running text is punctuation, not a sign.
+    return -d if m.group(1) == '-' and not search else d
+
+
+def to_paise(s, search=False, strict=False):
+    """Amount (text or number) -> int paise (see Rounding above); None if it is not one.
+
+    search=True takes the first amount anywhere in the text instead of
+    requiring the whole string to be one. strict=True returns None for text
+    with non-zero digits below a paisa instead of rounding them.
+    """
+    d = _decimal(s, search, strict)
+    if d is None:
+        return None
+    return int((d * 100).quantize(Decimal(1), rounding=ROUNDING))
+
+
+def to_rupees(paise):
+    return None if paise is None else paise / 100
+
+
+def rupees(s, search=False):
+    """to_paise() as a rupee float, for the JSON fields that predate paise."""
+    return to_rupees(to_paise(s, search))
+
+
+def number(s, search=False):
+    """A plain decimal (rates, percentages) as float, parsed like an amount."""
+    d = _decimal(s, search)
+    return None if d is None else float(d)
+
+
+def total(paise):
+    """Exact sum of the known values (None skipped), or None when none is known."""
+    if np is not None and isinstance(paise, np.ndarray):
+        return int(paise.sum(dtype=np.int64)) if paise.size else None
+    known = [p for p in paise if p is not None]
+    if not known:
+        return None
+    if np is not None and len(known) >= NUMPY_MIN:
+        return int(np.asarray(known, dtype=np.int64).sum())
+    return sum(known)
+
+
+def with_paise(d, fields):
+    """Copy of d with <field>_paise right after each of fields present in it."""
+    out = {}
+    for k, v in d.items():
+        out[k] = v
+        if k in fields:
+            out[k + '_paise'] = to_paise(v)
+    return out
@@ -0,0 +1,33 @@
+"""Compact one-line JSON for the NDJSON streams (server, batch, --ndjson, journals).
+
+orjson is used when installed (`pip install orjson`); it is several times
+faster than the stdlib on large item lists. Without it, or for anything orjson
+refuses (non-str keys, huge ints), stdlib json writes the same compact form:
+no spaces after separators, non-ASCII text kept as UTF-8.
+"""
+
+import json
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def dumps(obj):
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode('utf8')
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(s):
+    return orjson.loads(s) if orjson is not None else json.loads(s)
+
+
+def write(out, obj):
+    """One record per line, flushed so the reader sees it right away."""
+    out.write(dumps(obj) + '\n')
+    out.flush()
@@ -0,0 +1,167 @@
+"""Order events + orders_parsed.json merge, mirroring the Node side.
+
+to_order_events() produces the same records as src/parsers/orders/*_pdf_v1.js
+and merge_orders() follows mergeOrders() in gmail_parse_orders_v2_stateful.js,
+so a python-side rebuild and a Gmail run write interchangeable files.
+"""
+
+import json
+import os
+
+from . import limits
+
+# JS parser id -> (python parser, merchant label on the event)
+PDF_PARSER_IDS = {
+    'ZEPTO_PDF_V1': ('zepto', 'ZEPTO'),
+    'BLINKIT_PDF_V1': ('blinkit', 'BLINKIT'),
+    'SWIGGY_PDF_V1': ('swiggy', 'SWIGGY'),
+    'SWIGGY_INSTAMART_PDF_V1': ('swiggy', 'SWIGGY_INSTAMART'),
+    'ZOMATO_PDF_V1': ('zomato', 'ZOMATO'),
+    'DISTRICT_PDF_V1': ('district', 'DISTRICT'),
+    'EATCLUB_PDF_V1': ('eatclub', 'EATCLUB'),
+    'REDBUS_PDF_V1': ('redbus', 'REDBUS'),
+}
+
+
+def error_event(merchant, error, pdf_path, message_id):
+    return {
+        'merchant': merchant,
+        'parse_status': 'error',
+        'parse_error': error or 'python failed',
+        'pdfPath': pdf_path,
+        'messageId': message_id,
+    }
+
+
+def to_order_events(parser_id, parsed, message_id, pdf_path):
+    _, merchant = PDF_PARSER_IDS[parser_id]
+
+    # A PDF over an hk_pdf.limits limit is an error (retried next run), like
+    # fromResult() in run_pdf_parser.js, not an empty or foreign PDF.
+    if limits.is_failure(parsed):
+        return [error_event(merchant, f"pdf limit: {parsed['reason']}", pdf_path, message_id)]
+
+    if merchant == 'ZEPTO':
+        return [{
+            'merchant': merchant,
+            'parse_status': 'ok',
+            'messageId': message_id,
+            'order_id': parsed.get('order_number'),
+            'invoice_number': parsed.get('invoice_number'),
+            'date': parsed.get('date'),
+            'invoice_date': parsed.get('invoice_date'),
+            'invoice_date_ms': parsed.get('invoice_date_ms'),
+            'total': parsed.get('invoice_value'),
+            'total_paise': parsed.get('invoice_value_paise'),
+            'item_total': parsed.get('item_total'),
+            'handling_fee': parsed.get('handling_fee'),
+            'items': parsed.get('items') or [],
+            'validation': parsed.get('validation'),
+            'pdfPath': pdf_path,
+        }]
+
+    if merchant == 'BLINKIT':
+        total = parsed.get('overall_total')
+        return [{
+            'merchant': merchant,
+            'parse_status': 'ok',
+            'messageId': message_id,
+            'order_id': parsed.get('order_id'),
+            'invoice_number': parsed.get('invoice_number'),
+            'date': parsed.get('date'),
+            'invoice_date': parsed.get('invoice_date'),
+            'invoice_date_ms': parsed.get('invoice_date_ms'),
+            'total': total if total is not None else parsed.get('grand_total'),
+            'total_paise': parsed.get('overall_total_paise' if total is not None else 'grand_total_paise'),
+            'invoices': parsed.get('invoices') or [],
+            'validation': parsed.get('validation'),
+            'pdfPath': pdf_path,
+        }]
+
+    # Text parsers: {ok:false} means "not this merchant's PDF" -> ignore.
+    if not parsed or parsed.get('ok') is False:
+        return []
+    total = parsed.get('total')
+    items = parsed.get('items') or []
+    if total is None and not items:
+        return []
+
+    if merchant == 'EATCLUB':
+        order_id = parsed.get('tracking_id') or None
+    elif merchant == 'REDBUS':
+        order_id = parsed.get('invoice_no') or None
+    else:
+        order_id = parsed.get('order_id') or None
+
+    return [{
+        'merchant': merchant,
+        'parse_status': 'ok',
+        'messageId': message_id,
+        'order_id': order_id,
+        'invoice_number': parsed.get('invoice_no') or None,
+        'date': parsed.get('date') or None,
+        'invoice_date': parsed.get('invoice_date') or None,
+        'invoice_date_ms': parsed.get('invoice_date_ms'),
+        'total': total,
+        'total_paise': parsed.get('total_paise'),
+        'items': items,
+        'validation': parsed.get('validation'),
+        'pdfPath': pdf_path,
+    }]
+
+
+def order_key(o):
+    """Same key as keyOf() in mergeOrders."""
+    mid = o.get('messageId')
+    if mid and o.get('pdfPath'):
+        return mid + '::' + o['pdfPath']
+    if mid and o.get('invoice_number'):
+        return mid + '::' + str(o['invoice_number'])
+    if mid and o.get('order_id'):
+        return mid + '::' + str(o['order_id'])
+    if mid:
+        return mid
+    return json.dumps(o, separators=(',', ':'))[:200]
+
+
+def read_orders(out_path):
+    try:
+        with open(out_path, encoding='utf8') as f:
+            return json.load(f)
+    except Exception:
+        return {'orders': [], 'unknown': []}
+
+
+def write_json_atomic(out_path, obj):
+    tmp = out_path + '.tmp'
+    with open(tmp, 'w', encoding='utf8') as f:
+        json.dump(obj, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, out_path)
+
+
+def merge_orders(out_path, events, unknown=None):
+    """Merge events into orders_parsed.json (existing first, then new by key).
+
+    Gmail metadata a backfill cannot know (internalDateMs) is carried over from
+    the existing record with the same key. `unknown=None` keeps the file's
+    current unknown list.
+    """
+    existing = read_orders(out_path)
+
+    by_key = {}
+    for o in existing.get('orders') or []:
+        by_key[order_key(o)] = o
+    for o in events:
+        k = order_key(o)
+        prev = by_key.get(k)
+        if prev is not None and 'internalDateMs' in prev and 'internalDateMs' not in o:
+            o = dict(o)
+            o['internalDateMs'] = prev['internalDateMs']
+        by_key[k] = o
+
+    merged = list(by_key.values())
+    merged_unknown = (existing.get('unknown') or []) if unknown is None else unknown
+    write_json_atomic(out_path, {'ok': True, 'count': len(merged), 'orders': merged, 'unknown': merged_unknown})
+    return {'outPath': out_path, 'total': len(merged), 'unknown_total': len(merged_unknown)}
@@ -0,0 +1,381 @@
+"""Precompiled regex registry shared by the invoice parsers.
+
+Every pattern the parsers use lives here, compiled once at import, in named
+per-merchant sets with a version (bump a set's version when you change one of
+its patterns). Each pattern counts calls and hits, so dead or never-matching
+alternatives show up in `python -m hk_pdf --pattern-stats ...` or the server's
+{"op": "pattern_stats"}.
+
+  from hk_pdf.patterns import ZEPTO as P, find_first
+  find_first([P.invoice_number], text)
+"""
+
+import re
+
+
+class Pattern:
+    """A compiled regex that counts calls and hits."""
+
+    __slots__ = ('name', 'regex', 'calls', 'hits')
+
+    def __init__(self, name, pattern, flags=0):
+        self.name = name
+        self.regex = re.compile(pattern, flags)
+        self.calls = 0
+        self.hits = 0
+
+    def _count(self, m):
+        self.calls += 1
+        if m is not None:
+            self.hits += 1
+        return m
+
+    def search(self, s, *args):
+        return self._count(self.regex.search(s, *args))
+
+    def match(self, s, *args):
+        return self._count(self.regex.match(s, *args))
+
+    def fullmatch(self, s, *args):
+        return self._count(self.regex.fullmatch(s, *args))
+
+    def finditer(self, s, *args):
+        self.calls += 1
+        for m in self.regex.finditer(s, *args):
+            self.hits += 1
+            yield m
+
+    def sub(self, repl, s, count=0):
+        out, n = self.regex.subn(repl, s, count)
+        self.calls += 1
+        if n:
+            self.hits += 1
+        return out
+
+    def __repr__(self):
+        return f'Pattern({self.name!r}, {self.regex.pattern!r})'
+
+
+class PatternSet:
+    """Named patterns for one merchant; access as attributes (P.invoice_number)."""
+
+    def __init__(self, name, version, defs):
+        self.name = name
+        self.version = version
+        self._patterns = {}
+        for key, spec in defs.items():
+            pattern, flags = spec if isinstance(spec, tuple) else (spec, 0)
+            p = Pattern(f'{name}.{key}', pattern, flags)
+            self._patterns[key] = p
+            setattr(self, key, p)
+
+    def stats(self):
+        return {k: {'calls': p.calls, 'hits': p.hits} for k, p in self._patterns.items()}
+
+    def reset(self):
+        for p in self._patterns.values():
+            p.calls = 0
+            p.hits = 0
+
+
+SETS = {}
+
+
+def define(name, version, **defs):
+    ps = PatternSet(name, version, defs)
+    SETS[name] = ps
+    return ps
+
+
+def find_first(patterns, text, group=1):
+    """First pattern (in list order) that matches anywhere wins."""
+    for pat in patterns:
+        m = pat.search(text)
+        if m:
+            return m.group(group).strip()
+    return None
+
+
+# Literal word a pattern must start with (r"\bInvoice\s*Value..." -> "Invoice").
+_LEAD = re.compile(r'^(?:\\b)?([A-Za-z]+)')
+
+
+class HeaderScanner:
+    """Fill several header fields in one left-to-right pass over the text.
+
+    fields maps name -> patterns in priority order, exactly as they would be
+    passed to find_first(); scan() returns the same values find_first() would,
+    field by field. Instead of one full-text search per alternative, a single
+    keyword regex walks the text, stopping only where some pending pattern's
+    leading word occurs, and tries just those patterns there. Once a field has
+    its top-priority match its patterns drop out of the keyword set, and the
+    scan ends as soon as nothing is pending. Patterns without a leading word
+    (e.g. a bare date) fall back to an ordinary search.
+    """
+
+    def __init__(self, fields):
+        self.fields = {name: list(pats) for name, pats in fields.items()}
+        self._lead = {}
+        for pats in self.fields.values():
+            for pat in pats:
+                m = _LEAD.match(pat.regex.pattern)
+                if m:
+                    self._lead[pat.name] = m.group(1).lower()
+        self._keywords = {}
+
+    def _keyword_re(self, leads):
+        rx = self._keywords.get(leads)
+        if rx is None:
+            # Longest first, so group(1) is the longest keyword starting at a hit.
+            alts = '|'.join(map(re.escape, sorted(leads, key=len, reverse=True)))
+            # Keywords that can overlap need a zero-width scan to see every start.
+            overlap = any(b.startswith(a[d:]) or a[d:].startswith(b)
+                          for a in leads for b in leads for d in range(1, len(a)))
+            rx = re.compile(('(?=(%s))' if overlap else '(%s)') % alts, re.I)
+            self._keywords[leads] = rx
+        return rx
+
+    def matches(self, text):
+        """{field: re.Match | None}, first pattern in priority order wins."""
+        best = {name: (len(pats), None) for name, pats in self.fields.items()}
+        pending = {}  # leading word -> [(field, priority, pattern)]
+        for name, pats in self.fields.items():
+            for i, pat in enumerate(pats):
+                pat.calls += 1
+                lead = self._lead.get(pat.name)
+                if lead is None:
+                    m = pat.regex.search(text)
+                    if m and i < best[name][0]:
+                        best[name] = (i, m)
+                else:
+                    pending.setdefault(lead, []).append((name, i, pat))
+
+        pos = 0
+        while pending:
+            leads = frozenset(pending)
+            hit = False
+            for km in self._keyword_re(leads).finditer(text, pos):
+                word = km.group(1).lower()
+                start = km.start()
+                for lead in leads:
+                    if not word.startswith(lead):
+                        continue
+                    for name, i, pat in pending[lead]:
+                        if i < best[name][0]:
+                            m = pat.regex.match(text, start)
+                            if m:
+                                best[name] = (i, m)
+                                hit = True
+                if hit:
+                    pos = start + 1
+                    break
+            if not hit:
+                break
+            # Only patterns that could still beat their field's best stay pending.
+            for lead in list(pending):
+                pending[lead] = [e for e in pending[lead] if e[1] < best[e[0]][0]]
+                if not pending[lead]:
+                    del pending[lead]
+
+        out = {}
+        for name, (i, m) in best.items():
+            if m is not None:
+                self.fields[name][i].hits += 1
+            out[name] = m
+        return out
+
+    def scan(self, text, group=1):
+        """{field: stripped group(group) | None}, like find_first() per field."""
+        return values(self.matches(text), group)
+
+
+def values(found, group=1):
+    """HeaderScanner.matches() result -> {field: stripped group(group) | None}."""
+    return {name: (m.group(group).strip() if m else None) for name, m in found.items()}
+
+
+def stats():
+    return {name: {'version': ps.version, 'patterns': ps.stats()} for name, ps in SETS.items()}
+
+
+def reset_stats():
+    for ps in SETS.values():
+        ps.reset()
+
+
+I = re.IGNORECASE
+
+# money with optional ₹ and thousands separators, e.g. "₹ 1,234.50"
+_MONEY = r'([0-9][0-9,]*(?:\.[0-9]{1,2})?)'
+
+COMMON = define('common', 4,
+    ws=r'\s+',
+    crlf=r'\r\n?',
+    orphan_decimal=r'(?<!\d)\.(\d)\b',
+    # hk_pdf.money: currency markers, then an amount with an optional sign ("-1,234.50", "+5", "12.", ".5")
+    currency=(r'₹|\bRs\b\.?|\bINR\b', I),
+    amount=r'([-+]?)\s*(?<![\d.])(\d[\d,]*(?:\.\d*)?|\.\d+)',
+    # hk_pdf.dates, day first: "15-04-2025", "13/12/2025"; "12-Jan-2026", "13th Jan, 2026"; "2026-01-12"
+    date_dmy=r'(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})\b',
+    date_d_mon_y=(r'(\d{1,2})(?:st|nd|rd|th)?[-\s]+([A-Za-z]{3,9})\.?,?[-\s]+(\d{4})\b', I),
+    date_ymd=r'(\d{4})-(\d{2})-(\d{2})\b',
+    has_alpha=r'[A-Za-z]',
+    has_digit=r'\d',
+)
+
+_ZEPTO_MONEY = r'([0-9]+(?:\.[0-9]{1,2})?)'
+
+# Zepto table row as flattened text (lines/text table strategies).
+_ZEPTO_ROW = (
+    r'\b(?P<sr>\d+)\s+'
+    r'(?P<name>.+?)\s+'
+    r'(?P<hsn>\d{6,8})\s+'
+    r'(?P<qty>\d+)\s+'
+    r'(?P<rate>\d+(?:\.\d{1,2})?)\s+'
+    r'(?P<disc>\d+(?:\.\d+)?)%\s+'
+    r'(?P<taxable>\d+(?:\.\d{1,2})?)\s+'
+    r'(?P<cgst_pct>\d+(?:\.\d+)?)%\s+'
+    r'(?P<sgst_pct>\d+(?:\.\d+)?)%\s+'
+    r'(?P<cgst_amt>\d+(?:\.\d{1,2})?)\s+'
+    r'(?P<sgst_amt>\d+(?:\.\d{1,2})?)\s+'
+    r'(?P<cess_pct>\d+(?:\.\d+)?)(?:%)?\s+'
+    r'(?P<cess_amt>\d+(?:\.\d{1,2})?)\s+'
+    r'(?P<total>\d+(?:\.\d{1,2})?)\b'
+)
+
+ZEPTO = define('zepto', 1,
+    invoice_number=(r'Invoice\s*No\.?\s*:\s*([A-Za-z0-9]+)', I),
+    order_number=(r'Order\s*No\.?\s*:\s*([A-Za-z0-9]+)', I),
+    date=r'Date\s*:\s*([0-9]{2}-[0-9]{2}-[0-9]{4})',
+    item_total=(rf'\bItem\s+Total\b\s*{_ZEPTO_MONEY}', I),
+    handling_fee=(rf'Handling\s+Fee[^\n]*?\s{_ZEPTO_MONEY}', I),
+    invoice_value=(rf'\bInvoice\s+Value\b\s*{_ZEPTO_MONEY}', I),
+    row=_ZEPTO_ROW,
+    hsn=r'\b\d{6,8}\b',
+    digit_split=r'(?<=\d)\s+(?=\d)',
+    # clean_name fixpoint: re-join words split by the PDF renderer
+    name_join_short_long=r'\b([A-Za-z]{1,2})\s+([a-z]{2,})\b',
+    name_join_short_short=r'\b([A-Za-z]{1,3})\s+([a-z]{1,3})\b',
+    name_join_mid=r'\b([a-z]{2,4})\s+([a-z]{2,4})\b',
+    # Mode 1: one item per text line
+    item_line=(
+        r'\b(?P<sr>\d+)\s+'
+        r'(?P<name>.+?)\s+'
+        r'(?P<hsn>\d{6,8})\s+'
+        r'(?P<qty>\d+)\s+'
+        r'(?P<rate>\d+\.\d{2})\s+'
+        r'(?P<disc>\d+\.\d+)%\s+'
+        r'(?P<taxable>\d+\.\d{2})\s+'
+        r'(?P<cgst_pct>\d+\.\d+)%\s+'
+        r'(?P<sgst_pct>\d+\.\d+)%\s+'
+        r'(?P<cgst_amt>\d+\.\d{2})\s+'
+        r'(?P<sgst_amt>\d+\.\d{2})\s+'
+        r'(?P<cess_amt>\d+\.\d{2})\s+'
+        r'(?P<total>\d+\.\d{2})\b'
+    ),
+    # Mode 2: Zepto Pass style rows split across lines
+    pass_row=(
+        r'(?P<name>.+?)\s+'
+        r'(?P<sr>\d+)\s+'
+        r'(?P<desc2>.+?)\s+'
+        r'(?P<hsn>\d{6,8})\s+'
+        r'(?P<qty>\d+)\s+'
+        r'(?P<taxable>\d+\.\d{2})\s+'
+        r'(?P<disc>\d+(?:\.\d+)?)%\s+'
+        r'(?P<taxable2>\d+\.\d{2})\s+'
+        r'(?P<cgst_pct>\d+\.\d+)%\s+'
+        r'(?P<sgst_pct>\d+\.\d+)%\s+'
+        r'(?P<cgst_amt>\d+\.\d{2})\s+'
+        r'(?P<sgst_amt>\d+\.\d{2})\s+'
+        r'(?P<cess_pct>\d+(?:\.\d+)?)%\s+'
+        r'(?P<cess_amt>\d+\.\d{2})\s+'
+        r'(?P<total>\d+\.\d{2})\b'
+    ),
+    noise_number=r'\d+(?:\.\d+)?%?',
+    noise_amount=r'[\+\-]?\s*\d+\.\d{2}',
+    plus_amount=r'\+\s*\d+\.\d{2}',
+    amount_or_pct=r'\d+\.\d{2}%?',
+    sr_header=(r'SR', I),
+)
+
+BLINKIT = define('blinkit', 1,
+    order_id=(r'Order\s*Id\s*:?\s*(\d+)', I),
+    order_id_alt=(r'Order\s*ID\s*:?\s*(\d+)', I),
+    invoice_number=(r'Invoice\s*Number\s*:?\s*([A-Z0-9]+)', I),
+    invoice_date=r'\b(\d{2}-[A-Za-z]{3}-\d{4})\b',
+    grand_total=(r'Grand\s*Total\s*:?\s*₹?\s*([0-9,]+(?:\.[0-9]{2})?)', I),
+    total_amount=(r'Total\s*Amount\s*:?\s*₹?\s*([0-9,]+(?:\.[0-9]{2})?)', I),
+    amount_before_rupees=(r'(\d+\.\d{2})\s*\n\s*.*Rupees', I),
+    amount_line=r'\d+(?:\.\d{2})?',
+)
+
+# "<name> [x <qty>] ₹ <amount>" lines (Swiggy/Zomato fallback item parser)
+_GENERIC_ITEM = r'^(.*?)(?:\s+x\s*(\d+))?\s+₹\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)\s*$'
+_STORE_UNITS = r'(NOS|OTH|PCS|EA|KG|GM|LTR|L|ML)'
+
+SWIGGY = define('swiggy', 2,
+    order_id_handling=(r'\bHandling Fees for Order\s+([0-9]+)\b', I),
+    order_id=(r'\bOrder\s*ID\s*[:#]?\s*([0-9]+)\b', I),
+    order_no=(r'\bOrder\s*No\s*[:#]?\s*([0-9]+)\b', I),
+    invoice_value=(rf'\bInvoice\s*Value\s*{_MONEY}', I),
+    invoice_total_rs=(rf'\bInvoice\s*Total\s*₹?\s*{_MONEY}', I),
+    invoice_total=(rf'\bInvoice\s*Total\s*{_MONEY}', I),
+    grand_total=(rf'\bGrand\s*Total\s*₹?\s*{_MONEY}', I),
+    total_rs=(rf'\bTotal\s*₹\s*{_MONEY}', I),
+    skip_line=(r'\b(total|grand total|item total|tax|gst|delivery|packing|discount|charges)\b', I),
+    generic_item=_GENERIC_ITEM,
+    # Shape A (food): "<sr>. <desc> ... <amount> <discount> <net>"
+    food_row=r'^\s*(\d+)\.\s+(.+?)\s+\w+\s+(\d+)\s+([0-9][0-9,]*\.[0-9]{2,3})\s+([0-9][0-9,]*\.[0-9]{2,3})\s+([0-9][0-9,]*\.[0-9]{2,3})\s+([0-9][0-9,]*\.[0-9]{2,3})\s*$',
+    # Shape B (instamart): "1. 1 NOS ... 24" / "1. Raincoat ... 1 NOS ... 409"
+    store_row=rf'^(\d+)\.\s+(\d+)\s+{_STORE_UNITS}\s+\d+\s+.*?\s([0-9][0-9,]*(?:\.[0-9]{{1,2}})?)\s*$',
+    store_row_desc=rf'^(\d+)\.\s+(.+?)\s+(\d+)\s+{_STORE_UNITS}\s+\d+\s+.*?\s([0-9][0-9,]*(?:\.[0-9]{{1,2}})?)\s*$',
+    desc_skip=(r'^(subtotal|tax|invoice|date|hsn|description of goods|sr no)\b', I),
+    starts_digit=r'^\d',
+    # Shape B table cells (hk_pdf.grid): serial number, quantity
+    sr_cell=r'\d+\.?',
+    qty_cell=r'\d+',
+)
+
+ZOMATO = define('zomato', 1,
+    order_id=(r'\bOrder\s*ID\s*[:#]?\s*([0-9]+)\b', I),
+    order_id_upper=(r'\bORDER\s*ID\s*[:#]?\s*([0-9]+)\b', I),
+    total_paid=(rf'\bTotal\s*paid\s*₹\s*{_MONEY}', I),
+    grand_total=(rf'\bGrand\s*Total\s*₹\s*{_MONEY}', I),
+    total_rs=(rf'\bTotal\s*₹\s*{_MONEY}', I),
+    skip_line=(r'\b(total|grand total|total paid|tax|gst|delivery|packaging|discount)\b', I),
+    generic_item=_GENERIC_ITEM,
+)
+
+DISTRICT = define('district', 2,
+    order_id=(r'\bOrder\s*ID\s*[:#]?\s*([0-9]+)', I),
+    invoice_number=(r'\bInvoice\s*Number\s*[:#]?\s*([A-Z0-9]+)', I),
+    invoice_date_words=(r'\bInvoice\s*Date\s*[:#]?\s*([0-9]{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]{3,9},\s+[0-9]{4})', I),
+    invoice_date_numeric=(r'\bInvoice\s*Date\s*[:#]?\s*([0-9]{1,2}[-/][0-9]{1,2}[-/][0-9]{4})', I),
+    grand_total=(rf'\bGrand\s*Total\s*₹?\s*{_MONEY}', I),
+    booking_charge_qty=(rf'\bBooking\s*Charge\s+\d+\s+\d+\s+₹?\s*{_MONEY}', I),
+    booking_charge=(rf'\bBooking\s*Charge\s+\d+\s+₹?\s*{_MONEY}', I),
+    igst=(rf'\bIntegrated\s+Goods\s+and\s+Service\s+Tax\s+@\s*[0-9.]+%\s*₹?\s*{_MONEY}', I),
+)
+
+EATCLUB = define('eatclub', 1,
+    tracking_id=(r'\bTracking\s*ID\s*:\s*([A-Z0-9]+)', I),
+    invoice_no=(r'\bInvoice\s*No\.?\s*:\s*([^\n]+)', I),
+    ordered_at=(r'\bOrdered\s*At\s*:\s*([0-9]{2}-[0-9]{2}-[0-9]{4})', I),
+    invoice_total=(r'\bInvoice\s*Total\s*:\s*([0-9][0-9.,]+)', I),
+    table_start=(r'^Product\s+Details$', I),
+    table_end=(r'^Sub\s*Total\s*:', I),
+    table_header=(r'^Description\s+Qty\s+Rate\s+Amount$', I),
+    item_row=(r'^(.*?)\s+-\s+(\d+)\s+Pc\s+([0-9]+(?:\.[0-9]{1,2})?)\s+([0-9]+(?:\.[0-9]{1,2})?)$', I),
+    hsn_remnant=(r'\b(?:HSN|SAC)\s*/?\s*(?:HSN|SAC)?\b\s*[:#-]?\s*\d+', I),
+)
+
+REDBUS = define('redbus', 1,
+    invoice_header=(r'Invoice\s*No\.?\s*Date\s*\n\s*([A-Z0-9-]+)\s+([0-9]{1,2}[/-][0-9]{1,2}[/-][0-9]{4})', I),
+    invoice_no=(r'\bInvoice\s*No\.?\s*[:#]?\s*([A-Z0-9-]+)', I),
+    date=(r'\bDate\s*[:#]?\s*([0-9]{1,2}[/-][0-9]{1,2}[/-][0-9]{4})', I),
+    total=(rf'\bTotal\s*Invoice\s*Value\s*{_MONEY}', I),
+    taxable=(rf'\bTotal\s*Taxable\s*Value\s*{_MONEY}', I),
+    cgst=(rf'\bCGST\s*@\s*[0-9.]+%\s*{_MONEY}', I),
+    sgst=(rf'\bSGST\s*@\s*[0-9.]+%\s*{_MONEY}', I),
+)
+
@@ -0,0 +1,78 @@
+"""Parser name -> parse_*_invoice module mapping."""
+
+import importlib
+
+from . import limits as limits_mod
+
+PARSERS = {
+    'zepto': 'parse_zepto_invoice',
+    'blinkit': 'parse_blinkit_invoice',
+    'swiggy': 'parse_swiggy_invoice',
+    'zomato': 'parse_zomato_invoice',
+    'district': 'parse_district_invoice',
+    'eatclub': 'parse_eatclub_invoice',
+    'redbus': 'parse_redbus_invoice',
+}
+
+_loaded = {}
+
+
+def get_parser(name):
+    key = (name or '').strip().lower()
+    if key not in PARSERS:
+        raise KeyError(f'Unknown parser: {name}')
+    mod = _loaded.get(key)
+    if mod is None:
+        mod = importlib.import_module(PARSERS[key])
+        _loaded[key] = mod
+    return mod
+
+
+def load_all():
+    """Import every parser up front (pays the pdfplumber import once)."""
+    return {name: get_parser(name) for name in PARSERS}
+
+
+def parser_version(name):
+    return getattr(get_parser(name), 'PARSER_VERSION', 1)
+
+
+def parser_versions():
+    return {name: parser_version(name) for name in PARSERS}
+
+
+def _parse(mod, source, limits):
+    if limits is None:
+        return mod.parse(source)
+    from .document import open_document
+
+    with open_document(source) as doc:
+        return limits.run(mod.parse, doc)
+
+
+def parse_pdf(name, source, cache=None, limits=None):
+    """Return exactly what `parse_<name>_invoice.py <pdf>` would print.
+
+    `source` is a path, PDF bytes or an hk_pdf.document.Document; passing the same
+    Document to several parsers shares its extracted text/words/tables.
+    With a cache (hk_pdf.cache.ParseCache) the PDF is hashed first and a hit
+    skips pdfplumber entirely.
+    With limits (hk_pdf.limits.Limits) a PDF over one yields
+    {"ok": false, "reason": ...} instead; such results are not cached.
+    """
+    mod = get_parser(name)
+    if cache is None:
+        return _parse(mod, source, limits)
+
+    from .cache import source_digest
+
+    key = (name or '').strip().lower()
+    digest = source_digest(source)
+    version = getattr(mod, 'PARSER_VERSION', 1)
+    hit = cache.get(digest, key, version)
+    if hit is not None:
+        return hit
+    out = _parse(mod, source, limits)
+    if limits is None or not limits_mod.is_failure(out):
+        cache.put(digest, key, version, out)
+    return out
@@ -0,0 +1,89 @@
+"""Cheap merchant detection from PDF metadata + first-page text (fast backend).
+
+Used two ways:
+- quick_reject(): text parsers bail out of obviously foreign PDFs (terms
+  sheets, tickets, another merchant's invoice) after extracting one page
+  instead of all of them.
+- route(): the server/batch `auto` parser picks a parser without trying each.
+"""
+
+import re
+
+# Distinctive strings per parser (lowercase). Generic phrases such as
+# 'tax invoice' do not identify a merchant and live in INVOICE_MARKERS.
+MERCHANT_MARKERS = {
+    'zepto': ('zepto', 'geddit convenience', 'kiranakart'),
+    'blinkit': ('blinkit', 'blink commerce', 'grofers'),
+    'swiggy': ('swiggy', 'bundl technologies'),
+    'zomato': ('zomato',),
+    'district': ('ticketnew', 'orbgen'),
+    'eatclub': ('eatclub', 'mojopizza'),
+    'redbus': ('redbus',),
+}
+
+INVOICE_MARKERS = ('invoice', 'order id', 'order no', 'gstin', 'bill to', 'grand total')
+
+META_KEYS = ('Title', 'Author', 'Subject', 'Creator', 'Producer')
+
+_WS = re.compile(r'\s+')
+
+
+def squash(text):
+    """Lowercased text with all whitespace removed, for marker matching.
+
+    pdfium and pdfplumber space and break the same line differently ('Bundl
+    Technologies' with two spaces, 'GST IN', a line break inside 'Order ID'),
+    so markers are compared squashed on both sides and a backend's spacing
+    never decides a match.
+    """
+    return _WS.sub('', text).lower()
+
+
+def _any(markers, hay):
+    return any(squash(k) in hay for k in markers)
+
+
+def fingerprint(doc):
+    """{'merchants': [...], 'invoice': bool, 'pages': n} from page 1 + metadata only."""
+    pages = doc.page_count
+    first = doc.fast_page_text(0) if pages else ''
+    meta = doc.metadata or {}
+    hay = squash(first) + '\n' + squash(' '.join(str(meta.get(k) or '') for k in META_KEYS))
+    merchants = [name for name, kws in MERCHANT_MARKERS.items() if _any(kws, hay)]
+    return {
+        'merchants': merchants,
+        'invoice': _any(INVOICE_MARKERS, hay),
+        'pages': pages,
+    }
+
+
+def route(doc):
+    """Parser name for this PDF, or None if it is ambiguous or not an invoice."""
+    fp = fingerprint(doc)
+    if len(fp['merchants']) == 1:
+        return fp['merchants'][0]
+    return None
+
+
+def quick_reject(doc, parser, accept_markers, fast=True):
+    """True when `parser` should refuse this PDF without extracting all pages.
+
+    accept_markers is the parser's own "is this mine" keyword set, checked over
+    the full text by the parser. A hit on page 1 never rejects; a single-page
+    PDF is decided exactly; longer PDFs are rejected only when page 1 positively
+    identifies another merchant or does not look like an invoice at all.
+
+    Page 1 is read with the backend the parser reads the full text with:
+    fast_page_text() by default, page_text() (pdfplumber) with fast=False.
+    """
+    if not doc.page_count:
+        return True
+    first = doc.fast_page_text(0) if fast else doc.page_text(0)
+    if _any(accept_markers, squash(first)):
+        return False
+    if doc.page_count == 1:
+        return True
+    fp = fingerprint(doc)
+    if fp['merchants'] and parser not in fp['merchants']:
+        return True
+    return not fp['invoice'] and not fp['merchants']
@@ -0,0 +1,271 @@
+"""Canonical Invoice / LineItem records, one shape for every parser.
+
+Each parse_*_invoice.py keeps printing its own JSON (the JS wrappers and
+orders_parsed.json depend on it). Batch consumers that want one shape across
+merchants (batch --canonical, the server's {"canonical": true}, the invoice
+store) turn a parse result into Invoice records with from_result() and write
+them with to_record() (from_event() does the same for an orders_parsed.json
+record, for hk_pdf.store):
+
+  {"schema": 1, "ok": true, "invoices": [
+    {"merchant": "ZEPTO", "order_id": ..., "invoice_number": ...,
+     "invoice_date": "2026-01-12", "invoice_date_ms": ..., "total_paise": 22000,
+     "item_total_paise": 21000, "fees_paise": 1000, "confidence": 1.0,
+     "page_index": null,
+     "items": [{"name": ..., "qty": 1, "amount_paise": 5100, "mrp_paise": null,
+                "discount_paise": null, "taxable_paise": null, "tax_paise": null,
+                "hsn": "04012000"}, ...]}]}
+
+Amounts are integer paise (hk_pdf.money) and dates ISO + midnight-IST epoch ms
+(hk_pdf.dates). A result that is not an invoice ({"ok": false, "reason": ...})
+becomes {"schema": 1, "ok": false, "reason": ..., "invoices": []}. Bump
+SCHEMA_VERSION whenever a field is added, removed or changes meaning.
+"""
+
+from operator import attrgetter
+
+from . import money
+
+SCHEMA_VERSION = 1
+
+MERCHANTS = {
+    'zepto': 'ZEPTO',
+    'blinkit': 'BLINKIT',
+    'swiggy': 'SWIGGY',
+    'zomato': 'ZOMATO',
+    'district': 'DISTRICT',
+    'eatclub': 'EATCLUB',
+    'redbus': 'REDBUS',
+}
+
+
+class LineItem:
+    __slots__ = ('name', 'qty', 'amount_paise', 'mrp_paise', 'discount_paise', 'taxable_paise', 'tax_paise', 'hsn')
+
+    def __init__(self, name, qty=None, amount_paise=None, mrp_paise=None, discount_paise=None,
+                 taxable_paise=None, tax_paise=None, hsn=None):
+        self.name = name
+        self.qty = qty
+        self.amount_paise = amount_paise
+        self.mrp_paise = mrp_paise
+        self.discount_paise = discount_paise
+        self.taxable_paise = taxable_paise
+        self.tax_paise = tax_paise
+        self.hsn = hsn
+
+    def __repr__(self):
+        return f'LineItem({self.name!r}, qty={self.qty!r}, amount_paise={self.amount_paise!r})'
+
+
+class Invoice:
+    __slots__ = ('merchant', 'order_id', 'invoice_number', 'invoice_date', 'invoice_date_ms',
+                 'total_paise', 'item_total_paise', 'fees_paise', 'confidence', 'page_index', 'items')
+
+    def __init__(self, merchant, order_id=None, invoice_number=None, invoice_date=None, invoice_date_ms=None,
+                 total_paise=None, item_total_paise=None, fees_paise=None, confidence=None, page_index=None,
+                 items=()):
+        self.merchant = merchant
+        self.order_id = order_id
+        self.invoice_number = invoice_number
+        self.invoice_date = invoice_date
+        self.invoice_date_ms = invoice_date_ms
+        self.total_paise = total_paise
+        self.item_total_paise = item_total_paise
+        self.fees_paise = fees_paise
+        self.confidence = confidence
+        self.page_index = page_index
+        self.items = list(items)
+
+    def __repr__(self):
+        return (f'Invoice({self.merchant!r}, order_id={self.order_id!r}, invoice_number={self.invoice_number!r}, '
+                f'total_paise={self.total_paise!r}, items={len(self.items)})')
+
+
+_ITEM_FIELDS = LineItem.__slots__
+_ITEM_VALUES = attrgetter(*_ITEM_FIELDS)
+_INVOICE_FIELDS = Invoice.__slots__[:-1]
+_INVOICE_VALUES = attrgetter(*_INVOICE_FIELDS)
+
+
+def invoice_dict(inv):
+    d = dict(zip(_INVOICE_FIELDS, _INVOICE_VALUES(inv)))
+    d['items'] = [dict(zip(_ITEM_FIELDS, _ITEM_VALUES(it))) for it in inv.items]
+    return d
+
+
+def to_record(invoices, reason=None):
+    """The one serialized shape: {"schema", "ok", ["reason"], "invoices"}."""
+    if reason is not None:
+        return {'schema': SCHEMA_VERSION, 'ok': False, 'reason': reason, 'invoices': []}
+    return {'schema': SCHEMA_VERSION, 'ok': True, 'invoices': [invoice_dict(inv) for inv in invoices]}
+
+
+def from_record(rec):
+    """to_record() output -> [Invoice] (for readers of stored records)."""
+    out = []
+    for d in rec.get('invoices') or []:
+        d = dict(d)
+        items = [LineItem(**it) for it in d.pop('items', None) or []]
+        out.append(Invoice(items=items, **d))
+    return out
+
+
+def _paise(d, field):
+    # <field>_paise, or the rupee value for records that predate it.
+    p = d.get(field + '_paise')
+    return p if p is not None else money.to_paise(d.get(field))
+
+
+def _tax(*amounts):
+    known = [a for a in amounts if a is not None]
+    return sum(known) if known else None
+
+
+def _confidence(result):
+    v = result.get('validation')
+    return v.get('confidence') if v else None
+
+
+def _zepto(result, merchant):
+    items = [
+        LineItem(
+            it.get('name'), it.get('qty'), _paise(it, 'total'),
+            taxable_paise=_paise(it, 'taxable'),
+            tax_paise=_tax(_paise(it, 'cgst_amt'), _paise(it, 'sgst_amt'), _paise(it, 'cess_amt')),
+            hsn=it.get('hsn'),
+        )
+        for it in result.get('items') or []
+    ]
+    return [Invoice(
+        merchant,
+        order_id=result.get('order_number'),
+        invoice_number=result.get('invoice_number'),
+        invoice_date=result.get('invoice_date'),
+        invoice_date_ms=result.get('invoice_date_ms'),
+        total_paise=result.get('invoice_value_paise'),
+        item_total_paise=result.get('item_total_paise'),
+        fees_paise=result.get('handling_fee_paise'),
+        confidence=_confidence(result),
+        items=items,
+    )]
+
+
+def _blinkit(result, merchant):
+    out = []
+    for inv in result.get('invoices') or []:
+        items = [
+            LineItem(it.get('name'), it.get('qty'), _paise(it, 'total'),
+                     mrp_paise=_paise(it, 'mrp'), discount_paise=_paise(it, 'discount'))
+            for it in inv.get('items') or []
+        ]
+        out.append(Invoice(
+            merchant,
+            order_id=result.get('order_id'),
+            invoice_number=inv.get('invoice_number'),
+            invoice_date=inv.get('invoice_date'),
+            invoice_date_ms=inv.get('invoice_date_ms'),
+            total_paise=_paise(inv, 'invoice_total'),
+            confidence=_confidence(inv),
+            page_index=inv.get('page_index'),
+            items=items,
+        ))
+    if not out and result.get('grand_total_paise') is not None:
+        # No item table found: the header alone still identifies the invoice.
+        out.append(Invoice(
+            merchant,
+            order_id=result.get('order_id'),
+            invoice_number=result.get('invoice_number'),
+            invoice_date=result.get('invoice_date'),
+            invoice_date_ms=result.get('invoice_date_ms'),
+            total_paise=result.get('grand_total_paise'),
+            confidence=_confidence(result),
+        ))
+    return out
+
+
+def _text(result, merchant):
+    # Same rules as hk_pdf.orders.to_order_events: nothing read is no invoice.
+    if result.get('total') is None and not result.get('items'):
+        return []
+    if merchant == 'EATCLUB':
+        order_id = result.get('tracking_id')
+    elif merchant == 'REDBUS':
+        order_id = result.get('invoice_no')
+    else:
+        order_id = result.get('order_id')
+    items = [LineItem(it.get('name'), it.get('qty'), _paise(it, 'amount')) for it in result.get('items') or []]
+    return [Invoice(
+        merchant,
+        order_id=order_id or None,
+        invoice_number=result.get('invoice_no') or None,
+        invoice_date=result.get('invoice_date') or None,
+        invoice_date_ms=result.get('invoice_date_ms'),
+        total_paise=result.get('total_paise'),
+        confidence=_confidence(result),
+        items=items,
+    )]
+
+
+def from_result(parser, result, merchant=None):
+    """[Invoice] for what parse_<parser>_invoice.py returned (none for {"ok": false})."""
+    if not isinstance(result, dict) or result.get('ok') is False:
+        return []
+    merchant = merchant or MERCHANTS[parser]
+    if parser == 'zepto':
+        return _zepto(result, merchant)
+    if parser == 'blinkit':
+        return _blinkit(result, merchant)
+    return _text(result, merchant)
+
+
+def from_event(event):
+    """[Invoice] for one orders_parsed.json record (hk_pdf.orders / the JS parsers' events)."""
+    if not isinstance(event, dict) or event.get('parse_status', 'ok') != 'ok':
+        return []
+    merchant = event.get('merchant')
+    total_paise = _paise(event, 'total')
+    if merchant == 'ZEPTO':
+        return _zepto({
+            'order_number': event.get('order_id'),
+            'invoice_number': event.get('invoice_number'),
+            'invoice_date': event.get('invoice_date'),
+            'invoice_date_ms': event.get('invoice_date_ms'),
+            'invoice_value_paise': total_paise,
+            'item_total_paise': money.to_paise(event.get('item_total')),
+            'handling_fee_paise': money.to_paise(event.get('handling_fee')),
+            'items': event.get('items'),
+            'validation': event.get('validation'),
+        }, merchant)
+    if merchant == 'BLINKIT':
+        return _blinkit({
+            'order_id': event.get('order_id'),
+            'invoice_number': event.get('invoice_number'),
+            'invoice_date': event.get('invoice_date'),
+            'invoice_date_ms': event.get('invoice_date_ms'),
+            'grand_total_paise': total_paise,
+            'invoices': event.get('invoices'),
+            'validation': event.get('validation'),
+        }, merchant)
+    # Text PDF parsers and the email parsers: {order_id, total, items: [{name, qty, amount}]}.
+    items = [
+        LineItem(it.get('name'), it.get('qty'), _paise(it, 'amount'))
+        for it in event.get('items') or []
+        if isinstance(it, dict)
+    ]
+    return [Invoice(
+        merchant,
+        order_id=event.get('order_id'),
+        invoice_number=event.get('invoice_number'),
+        invoice_date=event.get('invoice_date'),
+        invoice_date_ms=event.get('invoice_date_ms'),
+        total_paise=total_paise,
+        confidence=_confidence(event),
+        items=items,
+    )]
+
+
+def canonical(parser, result, merchant=None):
+    """to_record(from_result(...)), passing a failure's reason through."""
+    if isinstance(result, dict) and result.get('ok') is False:
+        return to_record((), reason=result.get('reason') or 'failed')
+    return to_record(from_result(parser, result, merchant))
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Long-lived PDF parse server.
+
+Loads all invoice parsers once and answers newline-delimited JSON requests:
+
+  request:  {"id": 1, "parser": "zepto", "path": "/abs/invoice.pdf"}
+  response: {"id": 1, "status": "ok", "result": {...}}
+            {"id": 1, "status": "error", "error": "..."}
+
+`result` is the same JSON the matching parse_<parser>_invoice.py prints.
+Instead of "path" a request may carry "data": the PDF as base64url (Gmail's
+attachment encoding, as-is); it is parsed from memory, nothing is written.
+Without any copy at all: "shm": "<name>" maps a POSIX shared-memory segment
+the caller filled (the caller unlinks it), and on the Unix socket "fd": true
+maps the file descriptor sent (SCM_RIGHTS) in the same sendmsg as the request
+line (send_request() does this). "size" optionally gives the PDF's length
+within either.
+parser "auto" picks one from PDF metadata + page 1 (hk_pdf.router); the
+response then carries "routed": <parser> (null + {"ok": false, "reason":
+"unrouted"} when no merchant is recognised).
+"canonical": true answers the hk_pdf.schema record ({"schema": 1, "ok",
+"invoices": [...]}) instead; "merchant" overrides its label (SWIGGY_INSTAMART).
+{"op": "pattern_stats"} returns per-pattern call/hit counts since start
+(add "reset": true to zero them).
+Each parse runs under hk_pdf.limits (HK_PDF_TIMEOUT, ..._MAX_PAGES, ..._MAX_BYTES,
+..._MAX_RSS_MB); a PDF over one answers {"ok": false, "reason": ...} as its result.
+The SIGALRM watchdog only runs in the main thread, so with limits on the
+socket server's connection threads hand each request to the main thread and
+wait: requests are answered one at a time (parsing holds the GIL anyway).
+
+Usage (from src/pdf):
+  python -m hk_pdf.server                      # stdin/stdout
+  python -m hk_pdf.server --socket /tmp/hk_pdf.sock
+"""
+
+import argparse
+import collections
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from pathlib import Path
+
+from . import cache as parse_cache
+from . import inputs, ndjson, patterns, registry, router, schema
+from .document import Document
+from .limits import Limits
+
+
+# Descriptors accepted per recvmsg on the socket.
+MAX_FDS = 16
+
+
+def handle_request(req, cache=None, doc=None, fd=None, limits=None):
+    """Answer one request; `doc` (a Document for req['path']) is reused if given.
+
+    `fd` is the descriptor passed along with an {"fd": true} request; it is
+    always closed here. `limits` (hk_pdf.limits.Limits) bounds each parse.
+    """
+    rid = req.get('id') if isinstance(req, dict) else None
+    mapped = None
+    try:
+        if not isinstance(req, dict):
+            raise ValueError('request must be a JSON object')
+        if req.get('op') == 'ping':
+            return {'id': rid, 'status': 'ok', 'result': {'parsers': sorted(registry.PARSERS)}}
+        if req.get('op') == 'pattern_stats':
+            stats = patterns.stats()
+            if req.get('reset'):
+                patterns.reset_stats()
+            return {'id': rid, 'status': 'ok', 'result': stats}
+
+        parser = req.get('parser')
+        pdf_path = req.get('path')
+        data = req.get('data')
+        if req.get('fd'):
+            if fd is None:
+                raise ValueError('"fd" request without a passed file descriptor')
+            mapped = inputs.map_fd(fd, req.get('size'))
+        elif req.get('shm'):
+            mapped = inputs.map_shm(req['shm'], req.get('size'))
+        if not parser or not (pdf_path or data or mapped):
+            raise ValueError('request needs parser and path (or data, shm, fd)')
+        if mapped is not None:
+            doc = Document(mapped)
+            owned = True
+        elif data:
+            doc = Document(inputs.decode_base64url(data))
+            owned = True
+        else:
+            if not Path(pdf_path).exists():
+                raise FileNotFoundError(f'File not found: {pdf_path}')
+            owned = doc is None or doc.path != str(pdf_path)
+            if owned:
+                doc = Document(pdf_path)
+        try:
+            res = {'id': rid, 'status': 'ok'}
+            if parser == 'auto':
+                parser = res['routed'] = router.route(doc)
+            if parser is None:
+                result = {'ok': False, 'reason': 'unrouted'}
+            else:
+                result = registry.parse_pdf(parser, doc, cache=cache, limits=limits)
+            if req.get('canonical'):
+                result = schema.canonical(parser, result, req.get('merchant'))
+            res['result'] = result
+            return res
+        finally:
+            if owned:
+                doc.close()
+    except Exception as e:
+        print(traceback.format_exc(), file=sys.stderr)
+        return {'id': rid, 'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+    finally:
+        if mapped is not None:
+            mapped.close()
+        if fd is not None:
+            os.close(fd)
+
+
+def handle_line(line, cache=None, fds=None, limits=None):
+    """One request line; an {"fd": true} request takes the next descriptor from `fds`."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        req = json.loads(line)
+    except Exception as e:
+        return {'id': None, 'status': 'error', 'error': f'invalid json: {e}'}
+    fd = fds.popleft() if isinstance(req, dict) and req.get('fd') and fds else None
+    return handle_request(req, cache=cache, fd=fd, limits=limits)
+
+
+def serve_stdio(cache=None, limits=None):
+    # Parsers must never write to our protocol stream; route stray prints to stderr.
+    out = sys.stdout
+    sys.stdout = sys.stderr
+    for line in sys.stdin:
+        res = handle_line(line, cache=cache, limits=limits)
+        if res is None:
+            continue
+        ndjson.write(out, res)
+        if limits is not None and limits.over_rss():
+            # Memory a huge PDF left behind is not given back; exit and let the client start a fresh server.
+            print('hk_pdf server: over the RSS limit after a request, exiting', file=sys.stderr)
+            return
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # recvmsg rather than a file wrapper, so SCM_RIGHTS descriptors arrive
+        # too; they queue up in order and "fd" requests take them one by one.
+        buf = b''
+        fds = collections.deque()
+        try:
+            while True:
+                data, new_fds, _, _ = socket.recv_fds(self.request, 1 << 16, MAX_FDS)
+                fds.extend(new_fds)
+                if not data:
+                    break
+                buf += data
+                while b'\n' in buf:
+                    raw, buf = buf.split(b'\n', 1)
+                    line = raw.decode('utf8', errors='replace')
+                    if self.server.main is not None:
+                        res = self.server.main.call(handle_line, line, cache=self.server.cache, fds=fds, limits=self.server.limits)
+                    else:
+                        res = handle_line(line, cache=self.server.cache, fds=fds, limits=self.server.limits)
+                    if res is not None:
+                        self.request.sendall((ndjson.dumps(res) + '\n').encode('utf8'))
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+
+class _MainThread:
+    """Runs calls from other threads on the thread that called run() (the main thread)."""
+
+    def __init__(self):
+        self._jobs = queue.Queue()
+
+    def call(self, fn, *args, **kwargs):
+        done = threading.Event()
+        box = {}
+        self._jobs.put((fn, args, kwargs, done, box))
+        done.wait()
+        if 'error' in box:
+            raise box['error']
+        return box['value']
+
+    def run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            fn, args, kwargs, done, box = job
+            try:
+                box['value'] = fn(*args, **kwargs)
+            except Exception as e:
+                box['error'] = e
+            finally:
+                done.set()
+
+    def stop(self):
+        self._jobs.put(None)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    cache = None
+    limits = None
+    main = None
+
+
+def send_request(sock, req, fd=None):
+    """Client side: write one request line to the server socket, passing fd with it."""
+    if fd is not None:
+        req = dict(req, fd=True)
+    line = (json.dumps(req) + '\n').encode('utf8')
+    if fd is None:
+        sock.sendall(line)
+        return
+    sent = socket.send_fds(sock, [line], [fd])
+    if sent < len(line):
+        sock.sendall(line[sent:])
+
+
+def serve_socket(sock_path, cache=None, limits=None):
+    if os.path.exists(sock_path):
+        os.unlink(sock_path)
+    with _Server(sock_path, _Handler) as srv:
+        srv.cache = cache
+        srv.limits = limits
+        os.chmod(sock_path, 0o600)
+        print(f'hk_pdf server listening on {sock_path}', file=sys.stderr)
+        try:
+            if limits is None:
+                srv.serve_forever()
+            else:
+                # Parses run here, where hk_pdf.limits can arm its SIGALRM watchdog.
+                srv.main = _MainThread()
+                threading.Thread(target=srv.serve_forever, daemon=True).start()
+                try:
+                    srv.main.run()
+                finally:
+                    srv.shutdown()
+        finally:
+            try:
+                os.unlink(sock_path)
+            except OSError:
+                pass
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m hk_pdf.server')
+    ap.add_argument('--socket', help='listen on this Unix socket instead of stdin/stdout')
+    ap.add_argument('--no-cache', action='store_true', help='do not use the parse-result cache')
+    ap.add_argument('--no-limits', action='store_true', help='no per-PDF time/page/size/memory limits (hk_pdf.limits)')
+    args = ap.parse_args(argv)
+
+    registry.load_all()
+    cache = None if args.no_cache else parse_cache.open_default()
+    pdf_limits = None if args.no_limits else Limits.from_env()
+
+    if args.socket:
+        serve_socket(args.socket, cache=cache, limits=pdf_limits)
+    else:
+        serve_stdio(cache=cache, limits=pdf_limits)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+"""Parsed-order store (SQLite, WAL): orders_parsed.json without whole-file rewrites.
+
+One row per order record (keyed like mergeOrders: messageId::pdfPath, ...), its
+canonical invoices (hk_pdf.schema) and their line items:
+
+  orders      seq, key, merchant, message_id, parse_status, order_date,
+              internal_date_ms, event (the orders_parsed.json record, verbatim)
+  invoices    order_seq -> orders, merchant, order_id, invoice_number,
+              invoice_date, invoice_date_ms, total_paise, ... confidence
+  line_items  invoice_id -> invoices, name, qty, amount_paise, ...
+
+Ingesting touches only the records it is given; a record that is already
+stored keeps its position (like a Map.set in mergeOrders) and its
+internalDateMs if the new one has none.
+
+Opening the store imports <baseDir>/orders_parsed.json whenever the file is
+not the one the store last read or exported (its size or mtime differ): on
+first use, and after a run with HK_PDF_STORE=0 wrote orders to the file
+directly. Its records are upserted and its unknown list merged, so the next
+export cannot drop them.
+
+The store is the one source of truth; orders_parsed.json is its export, in
+the same shape and order mergeOrders produced, for the readers that only know
+the file (web/server and its scripts). Every writer refreshes it once per run:
+`ingest` exports unless --no-export, hk_pdf.backfill (--no-export) and
+gmail_parse_orders_v2_stateful.js (--no-export-json) after their last
+checkpoint, and gmail_parse_orders_v2.js with its one ingest.
+
+Location: $HK_PDF_STORE, else <baseDir>/orders_parsed.sqlite.
+HK_PDF_STORE=0 disables it (mergeOrders and backfill rewrite the JSON file again).
+
+  python -m hk_pdf.store --base-dir ~/HisabKitab                  # counts
+  python -m hk_pdf.store --base-dir ~/HisabKitab ingest [--no-export] [--merge-unknown] < events.ndjson
+  python -m hk_pdf.store --base-dir ~/HisabKitab query --merchant ZEPTO --from 2026-01-01 --to 2026-01-31
+  python -m hk_pdf.store --base-dir ~/HisabKitab export [--out orders_parsed.json]
+
+ingest reads one record per line ({"unknown": [...]} replaces the unknown
+list, or with --merge-unknown is merged into it by messageId, as
+gmail_parse_orders_v2.js keeps it); query prints {"ok", "count", "orders", "unknown"} like the JSON file.
+"""
+
+import argparse
+import datetime as _dt
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from . import dates, ndjson, orders, schema
+
+FILE_NAME = 'orders_parsed.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  key TEXT NOT NULL UNIQUE,
+  merchant TEXT,
+  message_id TEXT,
+  parse_status TEXT,
+  order_date TEXT,
+  internal_date_ms INTEGER,
+  event TEXT NOT NULL,
+  updated_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_merchant_date ON orders (merchant, order_date);
+CREATE INDEX IF NOT EXISTS orders_date ON orders (order_date);
+CREATE TABLE IF NOT EXISTS invoices (
+  id INTEGER PRIMARY KEY,
+  order_seq INTEGER NOT NULL REFERENCES orders (seq) ON DELETE CASCADE,
+  idx INTEGER NOT NULL,
+  merchant TEXT,
+  order_id TEXT,
+  invoice_number TEXT,
+  invoice_date TEXT,
+  invoice_date_ms INTEGER,
+  total_paise INTEGER,
+  item_total_paise INTEGER,
+  fees_paise INTEGER,
+  confidence REAL,
+  page_index INTEGER
+);
+CREATE INDEX IF NOT EXISTS invoices_order ON invoices (order_seq);
+CREATE INDEX IF NOT EXISTS invoices_order_id ON invoices (order_id);
+CREATE INDEX IF NOT EXISTS invoices_invoice_number ON invoices (invoice_number);
+CREATE INDEX IF NOT EXISTS invoices_invoice_date ON invoices (invoice_date);
+CREATE INDEX IF NOT EXISTS invoices_total_paise ON invoices (total_paise);
+CREATE TABLE IF NOT EXISTS line_items (
+  invoice_id INTEGER NOT NULL REFERENCES invoices (id) ON DELETE CASCADE,
+  idx INTEGER NOT NULL,
+  name TEXT,
+  qty REAL,
+  amount_paise INTEGER,
+  mrp_paise INTEGER,
+  discount_paise INTEGER,
+  taxable_paise INTEGER,
+  tax_paise INTEGER,
+  hsn TEXT,
+  PRIMARY KEY (invoice_id, idx)
+);
+CREATE TABLE IF NOT EXISTS meta (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
+"""
+
+_INVOICE_COLUMNS = ('merchant', 'order_id', 'invoice_number', 'invoice_date', 'invoice_date_ms',
+                    'total_paise', 'item_total_paise', 'fees_paise', 'confidence', 'page_index')
+_INSERT_INVOICE = (
+    f'INSERT INTO invoices (order_seq, idx, {", ".join(_INVOICE_COLUMNS)}) '
+    f'VALUES ({", ".join("?" * (len(_INVOICE_COLUMNS) + 2))})'
+)
+_INSERT_ITEM = (
+    f'INSERT INTO line_items (invoice_id, idx, {", ".join(schema.LineItem.__slots__)}) '
+    f'VALUES ({", ".join("?" * (len(schema.LineItem.__slots__) + 2))})'
+)
+
+
+def _ist_date(ms):
+    try:
+        return _dt.datetime.fromtimestamp(int(ms) / 1000, dates.IST).date().isoformat()
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def order_date(event):
+    """ISO day a record belongs to, as the JS consumers date it; None when unsure.
+
+    invoice_date_ms, else the printed invoice date, else (no date at all) the
+    email's internalDateMs. A printed date Python cannot read stays None, so
+    date-filtered queries return it and leave the decision to the caller.
+    """
+    if event.get('invoice_date_ms') is not None:
+        return _ist_date(event['invoice_date_ms'])
+    printed = event.get('invoice_date') or event.get('date')
+    if printed:
+        return dates.to_iso(str(printed)[:40])
+    if event.get('internalDateMs'):
+        return _ist_date(event['internalDateMs'])
+    return None
+
+
+def _text(v):
+    return None if v is None else str(v)
+
+
+def merge_unknown(old, new):
+    """Stored unknown list + new entries, one per messageId (a newer entry replaces in place)."""
+    by_id = {}
+    for u in list(old) + list(new):
+        key = u.get('messageId') if isinstance(u, dict) else None
+        by_id[key or ndjson.dumps(u)[:120]] = u
+    return list(by_id.values())
+
+
+def _merchant(v):
+    # Case-folded for filtering, as the JS consumers compare merchants.
+    return None if v is None else str(v).upper()
+
+
+class OrderStore:
+    def __init__(self, db_path):
+        self.path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('PRAGMA foreign_keys=ON')
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def _meta(self, key, default=None):
+        row = self._db.execute('SELECT value FROM meta WHERE key=?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, key, value):
+        self._db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?,?)', (key, ndjson.dumps(value)))
+
+    def _put(self, event, now):
+        key = orders.order_key(event)
+        row = self._db.execute('SELECT seq, internal_date_ms FROM orders WHERE key=?', (key,)).fetchone()
+        if row is not None and row[1] is not None and 'internalDateMs' not in event:
+            event = dict(event)
+            event['internalDateMs'] = row[1]
+        cols = (
+            _merchant(event.get('merchant')),
+            _text(event.get('messageId')),
+            _text(event.get('parse_status')),
+            order_date(event),
+            event.get('internalDateMs'),
+            ndjson.dumps(event),
+            now,
+        )
+        if row is None:
+            seq = self._db.execute(
+                'INSERT INTO orders (merchant, message_id, parse_status, order_date, internal_date_ms, event, '
+                'updated_at, key) VALUES (?,?,?,?,?,?,?,?)',
+                cols + (key,),
+            ).lastrowid
+        else:
+            seq = row[0]
+            self._db.execute(
+                'UPDATE orders SET merchant=?, message_id=?, parse_status=?, order_date=?, internal_date_ms=?, '
+                'event=?, updated_at=? WHERE seq=?',
+                cols + (seq,),
+            )
+            self._db.execute('DELETE FROM invoices WHERE order_seq=?', (seq,))
+        for i, inv in enumerate(schema.from_event(event)):
+            values = [getattr(inv, c) for c in _INVOICE_COLUMNS]
+            values[1], values[2] = _text(values[1]), _text(values[2])
+            invoice_id = self._db.execute(_INSERT_INVOICE, [seq, i] + values).lastrowid
+            self._db.executemany(_INSERT_ITEM, [
+                (invoice_id, j, _text(it.name), it.qty, it.amount_paise, it.mrp_paise, it.discount_paise,
+                 it.taxable_paise, it.tax_paise, _text(it.hsn))
+                for j, it in enumerate(inv.items)
+            ])
+        return row is None
+
+    def ingest(self, events, unknown=None, merge=False):
+        """Upsert order records in one transaction.
+
+        unknown=None keeps the stored unknown list; otherwise it replaces it, or
+        with merge=True is merged into it (merge_unknown).
+        """
+        added = updated = 0
+        now = int(time.time())
+        with self._lock:
+            try:
+                for event in events:
+                    if self._put(event, now):
+                        added += 1
+                    else:
+                        updated += 1
+                if unknown is not None:
+                    if merge:
+                        unknown = merge_unknown(self._meta('unknown', []), unknown)
+                    self._set_meta('unknown', list(unknown))
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        return {'added': added, 'updated': updated}
+
+    def _json_stat(self, json_path):
+        return self._meta('json_files', {}).get(os.path.abspath(json_path))
+
+    def _remember_json(self, json_path):
+        # (size, mtime_ns) of a JSON file whose orders are all in the store.
+        st = os.stat(json_path)
+        files = self._meta('json_files', {})
+        files[os.path.abspath(json_path)] = [st.st_size, st.st_mtime_ns]
+        self._set_meta('json_files', files)
+        self._db.commit()
+
+    def seed(self, json_path):
+        """Import orders_parsed.json unless it is the file the store last read or wrote.
+
+        None when it is missing or unchanged, else ingest()'s counts.
+        """
+        if not os.path.exists(json_path):
+            return None
+        st = os.stat(json_path)
+        with self._lock:
+            if self._json_stat(json_path) == [st.st_size, st.st_mtime_ns]:
+                return None
+        doc = orders.read_orders(json_path)
+        res = self.ingest(doc.get('orders') or [], unknown=doc.get('unknown') or [], merge=True)
+        with self._lock:
+            self._remember_json(json_path)
+        return res
+
+    def query(self, merchants=None, date_from=None, date_to=None, order_id=None, invoice_number=None,
+              total_paise=None):
+        """Stored records in orders_parsed.json order, optionally filtered.
+
+        date_from/date_to (ISO, inclusive) match order_date; records without
+        one are always returned. The invoice filters match any of a record's
+        invoices.
+        """
+        where, args = [], []
+        if merchants:
+            where.append(f'merchant IN ({", ".join("?" * len(merchants))})')
+            args.extend(_merchant(m) for m in merchants)
+        if date_from or date_to:
+            where.append('(order_date IS NULL OR order_date BETWEEN ? AND ?)')
+            args.extend((date_from or '0000-00-00', date_to or '9999-99-99'))
+        for col, value in (('order_id', order_id), ('invoice_number', invoice_number), ('total_paise', total_paise)):
+            if value is not None:
+                where.append(f'seq IN (SELECT order_seq FROM invoices WHERE {col}=?)')
+                args.append(value)
+        sql = 'SELECT event FROM orders'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        with self._lock:
+            rows = self._db.execute(sql + ' ORDER BY seq', args).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def unknown(self):
+        with self._lock:
+            return self._meta('unknown', [])
+
+    def document(self, **filters):
+        """{"ok", "count", "orders", "unknown"}: the orders_parsed.json shape."""
+        found = self.query(**filters)
+        return {'ok': True, 'count': len(found), 'orders': found, 'unknown': self.unknown()}
+
+    def export_json(self, out_path):
+        doc = self.document()
+        with self._lock:
+            orders.write_json_atomic(out_path, doc)
+            self._remember_json(out_path)
+        return {'outPath': out_path, 'total': doc['count'], 'unknown_total': len(doc['unknown'])}
+
+    def count(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT o.merchant, COUNT(DISTINCT o.seq), COUNT(i.id) FROM orders o '
+                'LEFT JOIN invoices i ON i.order_seq = o.seq GROUP BY o.merchant ORDER BY o.merchant'
+            ).fetchall()
+        return [{'merchant': m, 'orders': n, 'invoices': k} for m, n, k in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def default_path(base_dir):
+    env = os.environ.get('HK_PDF_STORE')
+    if env:
+        return None if env == '0' else os.path.expanduser(env)
+    return os.path.join(os.path.expanduser(base_dir), FILE_NAME)
+
+
+def open_default(base_dir):
+    """Open the configured store, importing orders_parsed.json if it changed behind its back; None if disabled."""
+    db_path = default_path(base_dir)
+    if not db_path:
+        return None
+    store = OrderStore(db_path)
+    store.seed(os.path.join(os.path.expanduser(base_dir), 'orders_parsed.json'))
+    return store
+
+
+def read_events(lines):
+    """NDJSON order records -> (events, unknown or None)."""
+    events, unknown = [], None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        obj = json.loads(line)
+        if isinstance(obj, dict) and set(obj) == {'unknown'}:
+            unknown = obj['unknown'] or []
+        else:
+            events.append(obj)
+    return events, unknown
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m hk_pdf.store')
+    ap.add_argument('--base-dir', default='~/HisabKitab')
+    sub = ap.add_subparsers(dest='cmd')
+    ing = sub.add_parser('ingest', help='upsert NDJSON order records from stdin')
+    ing.add_argument('--no-export', action='store_true', help='do not rewrite <baseDir>/orders_parsed.json')
+    ing.add_argument('--merge-unknown', action='store_true', help='merge {"unknown"} into the stored list')
+    q = sub.add_parser('query', help='print matching records as orders_parsed.json')
+    q.add_argument('--merchant', action='append', help='repeatable')
+    q.add_argument('--from', dest='date_from', help='ISO date, inclusive')
+    q.add_argument('--to', dest='date_to', help='ISO date, inclusive')
+    q.add_argument('--order-id')
+    q.add_argument('--invoice-number')
+    q.add_argument('--total-paise', type=int)
+    ex = sub.add_parser('export', help='write orders_parsed.json')
+    ex.add_argument('--out', help='default <baseDir>/orders_parsed.json')
+    args = ap.parse_args(argv)
+
+    base_dir = os.path.abspath(os.path.expanduser(args.base_dir))
+    store = open_default(base_dir)
+    if store is None:
+        print('hk_pdf: order store is disabled (HK_PDF_STORE=0)', file=sys.stderr)
+        return 1
+
+    if args.cmd == 'ingest':
+        events, unknown = read_events(sys.stdin)
+        out = {'ok': True, 'outPath': store.path, **store.ingest(events, unknown, merge=args.merge_unknown)}
+        out['total'] = store.count()
+        out['unknown_total'] = len(store.unknown())
+        if not args.no_export:
+            out['exported'] = store.export_json(os.path.join(base_dir, 'orders_parsed.json'))['outPath']
+    elif args.cmd == 'query':
+        sys.stdout.write(ndjson.dumps(store.document(
+            merchants=args.merchant, date_from=args.date_from, date_to=args.date_to, order_id=args.order_id,
+            invoice_number=args.invoice_number, total_paise=args.total_paise,
+        )) + '\n')
+        return 0
+    elif args.cmd == 'export':
+        out = {'ok': True, **store.export_json(args.out or os.path.join(base_dir, 'orders_parsed.json'))}
+    else:
+        out = {'ok': True, 'path': store.path, 'merchants': store.stats()}
+    print(json.dumps(out, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
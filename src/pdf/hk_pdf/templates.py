@@ -0,0 +1,293 @@
+"""Learned table layouts for the Zepto/Blinkit item tables.
+
+Those invoices come from a handful of stable templates, yet every page ran
+pdfplumber's lines-strategy table finder, whose intersection/cell search is
+the expensive part of extract_tables. A template remembers, per layout
+fingerprint (merchant, page size, table settings and the x positions of the
+table's header row, the line holding "Sr"), the table's column boundaries and
+header row. Only that one line is keyed: item rows never are, so every invoice
+printed from a layout shares its template. For a known layout the page's ruling
+lines are still read and merged exactly like pdfplumber does, but cells are
+cut directly from the horizontal rules (row bands) and the learned columns,
+and characters are bucketed into cells with bisect.
+
+A template is stored only if it reproduces extract_tables() on the page it was
+learned from; layouts it cannot reproduce are remembered as unlearnable and
+always go through the full table finder, as does any page whose ruling does
+not fit its template (partial rules, unexpected vertical lines, a different
+header row).
+
+Templates persist in <base_dir>/pdf_layout_templates.json (default
+~/HisabKitab); HK_PDF_TEMPLATES=<path> moves the file, HK_PDF_TEMPLATES=0
+disables templates.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_right
+
+DEFAULT_PATH = '~/HisabKitab/pdf_layout_templates.json'
+
+# The header row is looked for in this band below the crop's top edge...
+HEADER_BAND = 30
+# ...and is the words within LINE_TOL of its "Sr" word (else of the topmost word).
+LINE_TOL = 3
+
+# Bump when fingerprint() changes: files from another version are ignored.
+FILE_VERSION = 2
+
+
+def default_path(base_dir=None):
+    env = os.environ.get('HK_PDF_TEMPLATES')
+    if env:
+        return None if env == '0' else os.path.expanduser(env)
+    if base_dir:
+        return os.path.join(os.path.expanduser(base_dir), 'pdf_layout_templates.json')
+    return os.path.expanduser(DEFAULT_PATH)
+
+
+class TemplateStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._templates = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f'hk_pdf: ignoring unreadable layout templates {self.path} ({e})', file=sys.stderr)
+            return {}
+        if data.get('version') != FILE_VERSION:
+            return {}
+        return data.get('templates') or {}
+
+    def get(self, fp):
+        with self._lock:
+            return self._templates.get(fp)
+
+    def _write(self, data):
+        # Unique temp name: several backfill workers may save at once.
+        d = os.path.dirname(self.path) or '.'
+        os.makedirs(d, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix='.pdf_layout_templates.', dir=d)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def put(self, fp, tpl):
+        with self._lock:
+            # Merge with what other processes (backfill workers) saved meanwhile.
+            merged = self._read()
+            merged.update(self._templates)
+            if fp in merged:
+                self._templates = merged
+                return
+            merged[fp] = tpl
+            self._templates = merged
+            try:
+                self._write({'version': FILE_VERSION, 'templates': merged})
+            except OSError as e:
+                print(f'hk_pdf: could not save layout templates ({e})', file=sys.stderr)
+
+    def __len__(self):
+        return len(self._templates)
+
+
+_store = None
+_store_path = None
+
+
+def configure(base_dir=None):
+    """Point the process-wide store at <base_dir> (or the default location)."""
+    global _store, _store_path
+    _store = None
+    _store_path = default_path(base_dir)
+
+
+def get_store():
+    """The process-wide TemplateStore, or None when templates are disabled."""
+    global _store, _store_path
+    if _store is None:
+        if _store_path is None:
+            _store_path = default_path()
+        if not _store_path:
+            return None
+        _store = TemplateStore(_store_path)
+    return _store
+
+
+def header_row(words, y0):
+    """The table's header line: words level with the "Sr" word near the crop's top edge."""
+    band = [w for w in words if y0 <= w['top'] < y0 + HEADER_BAND]
+    if not band:
+        return []
+    anchor = next((w for w in band if (w['text'] or '').lower().rstrip('.') == 'sr'), None)
+    top = anchor['top'] if anchor is not None else min(w['top'] for w in band)
+    return [w for w in band if abs(w['top'] - top) <= LINE_TOL]
+
+
+def fingerprint(merchant, page, words, bbox, settings):
+    """Layout key: merchant, page size, table settings and the header row's words and x positions."""
+    y0 = bbox[1] if bbox else 0
+    header = sorted((round(w['x0']), w['text'] or '') for w in header_row(words, y0))
+    key = json.dumps([round(page.width), round(page.height), sorted((settings or {}).items()), header])
+    return f'{merchant}:{hashlib.sha1(key.encode("utf8")).hexdigest()[:16]}'
+
+
+def _ruling(cp, settings):
+    """Vertical and horizontal ruling edges exactly as the lines strategy sees them."""
+    from pdfplumber import utils  # type: ignore
+    from pdfplumber.table import merge_edges  # type: ignore
+
+    base = (utils.filter_edges(cp.edges, 'v', min_length=settings.edge_min_length_prefilter)
+            + utils.filter_edges(cp.edges, 'h', min_length=settings.edge_min_length_prefilter))
+    edges = merge_edges(base, settings.snap_x_tolerance, settings.snap_y_tolerance,
+                        settings.join_x_tolerance, settings.join_y_tolerance)
+    edges = utils.filter_edges(edges, min_length=settings.edge_min_length)
+    return ([e for e in edges if e['orientation'] == 'v'],
+            [e for e in edges if e['orientation'] == 'h'])
+
+
+def _cells(tpl, cp, settings):
+    """Cell bboxes for the template's table on this page, or None if the ruling does not fit."""
+    v, h = _ruling(cp, settings)
+    xt = settings.intersection_x_tolerance
+    yt = settings.intersection_y_tolerance
+    cols = tpl['cols']
+    left, right = cols[0], cols[-1]
+
+    ys = set()
+    for e in h:
+        if e['x1'] < left - xt or e['x0'] > right + xt:
+            continue
+        if e['x0'] > left + xt or e['x1'] < right - xt:
+            return None  # partial rule: leave it to the table finder
+        ys.add(e['top'])
+    ys = sorted(ys)
+    if len(ys) < 2:
+        return None
+
+    for e in v:
+        if e['bottom'] < ys[0] - yt or e['top'] > ys[-1] + yt or e['x0'] < left - xt or e['x0'] > right + xt:
+            continue
+        if not any(abs(e['x0'] - x) <= xt for x in cols):
+            return None  # a vertical line the template does not know about
+
+    cells = []
+    for y_a, y_b in zip(ys, ys[1:]):
+        xs = []
+        for x in cols:
+            for e in v:
+                if abs(e['x0'] - x) <= xt and e['top'] <= y_a + yt and e['bottom'] >= y_b - yt:
+                    xs.append(e['x0'])
+                    break
+        if len(xs) < 2 or abs(xs[0] - left) > xt or abs(xs[-1] - right) > xt:
+            return None
+        cells.extend((x_a, y_a, x_b, y_b) for x_a, x_b in zip(xs, xs[1:]))
+    return cells
+
+
+def _extract(cp, cells):
+    """Table.extract() for these cells: chars bucketed by centre, text via pdfplumber."""
+    from pdfplumber import utils  # type: ignore
+
+    tops = sorted({c[1] for c in cells})
+    xs = sorted({c[0] for c in cells})
+    rows = {top: {} for top in tops}
+    for c in cells:
+        rows[c[1]][c[0]] = c
+    row_x0s = {top: sorted(r) for top, r in rows.items()}
+
+    buckets = {}
+    for ch in cp.chars:
+        v_mid = (ch['top'] + ch['bottom']) / 2
+        h_mid = (ch['x0'] + ch['x1']) / 2
+        ri = bisect_right(tops, v_mid) - 1
+        if ri < 0:
+            continue
+        top = tops[ri]
+        x0s = row_x0s[top]
+        ci = bisect_right(x0s, h_mid) - 1
+        if ci < 0:
+            continue
+        cell = rows[top][x0s[ci]]
+        if h_mid < cell[2] and v_mid < cell[3]:
+            buckets.setdefault(cell, []).append(ch)
+
+    out = []
+    for top in tops:
+        arr = []
+        for x in xs:
+            cell = rows[top].get(x)
+            if cell is None:
+                arr.append(None)
+            else:
+                chars = buckets.get(cell)
+                arr.append(utils.extract_text(chars) if chars else '')
+        out.append(arr)
+    return out
+
+
+def apply(tpl, cp, settings):
+    """Rows of the template's table on the cropped page, or None to fall back."""
+    cells = _cells(tpl, cp, settings)
+    if not cells:
+        return None
+    table = _extract(cp, cells)
+    if not table or table[0] != tpl['header']:
+        return None
+    return table
+
+
+def learn(cp, settings, tables):
+    """Template from find_tables() output, if it reproduces the first table exactly."""
+    if not tables:
+        return None
+    first = tables[0].extract()
+    if not first:
+        return None
+    cols = sorted({c[0] for c in tables[0].cells if c} | {c[2] for c in tables[0].cells if c})
+    tpl = {'cols': cols, 'header': first[0], 'created_at': int(time.time())}
+    if apply(tpl, cp, settings) != first:
+        return None
+    return tpl
+
+
+def tables(plumber, i, settings, bbox, words, merchant, store):
+    """extract_tables() on page i (cropped to bbox) through the template store.
+
+    A known layout yields [first table] without running the table finder;
+    otherwise the full finder runs and the layout is learned for next time.
+    """
+    from pdfplumber.table import TableSettings  # type: ignore
+
+    page = plumber.pages[i]
+    cp = page.crop(bbox) if bbox is not None else page
+    resolved = TableSettings.resolve(settings)
+    fp = fingerprint(merchant, page, words, bbox, settings)
+    tpl = store.get(fp)
+    if tpl and tpl.get('cols'):
+        table = apply(tpl, cp, resolved)
+        if table is not None:
+            return [table]
+
+    found = cp.find_tables(settings)
+    if tpl is None:
+        store.put(fp, learn(cp, resolved, found) or {'learnable': False, 'created_at': int(time.time())})
+    return [t.extract() for t in found]
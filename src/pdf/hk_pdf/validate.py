@@ -0,0 +1,165 @@
+"""Invoice arithmetic checks shared by the parsers, done in integer paise.
+
+Each parser hands validate() the figures it read and attaches the result to
+its output as 'validation':
+
+  {"confidence": 0.0-1.0,
+   "items_paise": 36000, "taxes_paise": 0, "fees_paise": 0, "discounts_paise": 0,
+   "discrepancies": [{"check": "total", "ok": true, "expected_paise": 37500,
+                      "actual_paise": 36000, "diff_paise": -1500}],
+   "notes": ["dropped 1 row with qty > 100"]}
+
+Checks, each run only when the invoice states the figures it needs:
+  item_total  items add up to the stated item subtotal
+  total       items + fees - discounts add up to the stated total; with
+              partial=True (items net of taxes/charges the parser does not
+              itemize) they only have to stay within it
+  discounts   gross - line discounts add up to the items
+  item_tax    per line, taxable + CGST + SGST + cess add up to the line total
+
+A check passes within TOLERANCE_PAISE. confidence is the mean score of the
+checks that ran (1 for a match, PARTIAL_SCORE for a partial total the items
+stay within, 0 for a failure), UNCHECKED when none could run and 0 without items. Every
+note (a fallback the parser took, rows it dropped or could not price) scales
+a checked score by NOTE_PENALTY. An unchecked invoice stays at UNCHECKED
+(= LOW_CONFIDENCE, the consumers' default --min-confidence) whatever its notes:
+e.g. a Blinkit page without a Total row has nothing to check its items against,
+which is no reason to drop it downstream. discrepancies lists the checks whose
+figures differ at all, passing or not.
+"""
+
+from . import money
+
+TOLERANCE_PAISE = 100
+PARTIAL_SCORE = 0.7
+UNCHECKED = 0.5
+NOTE_PENALTY = 0.8
+
+# Below this, consumers should not trust the items to explain the total.
+LOW_CONFIDENCE = 0.5
+
+
+def _sum(amounts):
+    return money.total([money.to_paise(a) for a in amounts]) or 0
+
+
+def _check(name, expected, actual, within=False):
+    diff = actual - expected
+    exact = abs(diff) <= TOLERANCE_PAISE
+    ok = exact or (within and diff < 0)
+    return {
+        'check': name,
+        'ok': ok,
+        'expected_paise': expected,
+        'actual_paise': actual,
+        'diff_paise': diff,
+    }, (1.0 if exact else PARTIAL_SCORE if ok else 0.0)
+
+
+def reconciles(amounts, item_total=None, fees=(), total=None):
+    """True when every amount is known and they add up to item_total, or with fees to total."""
+    ps = [money.to_paise(a) for a in amounts]
+    if not ps or None in ps:
+        return False
+    s = sum(ps)
+    it = money.to_paise(item_total)
+    if it is not None and abs(s - it) <= TOLERANCE_PAISE:
+        return True
+    t = money.to_paise(total)
+    return t is not None and abs(s + _sum(fees) - t) <= TOLERANCE_PAISE
+
+
+def validate(amounts, item_total=None, total=None, fees=(), discounts=(), gross=None,
+             line_discounts=(), lines=(), partial=False, notes=()):
+    """amounts: the item amounts (rupees) that make up the invoice.
+
+    fees/discounts: invoice-level charges and discounts outside the items.
+    gross/line_discounts: per-line pre-discount values and the discounts the
+    items are already net of, for the discounts check.
+    lines: (label, total, taxable, (cgst, sgst, cess)) per item, for item_tax.
+    """
+    notes = list(notes)
+    ps = [money.to_paise(a) for a in amounts]
+    missing = sum(p is None for p in ps)
+    if missing:
+        notes.append(f'{missing} item(s) without an amount')
+    items = money.total(ps) or 0
+    fee = _sum(fees)
+    disc = _sum(discounts)
+    line_disc = _sum(line_discounts)
+
+    taxes = 0
+    bad_lines = []
+    checked_lines = 0
+    for label, line_total, taxable, line_taxes in lines:
+        tax = [money.to_paise(t) for t in line_taxes]
+        taxes += sum(t for t in tax if t is not None)
+        lt, tv = money.to_paise(line_total), money.to_paise(taxable)
+        if lt is None or tv is None:
+            continue
+        checked_lines += 1
+        if abs(tv + sum(t for t in tax if t is not None) - lt) > TOLERANCE_PAISE:
+            bad_lines.append(label)
+
+    checks = []
+    it = money.to_paise(item_total)
+    if it is not None and len(ps) > missing:
+        checks.append(_check('item_total', it, items))
+    t = money.to_paise(total)
+    if t is not None and len(ps) > missing:
+        if partial:
+            checks.append(_check('total', t, items + fee - disc, within=True))
+        else:
+            checks.append(_check('total', t, items + fee - disc))
+    if gross is not None and len(ps) > missing:
+        checks.append(_check('discounts', items, _sum(gross) - line_disc))
+    if checked_lines:
+        checks.append(({
+            'check': 'item_tax',
+            'ok': not bad_lines,
+            'lines': checked_lines,
+            'bad_lines': bad_lines,
+        }, 0.0 if bad_lines else 1.0))
+
+    if len(ps) == missing:
+        confidence = 0.0
+    elif checks:
+        confidence = sum(score for _, score in checks) / len(checks)
+        confidence *= NOTE_PENALTY ** len(notes)
+    else:
+        confidence = UNCHECKED
+
+    return {
+        'confidence': round(confidence, 2),
+        'items_paise': items,
+        'taxes_paise': taxes,
+        'fees_paise': fee,
+        'discounts_paise': disc + line_disc,
+        'discrepancies': [c for c, _ in checks if c.get('diff_paise') or c.get('bad_lines')],
+        'notes': notes,
+    }
+
+
+def combine(validations):
+    """Document-level summary of per-invoice validations: the weakest confidence wins."""
+    validations = [v for v in validations if v]
+    if not validations:
+        return validate([])
+    return {
+        'confidence': min(v['confidence'] for v in validations),
+        'items_paise': sum(v['items_paise'] for v in validations),
+        'taxes_paise': sum(v['taxes_paise'] for v in validations),
+        'fees_paise': sum(v['fees_paise'] for v in validations),
+        'discounts_paise': sum(v['discounts_paise'] for v in validations),
+        'discrepancies': [
+            {'invoice': i, **d}
+            for i, v in enumerate(validations)
+            for d in v['discrepancies']
+        ],
+        'notes': [n for v in validations for n in v['notes']],
+    }
+
+
+def item_amounts(items, total, partial=False, notes=()):
+    """validate() for the [{name, qty, amount}] item lists of the text parsers."""
+    return validate([it.get('amount') for it in items], total=total, partial=partial, notes=notes)
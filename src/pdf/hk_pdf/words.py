@@ -0,0 +1,177 @@
+"""Compact page words and a spatial index over them.
+
+pdfplumber's extract_words() gives one dict per word with a dozen keys, and a
+Document keeps them for every page it touched. Words stores just what the
+parsers use, column-wise: x0/x1/top/bottom in array('d') and the text as ids
+into a per-document TextTable, so repeated strings ('0.00', 'NOS', header
+labels) are stored once. Indexing or iterating yields Word records (__slots__,
+with w['top'] / w.get('text') access like the dicts they replace), built on
+demand and not kept.
+
+Header/total lookups in the table parsers used to be nested loops over every
+word on the page. WordIndex buckets words by lowercase text and keeps each
+bucket sorted by `top`, so "word X on the same line as word Y, to its right"
+and "'total' rows below y" are a dict lookup plus a bisect.
+
+Results follow the original loops exactly: where several words qualify, the
+one earliest in extract_words() order wins.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+FIELDS = ('x0', 'x1', 'top', 'bottom')
+
+
+class TextTable:
+    """Interned strings shared by all pages of a document: text <-> small int id."""
+
+    __slots__ = ('ids', 'texts')
+
+    def __init__(self):
+        self.ids = {}
+        self.texts = []
+
+    def id(self, text):
+        i = self.ids.get(text)
+        if i is None:
+            i = self.ids[text] = len(self.texts)
+            self.texts.append(text)
+        return i
+
+
+class Word:
+    """One word: text and bounding box; readable like an extract_words() dict."""
+
+    __slots__ = ('text', 'x0', 'x1', 'top', 'bottom')
+
+    def __init__(self, text, x0, x1, top, bottom):
+        self.text = text
+        self.x0 = x0
+        self.x1 = x1
+        self.top = top
+        self.bottom = bottom
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def __repr__(self):
+        return f'Word({self.text!r}, x0={self.x0}, top={self.top})'
+
+
+class Words:
+    """A page's words as parallel arrays (struct of arrays)."""
+
+    __slots__ = ('x0', 'x1', 'top', 'bottom', 'text_ids', 'table')
+
+    def __init__(self, table=None):
+        self.x0 = array('d')
+        self.x1 = array('d')
+        self.top = array('d')
+        self.bottom = array('d')
+        self.text_ids = array('I')
+        self.table = table if table is not None else TextTable()
+
+    @classmethod
+    def from_dicts(cls, words, table=None):
+        out = cls(table)
+        intern = out.table.id
+        for w in words:
+            out.x0.append(w['x0'])
+            out.x1.append(w['x1'])
+            out.top.append(w['top'])
+            out.bottom.append(w['bottom'])
+            out.text_ids.append(intern(w.get('text') or ''))
+        return out
+
+    def __len__(self):
+        return len(self.x0)
+
+    def text(self, i):
+        return self.table.texts[self.text_ids[i]]
+
+    def __getitem__(self, i):
+        return Word(self.table.texts[self.text_ids[i]], self.x0[i], self.x1[i], self.top[i], self.bottom[i])
+
+    def __iter__(self):
+        texts = self.table.texts
+        return map(Word, (texts[t] for t in self.text_ids), self.x0, self.x1, self.top, self.bottom)
+
+
+class WordIndex:
+    def __init__(self, words):
+        if not isinstance(words, Words):
+            words = Words.from_dicts(words)
+        self.words = words
+        texts = words.table.texts
+        lower = {}
+        buckets = {}
+        for i, (tid, top) in enumerate(zip(words.text_ids, words.top)):
+            key = lower.get(tid)
+            if key is None:
+                key = lower[tid] = texts[tid].lower()
+            buckets.setdefault(key, []).append((top, i))
+        self._by_text = {}
+        self._tops = {}
+        for text, entries in buckets.items():
+            entries.sort()
+            self._by_text[text] = entries
+            self._tops[text] = [e[0] for e in entries]
+
+    def _entries(self, texts):
+        out = []
+        for t in texts:
+            out.extend(self._by_text.get(t, ()))
+        return out
+
+    def iter_text(self, *texts):
+        """Words whose lowercase text is one of texts, in extract_words() order."""
+        words = self.words
+        return [words[i] for i in sorted(i for _top, i in self._entries(texts))]
+
+    def first(self, *texts):
+        ws = self.iter_text(*texts)
+        return ws[0] if ws else None
+
+    def on_line(self, texts, top, tol):
+        """(index, word) for words in texts with abs(word.top - top) < tol."""
+        out = []
+        for t in texts:
+            tops = self._tops.get(t)
+            if not tops:
+                continue
+            entries = self._by_text[t]
+            # widen the bisect window slightly; the exact test below decides
+            lo = bisect_left(tops, top - tol - 1e-6)
+            hi = bisect_right(tops, top + tol + 1e-6)
+            for e_top, i in entries[lo:hi]:
+                if abs(e_top - top) < tol:
+                    out.append((i, self.words[i]))
+        return out
+
+    def right_of(self, w, texts, tol):
+        """First word in texts on w's line (within tol) whose x0 is right of w's."""
+        best = None
+        for i, w2 in self.on_line(texts, w['top'], tol):
+            if w2['x0'] > w['x0'] and (best is None or i < best[0]):
+                best = (i, w2)
+        return best[1] if best else None
+
+    def last_below(self, text, y, max_x0=None):
+        """Lowest word `text` with top > y (and x0 < max_x0), or None."""
+        tops = self._tops.get(text)
+        if not tops:
+            return None
+        entries = self._by_text[text]
+        x0 = self.words.x0
+        lo = bisect_right(tops, y)
+        for e_top, i in reversed(entries[lo:]):
+            if e_top > y and (max_x0 is None or x0[i] < max_x0):
+                return self.words[i]
+        return None
@@ -0,0 +1,76 @@
+// orders_parsed.json through the python order store (hk_pdf/store.py,
+// <baseDir>/orders_parsed.sqlite): new events are upserted instead of the whole
+// file being read and rewritten, and readers get only the records they ask for.
+//
+// orders_parsed.json stays the store's export for readers of the file
+// (web/server): writers call exportOrders (or ingestOrders with exportJson)
+// once per run. HK_PDF_STORE=0 (or no working python) falls back to the JSON
+// file itself.
+
+const fs = require('fs');
+const path = require('path');
+const { spawnSync } = require('child_process');
+const { pythonBin, pdfDir } = require('./run_pdf_parser');
+
+function storeEnabled(){
+  return process.env.HK_PDF_STORE !== '0';
+}
+
+function runStore(baseDir, args, input){
+  const r = spawnSync(pythonBin(), ['-m', 'hk_pdf.store', '--base-dir', baseDir, ...args], {
+    cwd: pdfDir(),
+    input: input || '',
+    encoding: 'utf8',
+    maxBuffer: 1 << 30,
+    stdio: ['pipe', 'pipe', 'inherit'],
+  });
+  if (r.error || r.status !== 0) return null;
+  try { return JSON.parse(r.stdout); } catch { return null; }
+}
+
+// Upsert order events (keyed like mergeOrders); unknown replaces the stored unknown list,
+// or with mergeUnknown is merged into it by messageId.
+// exportJson also rewrites orders_parsed.json from the store, for readers of the file.
+// Returns { outPath, total, unknown_total }, or null when the store is not available.
+function ingestOrders(baseDir, events, unknown, { exportJson = false, mergeUnknown = false } = {}){
+  if (!storeEnabled()) return null;
+  const lines = events.map(e => JSON.stringify(e));
+  if (unknown) lines.push(JSON.stringify({ unknown }));
+  const args = ['ingest'];
+  if (!exportJson) args.push('--no-export');
+  if (mergeUnknown) args.push('--merge-unknown');
+  const res = runStore(baseDir, args, lines.join('\n') + '\n');
+  return res && res.ok ? { outPath: res.outPath, total: res.total, unknown_total: res.unknown_total } : null;
+}
+
+// Rewrite orders_parsed.json from the store. Returns { outPath, total, unknown_total } or null.
+function exportOrders(baseDir){
+  if (!storeEnabled()) return null;
+  const res = runStore(baseDir, ['export']);
+  return res && res.ok ? { outPath: res.outPath, total: res.total, unknown_total: res.unknown_total } : null;
+}
+
+// { ok, count, orders, unknown } like orders_parsed.json, optionally narrowed:
+// merchants: ['ZEPTO', ...], from / to: ISO dates (inclusive) of the invoice date.
+// Records the store cannot date are always included; callers still filter exactly.
+// null when there is neither a store nor an orders_parsed.json (or it cannot be read).
+function loadOrders(baseDir, { merchants, from, to } = {}){
+  const jsonPath = path.join(baseDir, 'orders_parsed.json');
+  const storePath = process.env.HK_PDF_STORE || path.join(baseDir, 'orders_parsed.sqlite');
+  if (!fs.existsSync(jsonPath) && !(storeEnabled() && fs.existsSync(storePath))) return null;
+  if (storeEnabled()) {
+    const args = ['query'];
+    for (const m of merchants || []) args.push('--merchant', m);
+    if (from) args.push('--from', from);
+    if (to) args.push('--to', to);
+    const doc = runStore(baseDir, args);
+    if (doc && doc.ok) return doc;
+  }
+  try {
+    return JSON.parse(fs.readFileSync(jsonPath, 'utf8'));
+  } catch {
+    return null;
+  }
+}
+
+module.exports = { ingestOrders, exportOrders, loadOrders };
@@ -1,237 +1,297 @@
 #!/usr/bin/env python3
-import re
 import json
 import sys
-from pathlib import Path
-import pdfplumber
 
-
-def norm_money(s: str):
-    if s is None:
-        return None
-    s = s.replace(',', '').strip()
-    try:
-        return float(s)
-    except:
+from hk_pdf import dates, inputs, money, ndjson, validate
+from hk_pdf.document import open_document
+from hk_pdf.patterns import BLINKIT as P, COMMON as C, HeaderScanner
+
+# Bump when parse output changes; invalidates this parser's hk_pdf cache entries.
+PARSER_VERSION = 7
+
+HEADER = HeaderScanner({
+    'order_id': [P.order_id, P.order_id_alt],
+    'invoice_number': [P.invoice_number],
+    'invoice_date': [P.invoice_date],
+    'grand_total': [P.grand_total, P.total_amount],
+})
+# Rupee fields that get an exact <field>_paise twin in the output.
+ITEM_MONEY = ('total', 'mrp', 'discount')
+INVOICE_MONEY = ('invoice_total', 'mrp_sum', 'discount_sum')
+HEADER_MONEY = ('grand_total', 'overall_total')
+PAGE_HEADER = HeaderScanner({
+    'invoice_number': [P.invoice_number],
+    'invoice_date': [P.invoice_date],
+})
+
+
+TABLE_SETTINGS = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+    "intersection_tolerance": 5,
+    "snap_tolerance": 3,
+    "join_tolerance": 3,
+    "edge_min_length": 20,
+}
+
+
+def iter_invoices(doc):
+    """Yield one invoice per page that has an item table, in page order.
+
+    These PDFs often bundle multiple invoices (one per page), each with its own
+    table + Total. Pages are read one at a time and released once their
+    invoice is out, so long merged PDFs stay within a page's worth of memory.
+    """
+    for pi in doc.stream():
+        doc.page_text(pi)  # memoized for parse_document's header scan
+        inv = page_invoice(doc, pi)
+        if inv is not None:
+            yield inv
+
+
+def page_invoice(doc, pi):
+    """Invoice dict for page pi, or None when the page has no item table."""
+    page = doc.page(pi)
+    page_text = doc.page_text(pi)
+    words = doc.word_index(pi)
+
+    # locate the item table header y by finding "Sr." + "no"
+    header_top = None
+    for w in words.iter_text('sr.', 'sr'):
+        w2 = words.right_of(w, ('no', 'no.'), 2.5)
+        if w2 is not None:
+            header_top = min(w['top'], w2['top'])
+            break
+    if header_top is None:
         return None
 
+    # Find the "Total" row y (the one in left column, not the header column name);
+    # the lowest such 'total' wins.
+    w = words.last_below('total', header_top + 50, max_x0=100)
+    total_row_top = w['top'] if w is not None else None
 
-def extract_first(patterns, text, flags=0, group=1):
-    for pat in patterns:
-        m = re.search(pat, text, flags)
-        if m:
-            return m.group(group).strip()
-    return None
+    y0 = max(0, header_top - 8)
+    y1 = min(page.height, (total_row_top + 25) if total_row_top is not None else (header_top + 260))
+    tbs = doc.tables(pi, TABLE_SETTINGS, bbox=(0, y0, page.width, y1), template='blinkit')
+    if not tbs:
+        return None
 
+    tb = tbs[0]
+    header = [str(c or '').strip().lower() for c in tb[0]]
+    idx_desc = next((i for i,c in enumerate(header) if 'item' in c and 'description' in c), None)
+    idx_qty  = next((i for i,c in enumerate(header) if 'qty' in c), None)
+    idx_total= next((i for i,c in enumerate(header) if c == 'total' or c.endswith('total')), None)
+    idx_disc = next((i for i,c in enumerate(header) if 'discount' in c), None)
+    idx_mrp  = next((i for i,c in enumerate(header) if c == 'mrp' or 'mrp' in c), None)
+
+    inv_items = []
+    inv_total = None
+    mrps = []
+    discounts = []
+
+    for row in tb[1:]:
+        if not row:
+            continue
+        first = str(row[0] or '').strip().lower() if len(row) else ''
+        if first in ('total','grand total'):
+            # capture invoice total from the Total row
+            if idx_total is not None and idx_total < len(row):
+                inv_total = money.to_paise(str(row[idx_total] or ''))
+            continue
+
+        desc = (row[idx_desc] if idx_desc is not None and idx_desc < len(row) else '')
+        desc = C.ws.sub(' ', str(desc or '')).strip()
+        if not desc:
+            continue
+
+        qty = None
+        if idx_qty is not None and idx_qty < len(row):
+            q = str(row[idx_qty] or '').strip()
+            try:
+                qty = int(float(q)) if q else None
+            except (ValueError, TypeError):
+                qty = None
 
-def main():
-    if len(sys.argv) < 2:
-        print('Usage: parse_blinkit_invoice.py <invoice.pdf>', file=sys.stderr)
-        sys.exit(2)
+        total = None
+        if idx_total is not None and idx_total < len(row):
+            total = money.to_paise(str(row[idx_total] or ''))
+
+        mrp = None
+        if idx_mrp is not None and idx_mrp < len(row):
+            mrp = money.to_paise(str(row[idx_mrp] or ''))
+            mrps.append(mrp)
+
+        disc = None
+        if idx_disc is not None and idx_disc < len(row):
+            disc = money.to_paise(str(row[idx_disc] or ''))
+            discounts.append(disc)
+
+        inv_items.append(money.with_paise({
+            'name': desc,
+            'qty': qty,
+            'total': money.to_rupees(total),
+            'mrp': money.to_rupees(mrp),
+            'discount': money.to_rupees(disc),
+        }, ITEM_MONEY))
+
+    # page-level invoice metadata
+    page_hdr = PAGE_HEADER.scan(page_text)
+    page_invoice_number = page_hdr['invoice_number']
+    page_date = page_hdr['invoice_date']
+    page_iso, page_ms = dates.stamp(page_date)
+
+    # Fallback: if Total row not detected, compute invoice_total as sum of item totals.
+    # The item sum is not checked against itself: such an invoice is unchecked.
+    notes = []
+    stated_total = inv_total
+    if inv_total is None and inv_items:
+        inv_total = money.total([it['total_paise'] for it in inv_items])
+        if inv_total is not None:
+            notes.append('no Total row; invoice_total is the item sum')
+
+    inv = money.with_paise({
+        'page_index': pi,
+        'invoice_number': page_invoice_number,
+        'date': page_date,
+        'invoice_date': page_iso,
+        'invoice_date_ms': page_ms,
+        'items': inv_items,
+        'invoice_total': money.to_rupees(inv_total),
+        'mrp_sum': money.to_rupees(money.total(mrps) or 0),
+        'discount_sum': money.to_rupees(money.total(discounts) or 0),
+    }, INVOICE_MONEY)
+    inv['validation'] = invoice_validation(inv_items, money.to_rupees(stated_total), notes)
+    return inv
+
+
+def invoice_validation(items, invoice_total, notes):
+    # MRP is per unit and Discount per line, so the discounts check needs every
+    # line's MRP, discount and qty.
+    gross = None
+    line_discounts = ()
+    if items and all(it['mrp'] is not None and it['discount'] is not None and it['qty'] for it in items):
+        gross = [money.to_rupees(it['mrp_paise'] * it['qty']) for it in items]
+        line_discounts = [it['discount'] for it in items]
+    return validate.validate(
+        [it['total'] for it in items],
+        total=invoice_total,
+        gross=gross,
+        line_discounts=line_discounts,
+        notes=notes,
+    )
+
+
+def parse(source):
+    with open_document(source) as doc:
+        return parse_document(doc)
+
+
+def parse_document(doc):
+    # Tables first: this streams the pages once and memoizes their text.
+    invoices = []
+    try:
+        for inv in iter_invoices(doc):
+            invoices.append(inv)
+    except Exception:
+        pass
+
+    out = document_header(doc)
+    out['overall_total'] = overall_total([inv['invoice_total_paise'] for inv in invoices])
+    out = money.with_paise(out, HEADER_MONEY)
+    out['validation'] = validate.combine([inv['validation'] for inv in invoices])
+    out['invoices'] = invoices
+    return out
 
-    pdf_path = Path(sys.argv[1])
-    if not pdf_path.exists():
-        raise SystemExit(f'File not found: {pdf_path}')
 
-    with pdfplumber.open(str(pdf_path)) as pdf:
-        pages = []
-        full_text = ''
-        for p in pdf.pages:
-            t = p.extract_text() or ''
-            pages.append({"page": p, "text": t})
-            full_text += '\n' + t
+def iter_records(doc):
+    """--ndjson records: {'type': 'invoice', ...} per invoice as soon as its page
+    is parsed, then {'type': 'summary', ...} with the document header fields,
+    overall_total, validation and invoice_count."""
+    totals = []
+    validations = []
+    try:
+        for inv in iter_invoices(doc):
+            totals.append(inv['invoice_total_paise'])
+            validations.append(inv['validation'])
+            yield {'type': 'invoice', **inv}
+    except Exception:
+        pass
+    summary = {'type': 'summary', **document_header(doc)}
+    summary['overall_total'] = overall_total(totals)
+    summary = money.with_paise(summary, HEADER_MONEY)
+    summary['validation'] = validate.combine(validations)
+    summary['invoice_count'] = len(totals)
+    yield summary
 
-    text = re.sub(r'\r\n?', '\n', full_text)
 
-    order_id = extract_first([
-        r'Order\s*Id\s*:?\s*(\d+)',
-        r'Order\s*ID\s*:?\s*(\d+)',
-    ], text, flags=re.IGNORECASE)
+def document_header(doc):
+    """merchant, order id, first invoice number/date and grand total from the full text."""
+    full_text = ''.join('\n' + doc.page_text(i) for i in range(doc.page_count))
 
-    invoice_number = extract_first([
-        r'Invoice\s*Number\s*:?\s*([A-Z0-9]+)',
-    ], text, flags=re.IGNORECASE)
+    text = C.crlf.sub('\n', full_text)
 
-    invoice_date = extract_first([
-        r'\b(\d{2}-[A-Za-z]{3}-\d{4})\b',
-    ], text)
+    hdr = HEADER.scan(text)
+    order_id = hdr['order_id']
+    invoice_number = hdr['invoice_number']
+    date = hdr['invoice_date']
+    invoice_date, invoice_date_ms = dates.stamp(date)
 
     # grand total: try common patterns
     grand_total = None
-    gt = extract_first([
-        r'Grand\s*Total\s*:?\s*₹?\s*([0-9,]+(?:\.[0-9]{2})?)',
-        r'Total\s*Amount\s*:?\s*₹?\s*([0-9,]+(?:\.[0-9]{2})?)',
-    ], text, flags=re.IGNORECASE)
+    gt = hdr['grand_total']
     if gt:
-        grand_total = norm_money(gt)
+        grand_total = money.rupees(gt)
 
     # Fallback: find last amount before "Rupees" in "Amount in Words" section
     if grand_total is None:
-        m = re.search(r'(\d+\.\d{2})\s*\n\s*.*Rupees', text, flags=re.IGNORECASE)
+        m = P.amount_before_rupees.search(text)
         if m:
-            grand_total = norm_money(m.group(1))
+            grand_total = money.rupees(m.group(1))
         else:
             # last-resort: scan lines for "Rupees" and pick previous money-like token
             lines = [ln.strip() for ln in text.split('\n') if ln.strip()]
             for i, ln in enumerate(lines):
                 if 'rupees' in ln.lower() and i > 0:
                     for j in range(i-1, max(-1, i-10), -1):
-                        if re.fullmatch(r'\d+(?:\.\d{2})?', lines[j]):
-                            grand_total = norm_money(lines[j])
+                        if P.amount_line.fullmatch(lines[j]):
+                            grand_total = money.rupees(lines[j])
                             break
                 if grand_total is not None:
                     break
 
-    invoices = []
-
-    # Blinkit-specific: these PDFs often bundle multiple invoices (multiple pages), each with its own table + Total.
-    # We extract one "invoice" per page that contains the item table.
-    try:
-        table_settings = {
-            "vertical_strategy": "lines",
-            "horizontal_strategy": "lines",
-            "intersection_tolerance": 5,
-            "snap_tolerance": 3,
-            "join_tolerance": 3,
-            "edge_min_length": 20,
-        }
-
-        for pi, pg in enumerate(pages):
-            page = pg["page"]
-            page_text = pg["text"] or ''
-            words = page.extract_words() or []
-
-            # locate the item table header y by finding "Sr." + "no"
-            header_top = None
-            for w in words:
-                if w.get('text','').lower() in ('sr.','sr'):
-                    for w2 in words:
-                        if w2.get('text','').lower() in ('no','no.') and abs(w2['top']-w['top']) < 2.5 and w2['x0'] > w['x0']:
-                            header_top = min(w['top'], w2['top'])
-                            break
-                if header_top is not None:
-                    break
-            if header_top is None:
-                continue
-
-            # Find the "Total" row y (the one in left column, not the header column name)
-            total_row_top = None
-            totals = [w for w in words if w.get('text','').lower() == 'total']
-            for w in sorted(totals, key=lambda x: x['top']):
-                if w['x0'] < 100 and w['top'] > header_top + 50:
-                    total_row_top = w['top']
-
-            y0 = max(0, header_top - 8)
-            y1 = min(page.height, (total_row_top + 25) if total_row_top is not None else (header_top + 260))
-            cropped = page.crop((0, y0, page.width, y1))
-            tbs = cropped.extract_tables(table_settings) or []
-            if not tbs:
-                continue
-
-            tb = tbs[0]
-            header = [str(c or '').strip().lower() for c in tb[0]]
-            idx_desc = next((i for i,c in enumerate(header) if 'item' in c and 'description' in c), None)
-            idx_qty  = next((i for i,c in enumerate(header) if 'qty' in c), None)
-            idx_total= next((i for i,c in enumerate(header) if c == 'total' or c.endswith('total')), None)
-            idx_disc = next((i for i,c in enumerate(header) if 'discount' in c), None)
-            idx_mrp  = next((i for i,c in enumerate(header) if c == 'mrp' or 'mrp' in c), None)
-
-            inv_items = []
-            inv_total = None
-            inv_mrp_sum = 0.0
-            inv_discount_sum = 0.0
-
-            for row in tb[1:]:
-                if not row:
-                    continue
-                first = str(row[0] or '').strip().lower() if len(row) else ''
-                if first in ('total','grand total'):
-                    # capture invoice total from the Total row
-                    if idx_total is not None and idx_total < len(row):
-                        inv_total = norm_money(str(row[idx_total] or ''))
-                    continue
-
-                desc = (row[idx_desc] if idx_desc is not None and idx_desc < len(row) else '')
-                desc = re.sub(r'\s+', ' ', str(desc or '')).strip()
-                if not desc:
-                    continue
-
-                qty = None
-                if idx_qty is not None and idx_qty < len(row):
-                    q = str(row[idx_qty] or '').strip()
-                    try:
-                        qty = int(float(q)) if q else None
-                    except:
-                        qty = None
-
-                total = None
-                if idx_total is not None and idx_total < len(row):
-                    total = norm_money(str(row[idx_total] or ''))
-
-                mrp = None
-                if idx_mrp is not None and idx_mrp < len(row):
-                    mrp = norm_money(str(row[idx_mrp] or ''))
-                    if mrp is not None:
-                        inv_mrp_sum += mrp
-
-                disc = None
-                if idx_disc is not None and idx_disc < len(row):
-                    disc = norm_money(str(row[idx_disc] or ''))
-                    if disc is not None:
-                        inv_discount_sum += disc
-
-                inv_items.append({ 'name': desc, 'qty': qty, 'total': total, 'mrp': mrp, 'discount': disc })
-
-            # page-level invoice metadata
-            page_invoice_number = extract_first([r'Invoice\s*Number\s*:?\s*([A-Z0-9]+)'], page_text, flags=re.IGNORECASE)
-            page_date = extract_first([r'\b(\d{2}-[A-Za-z]{3}-\d{4})\b'], page_text)
-
-            # Fallback: if Total row not detected, compute invoice_total as sum of item totals.
-            if inv_total is None and inv_items:
-                s_items = 0.0
-                any_item_total = False
-                for it in inv_items:
-                    if it.get('total') is not None:
-                        s_items += float(it['total'])
-                        any_item_total = True
-                inv_total = round(s_items, 2) if any_item_total else None
-
-            invoices.append({
-                'page_index': pi,
-                'invoice_number': page_invoice_number,
-                'invoice_date': page_date,
-                'items': inv_items,
-                'invoice_total': inv_total,
-                'mrp_sum': round(inv_mrp_sum, 2),
-                'discount_sum': round(inv_discount_sum, 2),
-            })
-    except Exception:
-        pass
-
-    # If we have per-page invoices, compute overall totals.
-    overall_total = None
-    if invoices:
-        s = 0.0
-        any_total = False
-        for inv in invoices:
-            if inv.get('invoice_total') is not None:
-                s += float(inv['invoice_total'])
-                any_total = True
-        overall_total = round(s, 2) if any_total else None
-
-    out = {
+    return {
         'merchant': 'BLINKIT',
         'order_id': order_id,
         # first page invoice meta (kept for convenience)
         'invoice_number': invoice_number,
+        'date': date,
         'invoice_date': invoice_date,
+        'invoice_date_ms': invoice_date_ms,
         # total of the first invoice if present; overall_total sums across all invoices in the PDF
         'grand_total': grand_total,
-        'overall_total': overall_total,
-        'invoices': invoices
     }
 
-    print(json.dumps(out, indent=2))
+
+def overall_total(invoice_totals):
+    """Sum of the per-page invoice totals (paise), in rupees, or None when none is known."""
+    return money.to_rupees(money.total(invoice_totals))
+
+
+def main():
+    flags, args = inputs.split_args(sys.argv[1:])
+    if not args:
+        print('Usage: parse_blinkit_invoice.py [--ndjson] [--base64url] <invoice.pdf|->', file=sys.stderr)
+        sys.exit(2)
+
+    source = inputs.source_arg(args[0], base64url='--base64url' in flags)
+
+    if '--ndjson' in flags:
+        with open_document(source) as doc:
+            for rec in iter_records(doc):
+                ndjson.write(sys.stdout, rec)
+        return
+
+    print(json.dumps(parse(source), indent=2))
 
 
 if __name__ == '__main__':
@@ -2,104 +2,82 @@
 """Parse District/TicketNew movie booking invoice PDF via pdfplumber."""
 
 import json
-import re
 import sys
-from datetime import datetime
-
-import pdfplumber
-
-
-def norm_money(s):
-    if s is None:
-        return None
-    s = str(s)
-    s = s.replace('₹', '').replace(',', '').strip()
-    m = re.search(r'([0-9]+(?:\.[0-9]{1,2})?)', s)
-    if not m:
-        return None
-    try:
-        return float(m.group(1))
-    except Exception:
-        return None
-
-
-def find_first(patterns, text):
-    for pat in patterns:
-        m = re.search(pat, text, flags=re.I)
-        if m:
-            return m.group(1).strip()
-    return None
-
-
-def to_iso_date(s):
-    if not s:
-        return None
-    s = s.strip()
-    # "13th Jan, 2026"
-    s = re.sub(r'\b(\d+)(st|nd|rd|th)\b', r'\1', s, flags=re.I)
-    for fmt in ['%d %b, %Y', '%d %B, %Y', '%d-%m-%Y', '%d/%m/%Y']:
-        try:
-            return datetime.strptime(s, fmt).date().isoformat()
-        except Exception:
-            pass
-    return None
 
-
-def main():
-    if len(sys.argv) < 2:
-        print('Usage: parse_district_invoice.py <pdfPath>', file=sys.stderr)
-        sys.exit(2)
-
-    pdf_path = sys.argv[1]
-    with pdfplumber.open(pdf_path) as pdf:
-        text = '\n'.join([(p.extract_text() or '') for p in pdf.pages])
-
-    text = text.strip()
-    if 'ticketnew' not in text.lower() and 'orbgen' not in text.lower() and 'tax invoice' not in text.lower():
-        print(json.dumps({ 'ok': False, 'reason': 'not_district' }))
-        return
-
-    order_id = find_first([
-        r'\bOrder\s*ID\s*[:#]?\s*([0-9]+)'
-    ], text)
-
-    invoice_no = find_first([
-        r'\bInvoice\s*Number\s*[:#]?\s*([A-Z0-9]+)'
-    ], text)
-
-    invoice_date = to_iso_date(find_first([
-        r'\bInvoice\s*Date\s*[:#]?\s*([0-9]{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]{3,9},\s+[0-9]{4})',
-        r'\bInvoice\s*Date\s*[:#]?\s*([0-9]{1,2}[-/][0-9]{1,2}[-/][0-9]{4})'
-    ], text))
-
-    total = norm_money(find_first([
-        r'\bGrand\s*Total\s*₹?\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)'
-    ], text))
-
-    booking = norm_money(find_first([
-        r'\bBooking\s*Charge\s+\d+\s+\d+\s+₹?\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)',
-        r'\bBooking\s*Charge\s+\d+\s+₹?\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)'
-    ], text))
-
-    igst = norm_money(find_first([
-        r'\bIntegrated\s+Goods\s+and\s+Service\s+Tax\s+@\s*[0-9.]+%\s*₹?\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)'
-    ], text))
+from hk_pdf import dates, inputs, money, validate
+from hk_pdf.document import open_document
+from hk_pdf.patterns import DISTRICT as P, HeaderScanner
+from hk_pdf.router import quick_reject
+
+# Bump when parse output changes; invalidates this parser's hk_pdf cache entries.
+PARSER_VERSION = 8
+
+# Any of these in the text means the PDF is ours (checked lowercase).
+MARKERS = ('ticketnew', 'orbgen', 'tax invoice')
+
+HEADER = HeaderScanner({
+    'order_id': [P.order_id],
+    'invoice_no': [P.invoice_number],
+    'invoice_date': [P.invoice_date_words, P.invoice_date_numeric],
+    'total': [P.grand_total],
+    'booking': [P.booking_charge_qty, P.booking_charge],
+    'igst': [P.igst],
+})
+
+
+def extract_text(source):
+    with open_document(source) as doc:
+        if quick_reject(doc, 'district', MARKERS):
+            # Clearly not ours: page 1 alone makes parse_text() reject it.
+            return doc.fast_page_text(0).strip()
+        return doc.fast_text.strip()
+
+
+def parse_text(text):
+    low = text.lower()
+    if not any(k in low for k in MARKERS):
+        return { 'ok': False, 'reason': 'not_district' }
+
+    hdr = HEADER.scan(text)
+    order_id = hdr['order_id']
+    invoice_no = hdr['invoice_no']
+    date = hdr['invoice_date']
+    invoice_date, invoice_date_ms = dates.stamp(date)
+    total = money.rupees(hdr['total'], search=True)
+    booking = money.rupees(hdr['booking'], search=True)
+    igst = money.rupees(hdr['igst'], search=True)
 
     items = []
     if booking is not None:
-        items.append({ 'name': 'Booking charge', 'qty': 1, 'amount': round(booking, 2) })
+        items.append({ 'name': 'Booking charge', 'qty': 1, 'amount': booking })
     if igst is not None and igst != 0:
-        items.append({ 'name': 'IGST', 'qty': 1, 'amount': round(igst, 2) })
+        items.append({ 'name': 'IGST', 'qty': 1, 'amount': igst })
 
-    print(json.dumps({
+    return money.with_paise({
         'ok': True,
         'order_id': order_id,
         'invoice_no': invoice_no,
+        'date': date,
         'invoice_date': invoice_date,
-        'total': None if total is None else round(total, 2),
-        'items': items,
+        'invoice_date_ms': invoice_date_ms,
+        'total': total,
+        'items': [money.with_paise(it, ('amount',)) for it in items],
+        'validation': validate.item_amounts(items, total),
         'text_len': len(text)
-    }))
+    }, ('total',))
+
+
+def parse(source):
+    return parse_text(extract_text(source))
+
+
+def main():
+    flags, args = inputs.split_args(sys.argv[1:])
+    if not args:
+        print('Usage: parse_district_invoice.py [--base64url] <pdfPath|->', file=sys.stderr)
+        sys.exit(2)
+
+    print(json.dumps(parse(inputs.source_arg(args[0], base64url='--base64url' in flags))))
 
 
 if __name__ == '__main__':
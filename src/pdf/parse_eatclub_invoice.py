@@ -4,7 +4,7 @@
 Extracts:
 - tracking_id
 - invoice_no
-- ordered_at (date)
+- ordered_at (as printed in date; invoice_date ISO, invoice_date_ms)
 - invoice_total
 - items (Description, Qty, Amount)
 
@@ -12,75 +12,53 @@ Avoids including SAC/HSN codes in item names.
 """
 
 import json
-import re
 import sys
-from datetime import datetime
 
-import pdfplumber
+from hk_pdf import dates, inputs, money, validate
+from hk_pdf.document import open_document
+from hk_pdf.patterns import COMMON as C, EATCLUB as P, HeaderScanner
+from hk_pdf.router import quick_reject
 
+# Bump when parse output changes; invalidates this parser's hk_pdf cache entries.
+PARSER_VERSION = 8
 
-def norm_money(s):
-    if s is None:
-        return None
-    s = str(s)
-    s = s.replace('₹', '').replace(',', '').strip()
-    m = re.search(r'([0-9]+(?:\.[0-9]{1,2})?)', s)
-    if not m:
-        return None
-    try:
-        return float(m.group(1))
-    except Exception:
-        return None
+# Any of these in the text means the PDF is ours (checked lowercase).
+MARKERS = ('eatclub', 'eatclub brands', 'mojopizza')
 
-
-def find_first(patterns, text):
-    for pat in patterns:
-        m = re.search(pat, text, flags=re.I)
-        if m:
-            return m.group(1).strip()
-    return None
-
-
-def to_iso_date(s):
-    if not s:
-        return None
-    s = s.strip()
-    for fmt in ['%d-%m-%Y', '%d/%m/%Y', '%d-%m-%Y %H:%M:%S']:
-        try:
-            return datetime.strptime(s, fmt).date().isoformat()
-        except Exception:
-            pass
-    return None
+HEADER = HeaderScanner({
+    'tracking_id': [P.tracking_id],
+    'invoice_no': [P.invoice_no],
+    'ordered_at': [P.ordered_at],
+    'total': [P.invoice_total],
+})
 
 
 def clean_name(s):
-    s = re.sub(r'\s+', ' ', str(s or '')).strip()
+    s = C.ws.sub(' ', str(s or '')).strip()
     # remove any HSN/SAC-like remnants if they appear
-    s = re.sub(r'\b(?:HSN|SAC)\s*/?\s*(?:HSN|SAC)?\b\s*[:#-]?\s*\d+', '', s, flags=re.I).strip()
+    s = P.hsn_remnant.sub('', s).strip()
     return s
 
 
-def main():
-    if len(sys.argv) < 2:
-        print('Usage: parse_eatclub_invoice.py <pdfPath>', file=sys.stderr)
-        sys.exit(2)
-
-    pdf_path = sys.argv[1]
-    with pdfplumber.open(pdf_path) as pdf:
-        text = '\n'.join([(p.extract_text() or '') for p in pdf.pages])
-
-    text = text.strip()
-    if 'eatclub' not in text.lower() and 'eatclub brands' not in text.lower() and 'mojopizza' not in text.lower():
-        print(json.dumps({ 'ok': False, 'reason': 'not_eatclub' }))
-        return
+def extract_text(source):
+    with open_document(source) as doc:
+        if quick_reject(doc, 'eatclub', MARKERS):
+            # Clearly not ours: page 1 alone makes parse_text() reject it.
+            return doc.fast_page_text(0).strip()
+        return doc.fast_text.strip()
 
-    tracking_id = find_first([r'\bTracking\s*ID\s*:\s*([A-Z0-9]+)'], text)
-    invoice_no = find_first([r'\bInvoice\s*No\.?\s*:\s*([^\n]+)'], text)
 
-    ordered_at_raw = find_first([r'\bOrdered\s*At\s*:\s*([0-9]{2}-[0-9]{2}-[0-9]{4})'], text)
-    invoice_date = to_iso_date(ordered_at_raw)
+def parse_text(text):
+    low = text.lower()
+    if not any(k in low for k in MARKERS):
+        return { 'ok': False, 'reason': 'not_eatclub' }
 
-    total = norm_money(find_first([r'\bInvoice\s*Total\s*:\s*([0-9][0-9.,]+)'], text))
+    hdr = HEADER.scan(text)
+    tracking_id = hdr['tracking_id']
+    invoice_no = hdr['invoice_no']
+    ordered_at = hdr['ordered_at']
+    invoice_date, invoice_date_ms = dates.stamp(ordered_at)
+    total = money.rupees(hdr['total'], search=True)
 
     items = []
     # Parse lines under Product Details table
@@ -88,39 +66,55 @@ def main():
     # Golden Corn Pizza [Regular 7"] - 2 Pc 195.0 390.0
     in_table = False
     for line in text.splitlines():
-        ln = re.sub(r'\s+', ' ', line).strip()
+        ln = C.ws.sub(' ', line).strip()
         if not ln:
             continue
-        if re.search(r'^Product\s+Details$', ln, flags=re.I):
+        if P.table_start.search(ln):
             in_table = True
             continue
-        if in_table and re.search(r'^Sub\s*Total\s*:', ln, flags=re.I):
+        if in_table and P.table_end.search(ln):
             break
         if not in_table:
             continue
         # skip header row
-        if re.search(r'^Description\s+Qty\s+Rate\s+Amount$', ln, flags=re.I):
+        if P.table_header.search(ln):
             continue
 
-        m = re.match(r'^(.*?)\s+-\s+(\d+)\s+Pc\s+([0-9]+(?:\.[0-9]{1,2})?)\s+([0-9]+(?:\.[0-9]{1,2})?)$', ln, flags=re.I)
+        m = P.item_row.match(ln)
         if not m:
             continue
         name = clean_name(m.group(1))
         qty = int(m.group(2))
-        amt = norm_money(m.group(4))
+        amt = money.rupees(m.group(4), search=True)
         if not name or amt is None:
             continue
-        items.append({ 'name': name[:180], 'qty': qty, 'amount': round(amt, 2) })
+        items.append({ 'name': name[:180], 'qty': qty, 'amount': amt })
 
-    print(json.dumps({
+    return money.with_paise({
         'ok': True,
         'tracking_id': tracking_id,
         'invoice_no': invoice_no,
+        'date': ordered_at,
         'invoice_date': invoice_date,
-        'total': None if total is None else round(total, 2),
-        'items': items,
+        'invoice_date_ms': invoice_date_ms,
+        'total': total,
+        'items': [money.with_paise(it, ('amount',)) for it in items],
+        'validation': validate.item_amounts(items, total, partial=True),
         'text_len': len(text)
-    }))
+    }, ('total',))
+
+
+def parse(source):
+    return parse_text(extract_text(source))
+
+
+def main():
+    flags, args = inputs.split_args(sys.argv[1:])
+    if not args:
+        print('Usage: parse_eatclub_invoice.py [--base64url] <pdfPath|->', file=sys.stderr)
+        sys.exit(2)
+
+    print(json.dumps(parse(inputs.source_arg(args[0], base64url='--base64url' in flags))))
 
 
 if __name__ == '__main__':
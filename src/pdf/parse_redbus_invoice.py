@@ -5,7 +5,9 @@ Returns JSON:
 {
   ok: true,
   invoice_no: str|null,
+  date: str|null (as printed),
   invoice_date: str|null (YYYY-MM-DD),
+  invoice_date_ms: int|null (midnight IST),
   total: float|null,
   items: [{name, qty, amount}]
 }
@@ -14,116 +16,102 @@ We avoid leaking HSN/SAC codes into items.
 """
 
 import json
-import re
 import sys
-from datetime import datetime
-
-import pdfplumber
-
-
-def norm_money(s):
-    if s is None:
-        return None
-    s = str(s)
-    # handle ₹ and commas
-    s = s.replace('₹', '').replace(',', '').strip()
-    m = re.search(r'([0-9]+(?:\.[0-9]{1,2})?)', s)
-    if not m:
-        return None
-    try:
-        return float(m.group(1))
-    except Exception:
-        return None
-
-
-def find_first(patterns, text):
-    for pat in patterns:
-        m = re.search(pat, text, flags=re.I)
-        if m:
-            return m.group(1).strip()
-    return None
-
-
-def to_iso_date(s):
-    if not s:
-        return None
-    s = s.strip()
-    for fmt in ['%d/%m/%Y', '%d-%m-%Y', '%d %b %Y', '%d %B %Y']:
-        try:
-            return datetime.strptime(s, fmt).date().isoformat()
-        except Exception:
-            pass
-    return None
 
+from hk_pdf import dates, inputs, money, validate
+from hk_pdf.document import open_document
+from hk_pdf.patterns import REDBUS as P, HeaderScanner, values
+from hk_pdf.router import quick_reject
 
-def main():
-    if len(sys.argv) < 2:
-        print('Usage: parse_redbus_invoice.py <pdfPath>', file=sys.stderr)
-        sys.exit(2)
+# Bump when parse output changes; invalidates this parser's hk_pdf cache entries.
+PARSER_VERSION = 8
+
+# Any of these in the text means the PDF is ours (checked lowercase).
+MARKERS = ('redbus', 'tax invoice')
 
-    pdf_path = sys.argv[1]
-    with pdfplumber.open(pdf_path) as pdf:
-        text = '\n'.join([(p.extract_text() or '') for p in pdf.pages])
+HEADER = HeaderScanner({
+    'invoice_header': [P.invoice_header],
+    'invoice_no': [P.invoice_no],
+    'date': [P.date],
+    'total': [P.total],
+    'taxable': [P.taxable],
+    'cgst': [P.cgst],
+    'sgst': [P.sgst],
+})
 
-    text = text.strip()
 
+def extract_text(source):
+    with open_document(source) as doc:
+        if quick_reject(doc, 'redbus', MARKERS):
+            # Clearly not ours: page 1 alone makes parse_text() reject it.
+            return doc.fast_page_text(0).strip()
+        return doc.fast_text.strip()
+
+
+def parse_text(text):
     # Basic sanity check
-    if 'redbus' not in text.lower() and 'tax invoice' not in text.lower():
-        print(json.dumps({ 'ok': False, 'reason': 'not_redbus' }))
-        return
+    low = text.lower()
+    if not any(k in low for k in MARKERS):
+        return { 'ok': False, 'reason': 'not_redbus' }
 
     # Invoice header typically:
     # "Invoice No. Date" then next line: "RRJ25-A001854038 13/12/2025"
-    m = re.search(r'Invoice\s*No\.?\s*Date\s*\n\s*([A-Z0-9-]+)\s+([0-9]{1,2}[/-][0-9]{1,2}[/-][0-9]{4})', text, flags=re.I)
+    found = HEADER.matches(text)
+    hdr = values(found)
+    m = found['invoice_header']
     invoice_no = m.group(1).strip() if m else None
-    invoice_date = to_iso_date(m.group(2)) if m else None
+    date = m.group(2) if m else None
 
     if invoice_no is None:
-        invoice_no = find_first([
-            r'\bInvoice\s*No\.?\s*[:#]?\s*([A-Z0-9-]+)'
-        ], text)
+        invoice_no = hdr['invoice_no']
 
-    if invoice_date is None:
-        invoice_date_raw = find_first([
-            r'\bDate\s*[:#]?\s*([0-9]{1,2}[/-][0-9]{1,2}[/-][0-9]{4})'
-        ], text)
-        invoice_date = to_iso_date(invoice_date_raw)
+    if dates.to_iso(date) is None and hdr['date']:
+        date = hdr['date']
+    invoice_date, invoice_date_ms = dates.stamp(date)
 
-    total = norm_money(find_first([
-        r'\bTotal\s*Invoice\s*Value\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)'
-    ], text))
+    total = money.rupees(hdr['total'], search=True)
 
     # Items:
     # We build a simple breakdown that sums to total:
     # - Total Taxable Value
     # - CGST
     # - SGST
-    taxable = norm_money(find_first([
-        r'\bTotal\s*Taxable\s*Value\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)'
-    ], text))
-    cgst = norm_money(find_first([
-        r'\bCGST\s*@\s*[0-9.]+%\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)'
-    ], text))
-    sgst = norm_money(find_first([
-        r'\bSGST\s*@\s*[0-9.]+%\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)'
-    ], text))
+    taxable = money.rupees(hdr['taxable'], search=True)
+    cgst = money.rupees(hdr['cgst'], search=True)
+    sgst = money.rupees(hdr['sgst'], search=True)
 
     items = []
     if taxable is not None:
-        items.append({ 'name': 'Ticket fare (taxable)', 'qty': 1, 'amount': round(taxable, 2) })
+        items.append({ 'name': 'Ticket fare (taxable)', 'qty': 1, 'amount': taxable })
     if cgst is not None and cgst != 0:
-        items.append({ 'name': 'CGST', 'qty': 1, 'amount': round(cgst, 2) })
+        items.append({ 'name': 'CGST', 'qty': 1, 'amount': cgst })
     if sgst is not None and sgst != 0:
-        items.append({ 'name': 'SGST', 'qty': 1, 'amount': round(sgst, 2) })
+        items.append({ 'name': 'SGST', 'qty': 1, 'amount': sgst })
 
-    print(json.dumps({
+    return money.with_paise({
         'ok': True,
         'invoice_no': invoice_no,
+        'date': date,
         'invoice_date': invoice_date,
-        'total': None if total is None else round(total, 2),
-        'items': items,
+        'invoice_date_ms': invoice_date_ms,
+        'total': total,
+        'items': [money.with_paise(it, ('amount',)) for it in items],
+        'validation': validate.item_amounts(items, total),
         'text_len': len(text)
-    }))
+    }, ('total',))
+
+
+def parse(source):
+    return parse_text(extract_text(source))
+
+
+def main():
+    flags, args = inputs.split_args(sys.argv[1:])
+    if not args:
+        print('Usage: parse_redbus_invoice.py [--base64url] <pdfPath|->', file=sys.stderr)
+        sys.exit(2)
+
+    print(json.dumps(parse(inputs.source_arg(args[0], base64url='--base64url' in flags))))
 
 
 if __name__ == '__main__':
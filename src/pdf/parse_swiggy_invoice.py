@@ -1,55 +1,93 @@
 #!/usr/bin/env python3
-import re
 import json
 import sys
-from pathlib import Path
 
+from hk_pdf import grid, inputs, money, validate
+from hk_pdf.document import open_document
+from hk_pdf.patterns import COMMON as C, SWIGGY as P, HeaderScanner
+from hk_pdf.router import quick_reject
 
-def norm_money(s: str):
-    if s is None:
-        return None
-    s = str(s).replace(',', '').strip()
-    try:
-        return float(s)
-    except Exception:
-        return None
+# Bump when parse output changes; invalidates this parser's hk_pdf cache entries.
+PARSER_VERSION = 8
 
+# Any of these in the text means the PDF is ours (checked lowercase).
+MARKERS = ('swiggy', 'bundl technologies')
 
-def extract_text(pdf_path: Path):
-    import pdfplumber  # type: ignore
+# Prefer the actual Swiggy order id (avoid matching Instamart order id when both appear).
+# Note: Some PDFs are "merged" (Instamart goods invoice + Swiggy handling-fee invoice).
+# In those, we prefer the Instamart/Invoice Value as the order total (not the Swiggy handling fee total).
+HEADER = HeaderScanner({
+    'order_id': [P.order_id_handling, P.order_id, P.order_no],
+    'total': [P.invoice_value, P.invoice_total_rs, P.invoice_total, P.grand_total, P.total_rs],
+})
 
-    full = ''
-    with pdfplumber.open(str(pdf_path)) as pdf:
-        for p in pdf.pages:
-            t = p.extract_text() or ''
-            full += '\n' + t
-    return full.strip()
 
+def extract_text(source):
+    with open_document(source) as doc:
+        if quick_reject(doc, 'swiggy', MARKERS, fast=False):
+            # Clearly not ours: page 1 alone makes parse_text() reject it.
+            return doc.page_text(0).strip()
+        return doc.text.strip()
 
-def find_first(patterns, text, flags=re.I, group=1):
-    for pat in patterns:
-        m = re.search(pat, text, flags)
-        if m:
-            return m.group(group).strip()
-    return None
+
+def table_items(doc):
+    """Shape B items from the table's geometry (hk_pdf.grid), or [] to use the text path.
+
+    Descriptions wrap above and below the numbered line; rows are grouped
+    around the serial numbers instead of guessing from neighbouring lines.
+    """
+    items = []
+    for pi in range(doc.page_count):
+        words = doc.word_index(pi)
+        head = words.first('description')
+        if head is None:
+            continue
+        bottom = None
+        for w in words.iter_text('invoice'):
+            if w['top'] > head['top'] and words.right_of(w, ('value',), 3.0) is not None:
+                bottom = w['top']
+                break
+        g = grid.build(doc.words(pi), top=head['top'] - 2, bottom=bottom)
+        if g is None:
+            continue
+        i_sr = g.column('sr')
+        i_desc = g.column('description')
+        i_qty = g.column('qty')
+        i_total = g.column('total', last=True)
+        if i_total is None:
+            i_total = g.column('amount', last=True)
+        if None in (i_desc, i_qty, i_total):
+            continue
+        if i_sr is None:
+            i_sr = 0
+        for rec in g.records(lambda row: P.sr_cell.fullmatch(row[i_sr])):
+            name = C.ws.sub(' ', rec[i_desc]).strip()
+            amt = money.rupees(rec[i_total])
+            if not P.qty_cell.fullmatch(rec[i_qty]) or amt is None:
+                continue
+            if 'handling fees for order' in name.lower():
+                continue
+            sr = rec[i_sr].rstrip('.')
+            items.append({'name': (name or f'Item {sr}')[:180], 'qty': int(rec[i_qty]), 'amount': amt})
+    return items
 
 
 def parse_items(text: str):
     items = []
     for line in text.splitlines():
-        ln = re.sub(r'\s+', ' ', line).strip()
+        ln = C.ws.sub(' ', line).strip()
         if not ln:
             continue
-        if re.search(r'\b(total|grand total|item total|tax|gst|delivery|packing|discount|charges)\b', ln, re.I):
+        if P.skip_line.search(ln):
             continue
-        m = re.search(r'^(.*?)(?:\s+x\s*(\d+))?\s+₹\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)\s*$', ln)
+        m = P.generic_item.search(ln)
         if not m:
             continue
         name = m.group(1).strip(' -:')
         if len(name) < 3:
             continue
         qty = int(m.group(2)) if m.group(2) else None
-        amt = norm_money(m.group(3))
+        amt = money.rupees(m.group(3))
         if amt is None:
             continue
         items.append({
@@ -68,77 +106,58 @@ def parse_items(text: str):
     return out
 
 
-def main():
-    if len(sys.argv) < 2:
-        print('Usage: parse_swiggy_invoice.py <pdf>', file=sys.stderr)
-        sys.exit(2)
-
-    pdf_path = Path(sys.argv[1])
-    if not pdf_path.exists():
-        raise SystemExit(f'File not found: {pdf_path}')
-
-    try:
-        text = extract_text(pdf_path)
-    except Exception as e:
-        print(json.dumps({'ok': False, 'error': str(e)}))
-        sys.exit(1)
-
+def parse_text(text: str, store_items=None):
+    """Parse extracted text; store_items() may supply shape B items from the PDF itself."""
     low = text.lower()
-    if 'swiggy' not in low and 'bundl technologies' not in low:
-        print(json.dumps({'ok': False, 'reason': 'not_swiggy'}))
-        return
-
-    # Prefer the actual Swiggy order id (avoid matching Instamart order id when both appear)
-    order_id = find_first([
-        r'\bHandling Fees for Order\s+([0-9]+)\b',
-        r'\bOrder\s*ID\s*[:#]?\s*([0-9]+)\b',
-        r'\bOrder\s*No\s*[:#]?\s*([0-9]+)\b'
-    ], text)
-
-    # Note: Some PDFs are "merged" (Instamart goods invoice + Swiggy handling-fee invoice).
-    # In those, we prefer the Instamart/Invoice Value as the order total (not the Swiggy handling fee total).
-    total = find_first([
-        r'\bInvoice\s*Value\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)',
-        r'\bInvoice\s*Total\s*₹?\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)',
-        r'\bInvoice\s*Total\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)',
-        r'\bGrand\s*Total\s*₹?\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)',
-        r'\bTotal\s*₹\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)'
-    ], text)
+    if not any(k in low for k in MARKERS):
+        return {'ok': False, 'reason': 'not_swiggy'}
+
+    hdr = HEADER.scan(text)
+    order_id = hdr['order_id']
+    total = hdr['total']
 
     # Swiggy invoices come in multiple shapes:
     # A) Food delivery invoice (Swiggy Limited) with "Invoice Total" and a simple table
     # B) Instamart/Store invoice (seller) with "Invoice Value" and a different table
 
     items = []
+    notes = []
+    dropped = 0
 
     # Shape A (food): "<sr>. <desc> ... <amount> <discount> <net>"
     for line in text.splitlines():
-        ln = re.sub(r'\s+', ' ', line).strip()
-        m = re.match(r'^\s*(\d+)\.\s+(.+?)\s+\w+\s+(\d+)\s+([0-9][0-9,]*\.[0-9]{2,3})\s+([0-9][0-9,]*\.[0-9]{2,3})\s+([0-9][0-9,]*\.[0-9]{2,3})\s+([0-9][0-9,]*\.[0-9]{2,3})\s*$', ln)
+        ln = C.ws.sub(' ', line).strip()
+        m = P.food_row.match(ln)
         if not m:
             continue
         desc = m.group(2).strip()
         uom = m.group(3)
         qty = int(m.group(4))
-        unit_price = norm_money(m.group(5))
-        net = norm_money(m.group(8))  # Net Assessable Value
+        unit_price = money.rupees(m.group(5))
+        net = money.rupees(m.group(8))  # Net Assessable Value
         if net is None:
             continue
         # Keep only sane quantities; also ignore handling-fee/service lines in food invoices.
         if qty > 100:
+            dropped += 1
             continue
         if 'handling fees' in desc.lower():
             continue
         items.append({ 'name': desc[:180], 'qty': qty, 'amount': net })
+    if items and dropped:
+        notes.append(f'dropped {dropped} row(s) with qty > 100')
 
     # Shape B (instamart): lines like
     # "1. Lemon (Nimbe Hannu) 1 NOS 07031010 43 19 24 ... 24"
+    if not items and store_items is not None:
+        items = store_items()
+
     if not items:
         # Instamart/store invoice parsing: the description often appears on the line BEFORE the numbered row.
         # Example:
         #   Lemon (Nimbe
         #   1. 1 NOS ... 24
-        lines = [re.sub(r'\s+', ' ', ln).strip() for ln in text.splitlines() if (ln or '').strip()]
+        lines = [C.ws.sub(' ', ln).strip() for ln in text.splitlines() if (ln or '').strip()]
         for i, ln in enumerate(lines):
             # numbered row with qty+unit+hsn...+amount(last)
             # Two variants:
@@ -149,18 +168,18 @@ def main():
             amt = None
             desc_inline = ''
 
-            m = re.match(r'^(\d+)\.\s+(\d+)\s+(NOS|OTH|PCS|EA|KG|GM|LTR|L|ML)\s+\d+\s+.*?\s([0-9][0-9,]*(?:\.[0-9]{1,2})?)\s*$', ln)
+            m = P.store_row.match(ln)
             if m:
                 sr = m.group(1)
                 qty = int(m.group(2))
-                amt = norm_money(m.group(4))
+                amt = money.rupees(m.group(4))
             else:
-                m = re.match(r'^(\d+)\.\s+(.+?)\s+(\d+)\s+(NOS|OTH|PCS|EA|KG|GM|LTR|L|ML)\s+\d+\s+.*?\s([0-9][0-9,]*(?:\.[0-9]{1,2})?)\s*$', ln)
+                m = P.store_row_desc.match(ln)
                 if m:
                     sr = m.group(1)
                     desc_inline = m.group(2).strip()
                     qty = int(m.group(3))
-                    amt = norm_money(m.group(5))
+                    amt = money.rupees(m.group(5))
 
             if sr is None or qty is None or amt is None:
                 continue
@@ -171,9 +190,9 @@ def main():
                 for j in [i-1, i-2]:
                     if j < 0: continue
                     prev = lines[j]
-                    if re.search(r'^(subtotal|tax|invoice|date|hsn|description of goods|sr no)\b', prev, re.I):
+                    if P.desc_skip.search(prev):
                         continue
-                    if re.match(r'^\d', prev):
+                    if P.starts_digit.match(prev):
                         continue
                     if len(prev) >= 3:
                         desc = prev
@@ -206,13 +225,42 @@ def main():
                 keep.append(it)
         items = keep
 
-    print(json.dumps({
+    total = money.rupees(total)
+    return money.with_paise({
         'ok': True,
         'order_id': order_id,
-        'total': norm_money(total),
-        'items': items,
+        'total': total,
+        'items': [money.with_paise(it, ('amount',)) for it in items],
+        'validation': validate.item_amounts(items, total, partial=True, notes=notes),
         'text_len': len(text)
-    }))
+    }, ('total',))
+
+
+def parse(source):
+    with open_document(source) as doc:
+        return parse_document(doc)
+
+
+def parse_document(doc):
+    return parse_text(extract_text(doc), store_items=lambda: table_items(doc))
+
+
+def main():
+    flags, args = inputs.split_args(sys.argv[1:])
+    if not args:
+        print('Usage: parse_swiggy_invoice.py [--base64url] <pdf|->', file=sys.stderr)
+        sys.exit(2)
+
+    source = inputs.source_arg(args[0], base64url='--base64url' in flags)
+
+    with open_document(source) as doc:
+        try:
+            text = extract_text(doc)
+        except Exception as e:
+            print(json.dumps({'ok': False, 'error': str(e)}))
+            sys.exit(1)
+
+        print(json.dumps(parse_text(text, store_items=lambda: table_items(doc))))
 
 
 if __name__ == '__main__':
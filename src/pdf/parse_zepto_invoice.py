@@ -4,77 +4,67 @@
 Output schema (v1):
 {
   merchant: 'ZEPTO',
-  invoice_number, order_number, date,
-  item_total, handling_fee, invoice_value,
+  invoice_number, order_number, date (as printed), invoice_date (ISO), invoice_date_ms (midnight IST),
+  item_total, handling_fee, invoice_value,        (+ <field>_paise for each)
   items: [{sr, name, hsn, qty, rate, discount_pct, taxable, cgst_pct, sgst_pct, cgst_amt, sgst_amt, cess_pct, cess_amt, total}],
+         (+ <field>_paise for rate, taxable, the *_amt fields and total)
+  validation: {confidence, ..., discrepancies, notes}   (see hk_pdf.validate)
 }
 
 Designed to be robust across Zepto's consistent template.
 """
 
-import re
 import json
 import sys
-from pathlib import Path
-import pdfplumber
 
+from hk_pdf import dates, grid, inputs, money, ndjson, validate
+from hk_pdf.document import open_document
+from hk_pdf.patterns import COMMON as C, ZEPTO as P, HeaderScanner
 
-def fnum(s):
-    if s is None:
-        return None
-    s = str(s).strip()
-    s = s.replace(',', '')
-    try:
-        return float(s)
-    except:
-        return None
+# Bump when parse output changes; invalidates this parser's hk_pdf cache entries.
+PARSER_VERSION = 8
 
+HEADER = HeaderScanner({
+    'invoice_number': [P.invoice_number],
+    'order_number': [P.order_number],
+    'date': [P.date],
+    'item_total': [P.item_total],
+    'handling_fee': [P.handling_fee],
+    'invoice_value': [P.invoice_value],
+})
 
-def extract_first(patterns, text, flags=0, group=1):
-    for pat in patterns:
-        m = re.search(pat, text, flags)
-        if m:
-            return m.group(group).strip()
-    return None
 
+# Rupee fields that get an exact <field>_paise twin in the output.
+ITEM_MONEY = ('rate', 'taxable', 'cgst_amt', 'sgst_amt', 'cess_amt', 'total')
+TOTAL_MONEY = ('item_total', 'handling_fee', 'invoice_value')
 
-def main():
-    if len(sys.argv) < 2:
-        print('Usage: parse_zepto_invoice.py <invoice.pdf>', file=sys.stderr)
-        sys.exit(2)
 
-    pdf_path = Path(sys.argv[1])
-    if not pdf_path.exists():
-        raise SystemExit(f'File not found: {pdf_path}')
+def reconciles(items, item_total, handling_fee, invoice_value):
+    """Item totals add up to Item Total, or with the handling fee to Invoice Value."""
+    return validate.reconciles([it.get('total') for it in items], item_total, (handling_fee,), invoice_value)
 
-    with pdfplumber.open(str(pdf_path)) as pdf:
-        pages = list(pdf.pages)
-        text = '\n'.join((p.extract_text() or '') for p in pages)
 
-    text = re.sub(r'\r\n?', '\n', text)
-    lines = [ln.strip() for ln in text.split('\n')]
+def validation(out):
+    return validate.validate(
+        [it.get('total') for it in out['items']],
+        item_total=out['item_total'],
+        total=out['invoice_value'],
+        fees=(out['handling_fee'],),
+        lines=[
+            (it.get('sr'), it.get('total'), it.get('taxable'),
+             (it.get('cgst_amt'), it.get('sgst_amt'), it.get('cess_amt')))
+            for it in out['items']
+        ],
+    )
 
-    invoice_number = extract_first([r'Invoice\s*No\.?\s*:\s*([A-Za-z0-9]+)'], text, flags=re.IGNORECASE)
-    order_number = extract_first([r'Order\s*No\.?\s*:\s*([A-Za-z0-9]+)'], text, flags=re.IGNORECASE)
-    date = extract_first([r'Date\s*:\s*([0-9]{2}-[0-9]{2}-[0-9]{4})'], text)
 
-    # Totals section (Zepto often prints these inline on one line)
-    money = r'([0-9]+(?:\.[0-9]{1,2})?)'
-
-    item_total = fnum(extract_first([
-        rf'\bItem\s+Total\b\s*{money}',
-    ], text, flags=re.IGNORECASE))
-    handling_fee = fnum(extract_first([
-        rf'Handling\s+Fee[^\n]*?\s{money}',
-    ], text, flags=re.IGNORECASE))
-    invoice_value = fnum(extract_first([
-        rf'\bInvoice\s+Value\b\s*{money}',
-    ], text, flags=re.IGNORECASE))
-
-    # Parse items
-    items = []
+def parse(source):
+    with open_document(source) as doc:
+        return parse_document(doc)
+
 
-    def table_extract_items():
+def parse_document(doc):
+    def table_extract_items(pages):
         out = []
         settings = {
             "vertical_strategy": "lines",
@@ -85,31 +75,26 @@ def main():
             "edge_min_length": 20,
         }
 
-        for page in pages:
-            words = page.extract_words() or []
-            header_top = None
-            for w in words:
-                if (w.get('text','') or '').lower() == 'sr':
-                    header_top = w['top']
-                    break
-            if header_top is None:
+        for pi in pages:
+            page = doc.page(pi)
+            words = doc.word_index(pi)
+            sr = words.first('sr')
+            if sr is None:
                 continue
+            header_top = sr['top']
 
+            # "Item Total" below the header; the header's own "Item & Description ... Total"
+            # must not match, or the table is clipped 80pt under its header.
             item_total_top = None
-            for w in words:
-                if (w.get('text','') or '').lower() == 'item':
-                    for w2 in words:
-                        if (w2.get('text','') or '').lower() == 'total' and abs(w2['top'] - w['top']) < 3.0 and w2['x0'] > w['x0']:
-                            item_total_top = w['top']
-                            break
-                if item_total_top is not None:
+            for w in words.iter_text('item'):
+                if w['top'] > header_top + 3.0 and words.right_of(w, ('total',), 3.0) is not None:
+                    item_total_top = w['top']
                     break
 
             y0 = max(0, header_top - 10)
-            y1 = min(page.height, (item_total_top + 80) if item_total_top is not None else (header_top + 520))
-            cropped = page.crop((0, y0, page.width, y1))
-
-            tbs = cropped.extract_tables(settings) or []
+            # No "Item Total" on this page: the table runs on to the next one.
+            y1 = min(page.height, item_total_top + 80) if item_total_top is not None else page.height
+            tbs = doc.tables(pi, settings, bbox=(0, y0, page.width, y1), template='zepto')
             if not tbs:
                 continue
 
@@ -142,7 +127,7 @@ def main():
                 # Handle multi-item rows merged into a single table row (values separated by newlines)
                 if '\n' in first_raw or '\n' in desc_raw:
                     def splitcell(v):
-                        return [re.sub(r'\s+', ' ', s.strip()) for s in str(v or '').split('\n') if s.strip()]
+                        return [C.ws.sub(' ', s.strip()) for s in str(v or '').split('\n') if s.strip()]
 
                     srs = splitcell(first_raw)
                     descs = splitcell(desc_raw)
@@ -155,7 +140,7 @@ def main():
                         name = descs[i2] if i2 < len(descs) else ''
                         if not name:
                             continue
-                        total = fnum(totals[i2]) if i2 < len(totals) else None
+                        total = money.rupees(totals[i2]) if i2 < len(totals) else None
                         if total is None:
                             continue
                         sr = int(srs[i2]) if i2 < len(srs) and srs[i2].isdigit() else None
@@ -164,7 +149,7 @@ def main():
                         if i2 < len(qtys):
                             try:
                                 qty = int(float(qtys[i2]))
-                            except:
+                            except (ValueError, TypeError):
                                 qty = None
                         out.append({
                             'sr': sr,
@@ -184,9 +169,9 @@ def main():
                         })
                     continue
 
-                desc = re.sub(r'\s+', ' ', desc_raw)
+                desc = C.ws.sub(' ', desc_raw)
 
-                total = fnum(str(row[idx_total] or '').strip())
+                total = money.rupees(str(row[idx_total] or '').strip())
                 if total is None:
                     continue
 
@@ -195,7 +180,7 @@ def main():
                     q = str(row[idx_qty] or '').strip()
                     try:
                         qty = int(float(q)) if q else None
-                    except:
+                    except (ValueError, TypeError):
                         qty = None
 
                 hsn = None
@@ -221,114 +206,20 @@ def main():
 
         return out
 
-    items = table_extract_items()
-
-    def parse_item_row_text(row_text: str):
-        row_text = re.sub(r'\s+', ' ', (row_text or '').strip())
-        if not row_text:
-            return None
-        # Normalize orphan decimals like ".0" -> "0.0"
-        row_text = re.sub(r'(?<!\d)\.(\d)\b', r'0.\1', row_text)
-        row_pat = (
-            r'\b(?P<sr>\d+)\s+'
-            r'(?P<name>.+?)\s+'
-            r'(?P<hsn>\d{6,8})\s+'
-            r'(?P<qty>\d+)\s+'
-            r'(?P<rate>\d+(?:\.\d{1,2})?)\s+'
-            r'(?P<disc>\d+(?:\.\d+)?)%\s+'
-            r'(?P<taxable>\d+(?:\.\d{1,2})?)\s+'
-            r'(?P<cgst_pct>\d+(?:\.\d+)?)%\s+'
-            r'(?P<sgst_pct>\d+(?:\.\d+)?)%\s+'
-            r'(?P<cgst_amt>\d+(?:\.\d{1,2})?)\s+'
-            r'(?P<sgst_amt>\d+(?:\.\d{1,2})?)\s+'
-            r'(?P<cess_pct>\d+(?:\.\d+)?)(?:%)?\s+'
-            r'(?P<cess_amt>\d+(?:\.\d{1,2})?)\s+'
-            r'(?P<total>\d+(?:\.\d{1,2})?)\b'
-        )
-
-        m = re.search(row_pat, row_text)
-        if not m:
-            return None
-
-        def clean_name(name: str) -> str:
-            name = re.sub(r'\s+', ' ', name).strip(' -')
-            for _ in range(5):
-                name2 = name
-                name2 = re.sub(r'\b([A-Za-z]{1,2})\s+([a-z]{2,})\b', r'\1\2', name2)
-                name2 = re.sub(r'\b([A-Za-z]{1,3})\s+([a-z]{1,3})\b', r'\1\2', name2)
-                name2 = re.sub(r'\b([a-z]{2,4})\s+([a-z]{2,4})\b', r'\1\2', name2)
-                if name2 == name:
-                    break
-                name = name2
-            return name
-
-        name = clean_name(m.group('name'))
-
-        item = {
-            'sr': int(m.group('sr')),
-            'name': name,
-            'hsn': m.group('hsn'),
-            'qty': int(float(m.group('qty'))),
-            'rate': fnum(m.group('rate')),
-            'discount_pct': fnum(m.group('disc')),
-            'taxable': fnum(m.group('taxable')),
-            'cgst_pct': fnum(m.group('cgst_pct')),
-            'sgst_pct': fnum(m.group('sgst_pct')),
-            'cgst_amt': fnum(m.group('cgst_amt')),
-            'sgst_amt': fnum(m.group('sgst_amt')),
-            'cess_pct': fnum(m.group('cess_pct')),
-            'cess_amt': fnum(m.group('cess_amt')),
-            'total': fnum(m.group('total')),
-        }
-
-        # Heuristic repair for Zepto overlap bugs:
-        # if total is clearly wrong (tiny) but taxable looks right and taxes are ~0, use taxable as total.
-        try:
-            if (item.get('total') is not None and item.get('total') < 5 and
-                item.get('taxable') is not None and
-                (item.get('cgst_amt') or 0) == 0 and (item.get('sgst_amt') or 0) == 0):
-                item['total'] = item['taxable']
-        except Exception:
-            pass
-
-        # Name repair (common: "Kinnaur 4" -> "Apple Kinnaur 4 pcs")
-        nm = (item.get('name') or '')
-        if nm.lower().startswith('kinnaur'):
-            item['name'] = 'Apple ' + nm + ' pcs'
-
-        return item
-
     def parse_item_row_text_all(row_text: str):
-        row_text = re.sub(r'\s+', ' ', (row_text or '').strip())
+        row_text = C.ws.sub(' ', (row_text or '').strip())
         if not row_text:
             return []
-        row_text = re.sub(r'(?<!\d)\.(\d)\b', r'0.\1', row_text)
-
-        row_pat = (
-            r'\b(?P<sr>\d+)\s+'
-            r'(?P<name>.+?)\s+'
-            r'(?P<hsn>\d{6,8})\s+'
-            r'(?P<qty>\d+)\s+'
-            r'(?P<rate>\d+(?:\.\d{1,2})?)\s+'
-            r'(?P<disc>\d+(?:\.\d+)?)%\s+'
-            r'(?P<taxable>\d+(?:\.\d{1,2})?)\s+'
-            r'(?P<cgst_pct>\d+(?:\.\d+)?)%\s+'
-            r'(?P<sgst_pct>\d+(?:\.\d+)?)%\s+'
-            r'(?P<cgst_amt>\d+(?:\.\d{1,2})?)\s+'
-            r'(?P<sgst_amt>\d+(?:\.\d{1,2})?)\s+'
-            r'(?P<cess_pct>\d+(?:\.\d+)?)(?:%)?\s+'
-            r'(?P<cess_amt>\d+(?:\.\d{1,2})?)\s+'
-            r'(?P<total>\d+(?:\.\d{1,2})?)\b'
-        )
+        row_text = C.orphan_decimal.sub(r'0.\1', row_text)
 
         out = []
-        for m in re.finditer(row_pat, row_text):
-            name = re.sub(r'\s+', ' ', m.group('name')).strip(' -')
+        for m in P.row.finditer(row_text):
+            name = C.ws.sub(' ', m.group('name')).strip(' -')
             for _ in range(5):
                 name2 = name
-                name2 = re.sub(r'\b([A-Za-z]{1,2})\s+([a-z]{2,})\b', r'\1\2', name2)
-                name2 = re.sub(r'\b([A-Za-z]{1,3})\s+([a-z]{1,3})\b', r'\1\2', name2)
-                name2 = re.sub(r'\b([a-z]{2,4})\s+([a-z]{2,4})\b', r'\1\2', name2)
+                name2 = P.name_join_short_long.sub(r'\1\2', name2)
+                name2 = P.name_join_short_short.sub(r'\1\2', name2)
+                name2 = P.name_join_mid.sub(r'\1\2', name2)
                 if name2 == name:
                     break
                 name = name2
@@ -337,51 +228,38 @@ def main():
                 'name': name,
                 'hsn': m.group('hsn'),
                 'qty': int(float(m.group('qty'))),
-                'rate': fnum(m.group('rate')),
-                'discount_pct': fnum(m.group('disc')),
-                'taxable': fnum(m.group('taxable')),
-                'cgst_pct': fnum(m.group('cgst_pct')),
-                'sgst_pct': fnum(m.group('sgst_pct')),
-                'cgst_amt': fnum(m.group('cgst_amt')),
-                'sgst_amt': fnum(m.group('sgst_amt')),
-                'cess_pct': fnum(m.group('cess_pct')),
-                'cess_amt': fnum(m.group('cess_amt')),
-                'total': fnum(m.group('total')),
+                'rate': money.rupees(m.group('rate')),
+                'discount_pct': money.number(m.group('disc')),
+                'taxable': money.rupees(m.group('taxable')),
+                'cgst_pct': money.number(m.group('cgst_pct')),
+                'sgst_pct': money.number(m.group('sgst_pct')),
+                'cgst_amt': money.rupees(m.group('cgst_amt')),
+                'sgst_amt': money.rupees(m.group('sgst_amt')),
+                'cess_pct': money.number(m.group('cess_pct')),
+                'cess_amt': money.rupees(m.group('cess_amt')),
+                'total': money.rupees(m.group('total')),
             })
         return out
 
-    def table_extract_items_text():
+    def table_extract_items_text(pages):
         out = []
-        settings = {
-            "vertical_strategy": "text",
-            "horizontal_strategy": "text",
-            "intersection_tolerance": 5,
-            "snap_tolerance": 3,
-            "join_tolerance": 3,
-            "min_words_vertical": 2,
-            "min_words_horizontal": 1,
-        }
-        for page in pages:
-            words = page.extract_words() or []
-            header_top = None
-            for w in words:
-                if (w.get('text','') or '').lower() == 'sr':
-                    header_top = w['top']
-                    break
-            if header_top is None:
+        for pi in pages:
+            sr = doc.word_index(pi).first('sr')
+            if sr is None:
                 continue
+            header_top = sr['top']
             y0 = max(0, header_top - 10)
-            cropped = page.crop((0, y0, page.width, page.height))
-            tbs = cropped.extract_tables(settings) or []
-            if not tbs:
+            # same rows/columns as pdfplumber's text table strategy, from word geometry
+            g = grid.build(doc.words(pi), top=y0)
+            if g is None:
                 continue
-            tb = tbs[0]
+            tb = [g.header] + g.rows
 
             # Some Zepto PDFs have a rendering bug where an item row overlaps the table header on the next page.
             # In that case, the "header" row may actually contain a full item row (sr/hsn/qty/rate/total).
-            header_cells = [re.sub(r'\s+', ' ', str(c or '').strip()) for c in tb[0]]
+            header_cells = [C.ws.sub(' ', str(c or '').strip()) for c in tb[0]]
             header_text = ' '.join([c for c in header_cells if c])
-            if header_text and re.search(r'\b\d{6,8}\b', header_text):
+            if header_text and P.hsn.search(header_text):
                 for parsed in parse_item_row_text_all(header_text):
                     if parsed and parsed.get('name'):
                         out.append(parsed)
@@ -390,10 +268,10 @@ def main():
             for row in tb[1:]:
                 cells = []
                 for c in row:
-                    s = re.sub(r'\s+', ' ', str(c or '').strip())
+                    s = C.ws.sub(' ', str(c or '').strip())
                     # Fix digit splits inside a cell (don't join across cells)
-                    s = re.sub(r'(?<=\d)\s+(?=\d)', '', s)
-                    s = re.sub(r'(?<!\d)\.(\d)\b', r'0.\1', s)
+                    s = P.digit_split.sub('', s)
+                    s = C.orphan_decimal.sub(r'0.\1', s)
                     if s:
                         cells.append(s)
                 # Heuristic: sometimes HSN and Qty get fused/split across two numeric cells (e.g., "040120" + "006" -> HSN 04012000, Qty 6)
@@ -417,7 +295,7 @@ def main():
                 if 'item total' in row_text.lower() or 'invoice value' in row_text.lower():
                     break
                 # Must include HSN-like digits
-                if not re.search(r'\b\d{6,8}\b', row_text):
+                if not P.hsn.search(row_text):
                     continue
                 parsed_many = parse_item_row_text_all(row_text)
                 for parsed in parsed_many:
@@ -425,9 +303,58 @@ def main():
                         out.append(parsed)
         return out
 
-    # If line-strategy got some items, still run text-strategy to recover edge cases
-    # (e.g., Zepto row-overlap bug where an item lands in the next page header).
-    extra_items = table_extract_items_text()
+    def fix_item(it: dict) -> dict:
+        if not it:
+            return it
+        # total repair
+        try:
+            if (it.get('total') is not None and it.get('total') < 5 and
+                it.get('taxable') is not None and
+                (it.get('cgst_amt') or 0) == 0 and (it.get('sgst_amt') or 0) == 0):
+                it['total'] = it['taxable']
+        except Exception:
+            pass
+        # name repair
+        nm = (it.get('name') or '').strip()
+        if nm.lower().startswith('kinnaur'):
+            it['name'] = 'Apple ' + nm + ' pcs'
+        return it
+
+    # Strategy cascade, cheapest first, stopping at the first item list that
+    # reconciles with the printed totals (most invoices do on pass 1):
+    #   1. line-strategy table (read with the page text, one page at a time)
+    #   2. + text-strategy rows recovering edge cases (e.g., Zepto row-overlap
+    #      bug where an item lands in the next page header)
+    #   3. + single-line items from the text (Mode 1)
+    #   4. Zepto Pass blocks (Mode 2), only if nothing was found at all
+    # If none reconciles, the fullest list is kept (what every pass together gave).
+    items = []
+    for pi in doc.stream():
+        doc.page_text(pi)
+        items.extend(table_extract_items((pi,)))
+
+    text = doc.text
+    text = C.crlf.sub('\n', text)
+    lines = [ln.strip() for ln in text.split('\n')]
+
+    hdr = HEADER.scan(text)
+    invoice_number = hdr['invoice_number']
+    order_number = hdr['order_number']
+    date = hdr['date']
+
+    # Totals section (Zepto often prints these inline on one line)
+    item_total = money.rupees(hdr['item_total'])
+    handling_fee = money.rupees(hdr['handling_fee'])
+    invoice_value = money.rupees(hdr['invoice_value'])
+
+    def done(cand):
+        return reconciles([fix_item(dict(it)) for it in cand], item_total, handling_fee, invoice_value)
+
+    extra_items = []
+    if not done(items):
+        for pi in doc.stream():
+            extra_items.extend(table_extract_items_text((pi,)))
+
     if extra_items:
         def key(it):
             return (str(it.get('hsn') or ''), str(it.get('qty') or ''), str(it.get('total') or ''), (it.get('name') or '').lower())
@@ -442,32 +369,18 @@ def main():
     # Parse item lines from the extracted text (items are usually in a single line per item)
     # Example pattern tail:
     #   <HSN> <Qty> <Rate> <Disc%> <Taxable> <CGST%> <SGST%> <CGST Amt> <SGST Amt> <Cess Amt> <Total>
-    item_re = re.compile(
-        r'\b(?P<sr>\d+)\s+'
-        r'(?P<name>.+?)\s+'
-        r'(?P<hsn>\d{6,8})\s+'
-        r'(?P<qty>\d+)\s+'
-        r'(?P<rate>\d+\.\d{2})\s+'
-        r'(?P<disc>\d+\.\d+)%\s+'
-        r'(?P<taxable>\d+\.\d{2})\s+'
-        r'(?P<cgst_pct>\d+\.\d+)%\s+'
-        r'(?P<sgst_pct>\d+\.\d+)%\s+'
-        r'(?P<cgst_amt>\d+\.\d{2})\s+'
-        r'(?P<sgst_amt>\d+\.\d{2})\s+'
-        r'(?P<cess_amt>\d+\.\d{2})\s+'
-        r'(?P<total>\d+\.\d{2})\b'
-    )
+    item_re = P.item_line
 
     def is_noise_line(s: str) -> bool:
         s = (s or '').strip()
         if not s:
             return True
         # Pure numbers / amounts / percents
-        if re.fullmatch(r'\d+(?:\.\d+)?%?', s):
+        if P.noise_number.fullmatch(s):
             return True
-        if re.fullmatch(r'[\+\-]?\s*\d+\.\d{2}', s):
+        if P.noise_amount.fullmatch(s):
             return True
-        if re.fullmatch(r'\+\s*\d+\.\d{2}', s):
+        if P.plus_amount.fullmatch(s):
             return True
         if s.lower() in {
             'sr', 'no', 'hsn', 'qty', 'rate', 'disc.', 'taxable', 'amt.', 'cgst', 's/ut', 'gst', 'cess', 'total',
@@ -479,15 +392,13 @@ def main():
     # Find where the items section begins (skip address blocks)
     items_section_start = 0
     for i, ln in enumerate(lines):
-        if re.fullmatch(r'SR', ln.strip(), flags=re.IGNORECASE):
+        if P.sr_header.fullmatch(ln.strip()):
             items_section_start = i
             break
 
     # Parse Mode 1 (preferred): single-line items (common in some Zepto invoice templates)
     # Parse Mode 2 (fallback): multi-line blocks (seen in Zepto Pass / membership type invoices)
 
-    last_consumed_idx = items_section_start
-
     def looks_like_header_or_address(s: str) -> bool:
         s = (s or '').strip()
         if not s:
@@ -509,9 +420,9 @@ def main():
         if not s:
             return False
         low = s.lower()
-        if not re.search(r'[A-Za-z]', s):
+        if not C.has_alpha.search(s):
             return False
-        if re.search(r'\d', s):
+        if C.has_digit.search(s):
             return False
         # reject common address words seen in Zepto PDFs
         addr_bad = [
@@ -533,80 +444,79 @@ def main():
         return any(k in s for k in ['pack', 'pcs', 'pc', 'kg', 'g)', 'ml', 'l)', '(200', '(500', '('])
 
     # Mode 1: single-line pattern
-    for idx, ln in enumerate(lines):
-        if idx < items_section_start:
-            continue
-        m = item_re.search(ln)
-        if not m:
-            continue
-        # Require that the captured name contains at least one letter.
-        # This avoids false positives on templates where the table is split across lines.
-        if not re.search(r'[A-Za-z]', m.group('name')):
-            continue
-
-        base_name = re.sub(r'\s+', ' ', m.group('name')).strip(' -')
-
-        # Collect prefix fragments (brand/name) right above the item line
-        prefix = []
-        j = idx - 1
-        while j >= items_section_start and len(prefix) < 4:
-            t = lines[j].strip()
-            if not t:
-                j -= 1
+    if not done(items):
+        for idx, ln in enumerate(lines):
+            if idx < items_section_start:
                 continue
-            if packish_line(t):
-                break
-            if looks_like_header_or_address(t) or is_noise_line(t):
-                j -= 1
+            m = item_re.search(ln)
+            if not m:
                 continue
-            if alpha_line(t):
-                prefix.append(t)
-            j -= 1
-        prefix = list(reversed(prefix))
-
-        # Collect suffix fragments (pack size) immediately after the item line
-        suffix = []
-        k = idx + 1
-        while k < len(lines) and len(suffix) < 3:
-            t = lines[k].strip()
-            if not t:
-                k += 1
+            # Require that the captured name contains at least one letter.
+            # This avoids false positives on templates where the table is split across lines.
+            if not C.has_alpha.search(m.group('name')):
                 continue
-            if item_re.search(t):
-                break
-            low = t.lower()
-            if 'item total' in low or 'invoice value' in low or 'handling fee' in low:
-                break
-            if looks_like_header_or_address(t):
-                break
-            if re.fullmatch(r'\+\s*\d+\.\d{2}', t) or re.fullmatch(r'\d+\.\d{2}%?', t):
+
+            base_name = C.ws.sub(' ', m.group('name')).strip(' -')
+
+            # Collect prefix fragments (brand/name) right above the item line
+            prefix = []
+            j = idx - 1
+            while j >= items_section_start and len(prefix) < 4:
+                t = lines[j].strip()
+                if not t:
+                    j -= 1
+                    continue
+                if packish_line(t):
+                    break
+                if looks_like_header_or_address(t) or is_noise_line(t):
+                    j -= 1
+                    continue
+                if alpha_line(t):
+                    prefix.append(t)
+                j -= 1
+            prefix = list(reversed(prefix))
+
+            # Collect suffix fragments (pack size) immediately after the item line
+            suffix = []
+            k = idx + 1
+            while k < len(lines) and len(suffix) < 3:
+                t = lines[k].strip()
+                if not t:
+                    k += 1
+                    continue
+                if item_re.search(t):
+                    break
+                low = t.lower()
+                if 'item total' in low or 'invoice value' in low or 'handling fee' in low:
+                    break
+                if looks_like_header_or_address(t):
+                    break
+                if P.plus_amount.fullmatch(t) or P.amount_or_pct.fullmatch(t):
+                    k += 1
+                    continue
+                if packish_line(t):
+                    suffix.append(t)
                 k += 1
-                continue
-            if packish_line(t):
-                suffix.append(t)
-            k += 1
-
-        full_name = ' '.join(prefix + [base_name] + suffix)
-        full_name = re.sub(r'\s+', ' ', full_name).strip(' -')
-
-        items.append({
-            'sr': int(m.group('sr')),
-            'name': full_name,
-            'hsn': m.group('hsn'),
-            'qty': int(m.group('qty')),
-            'rate': fnum(m.group('rate')),
-            'discount_pct': fnum(m.group('disc')),
-            'taxable': fnum(m.group('taxable')),
-            'cgst_pct': fnum(m.group('cgst_pct')),
-            'sgst_pct': fnum(m.group('sgst_pct')),
-            'cgst_amt': fnum(m.group('cgst_amt')),
-            'sgst_amt': fnum(m.group('sgst_amt')),
-            'cess_pct': None,
-            'cess_amt': fnum(m.group('cess_amt')),
-            'total': fnum(m.group('total')),
-        })
-
-        last_consumed_idx = max(last_consumed_idx, idx)
+
+            full_name = ' '.join(prefix + [base_name] + suffix)
+            full_name = C.ws.sub(' ', full_name).strip(' -')
+
+            items.append({
+                'sr': int(m.group('sr')),
+                'name': full_name,
+                'hsn': m.group('hsn'),
+                'qty': int(m.group('qty')),
+                'rate': money.rupees(m.group('rate')),
+                'discount_pct': money.number(m.group('disc')),
+                'taxable': money.rupees(m.group('taxable')),
+                'cgst_pct': money.number(m.group('cgst_pct')),
+                'sgst_pct': money.number(m.group('sgst_pct')),
+                'cgst_amt': money.rupees(m.group('cgst_amt')),
+                'sgst_amt': money.rupees(m.group('sgst_amt')),
+                'cess_pct': None,
+                'cess_amt': money.rupees(m.group('cess_amt')),
+                'total': money.rupees(m.group('total')),
+            })
 
     # Mode 2: semi-structured lines (if Mode 1 found nothing)
     if not items:
@@ -621,28 +531,11 @@ def main():
                 candidates.append((ln + ' ' + lines[items_section_start:][idx+1]).strip())
 
             for cand in candidates:
-                m = re.search(
-                    r'(?P<name>.+?)\s+'
-                    r'(?P<sr>\d+)\s+'
-                    r'(?P<desc2>.+?)\s+'
-                    r'(?P<hsn>\d{6,8})\s+'
-                    r'(?P<qty>\d+)\s+'
-                    r'(?P<taxable>\d+\.\d{2})\s+'
-                    r'(?P<disc>\d+(?:\.\d+)?)%\s+'
-                    r'(?P<taxable2>\d+\.\d{2})\s+'
-                    r'(?P<cgst_pct>\d+\.\d+)%\s+'
-                    r'(?P<sgst_pct>\d+\.\d+)%\s+'
-                    r'(?P<cgst_amt>\d+\.\d{2})\s+'
-                    r'(?P<sgst_amt>\d+\.\d{2})\s+'
-                    r'(?P<cess_pct>\d+(?:\.\d+)?)%\s+'
-                    r'(?P<cess_amt>\d+\.\d{2})\s+'
-                    r'(?P<total>\d+\.\d{2})\b',
-                    cand
-                )
+                m = P.pass_row.search(cand)
                 if not m:
                     continue
 
-                name = re.sub(r'\s+',' ', (m.group('name') + ' ' + m.group('desc2')).strip())
+                name = C.ws.sub(' ', (m.group('name') + ' ' + m.group('desc2')).strip())
 
                 items.append({
                     'sr': int(m.group('sr')),
@@ -650,51 +543,72 @@ def main():
                     'hsn': m.group('hsn'),
                     'qty': int(m.group('qty')),
                     'rate': None,
-                    'discount_pct': fnum(m.group('disc')),
-                    'taxable': fnum(m.group('taxable2')),
-                    'cgst_pct': fnum(m.group('cgst_pct')),
-                    'sgst_pct': fnum(m.group('sgst_pct')),
-                    'cgst_amt': fnum(m.group('cgst_amt')),
-                    'sgst_amt': fnum(m.group('sgst_amt')),
-                    'cess_pct': fnum(m.group('cess_pct')),
-                    'cess_amt': fnum(m.group('cess_amt')),
-                    'total': fnum(m.group('total')),
+                    'discount_pct': money.number(m.group('disc')),
+                    'taxable': money.rupees(m.group('taxable2')),
+                    'cgst_pct': money.number(m.group('cgst_pct')),
+                    'sgst_pct': money.number(m.group('sgst_pct')),
+                    'cgst_amt': money.rupees(m.group('cgst_amt')),
+                    'sgst_amt': money.rupees(m.group('sgst_amt')),
+                    'cess_pct': money.number(m.group('cess_pct')),
+                    'cess_amt': money.rupees(m.group('cess_amt')),
+                    'total': money.rupees(m.group('total')),
                 })
                 break
             if items:
                 break
 
-    def fix_item(it: dict) -> dict:
-        if not it:
-            return it
-        # total repair
-        try:
-            if (it.get('total') is not None and it.get('total') < 5 and
-                it.get('taxable') is not None and
-                (it.get('cgst_amt') or 0) == 0 and (it.get('sgst_amt') or 0) == 0):
-                it['total'] = it['taxable']
-        except Exception:
-            pass
-        # name repair
-        nm = (it.get('name') or '').strip()
-        if nm.lower().startswith('kinnaur'):
-            it['name'] = 'Apple ' + nm + ' pcs'
-        return it
-
-    items = [fix_item(dict(it)) for it in items]
+    items = [money.with_paise(fix_item(dict(it)), ITEM_MONEY) for it in items]
+    invoice_date, invoice_date_ms = dates.stamp(date)
 
     out = {
         'merchant': 'ZEPTO',
         'invoice_number': invoice_number,
         'order_number': order_number,
         'date': date,
+        'invoice_date': invoice_date,
+        'invoice_date_ms': invoice_date_ms,
         'item_total': item_total,
         'handling_fee': handling_fee,
         'invoice_value': invoice_value,
         'items': items,
     }
+    out = money.with_paise(out, TOTAL_MONEY)
+    out['validation'] = validation(out)
+
+    return out
+
+
+def iter_records(doc):
+    """--ndjson records: the invoice ({'type': 'invoice', ...parse output}), then
+    {'type': 'summary', ...} with its totals. A Zepto PDF is a single invoice
+    whose items can span pages, so the invoice line comes once all pages are read."""
+    out = parse_document(doc)
+    yield {'type': 'invoice', **out}
+    yield money.with_paise({
+        'type': 'summary',
+        'merchant': out['merchant'],
+        'item_total': out['item_total'],
+        'handling_fee': out['handling_fee'],
+        'invoice_value': out['invoice_value'],
+        'invoice_count': 1,
+    }, TOTAL_MONEY)
+
+
+def main():
+    flags, args = inputs.split_args(sys.argv[1:])
+    if not args:
+        print('Usage: parse_zepto_invoice.py [--ndjson] [--base64url] <invoice.pdf|->', file=sys.stderr)
+        sys.exit(2)
+
+    source = inputs.source_arg(args[0], base64url='--base64url' in flags)
+
+    if '--ndjson' in flags:
+        with open_document(source) as doc:
+            for rec in iter_records(doc):
+                ndjson.write(sys.stdout, rec)
+        return
 
-    print(json.dumps(out, indent=2))
+    print(json.dumps(parse(source), indent=2))
 
 
 if __name__ == '__main__':
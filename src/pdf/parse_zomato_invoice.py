@@ -1,57 +1,50 @@
 #!/usr/bin/env python3
-import re
 import json
 import sys
-from pathlib import Path
 
+from hk_pdf import inputs, money, validate
+from hk_pdf.document import open_document
+from hk_pdf.patterns import COMMON as C, ZOMATO as P, HeaderScanner
+from hk_pdf.router import quick_reject
 
-def norm_money(s: str):
-    if s is None:
-        return None
-    s = str(s).replace(',', '').strip()
-    try:
-        return float(s)
-    except Exception:
-        return None
-
+# Bump when parse output changes; invalidates this parser's hk_pdf cache entries.
+PARSER_VERSION = 6
 
-def extract_text(pdf_path: Path):
-    # Use pdfplumber from the hk venv.
-    import pdfplumber  # type: ignore
+# Any of these in the text means the PDF is ours (checked lowercase).
+MARKERS = ('zomato', 'zomato limited', 'zomato media')
 
-    full = ''
-    with pdfplumber.open(str(pdf_path)) as pdf:
-        for p in pdf.pages:
-            t = p.extract_text() or ''
-            full += '\n' + t
-    return full.strip()
+HEADER = HeaderScanner({
+    'order_id': [P.order_id, P.order_id_upper],
+    'total': [P.total_paid, P.grand_total, P.total_rs],
+})
 
 
-def find_first(patterns, text, flags=re.I, group=1):
-    for pat in patterns:
-        m = re.search(pat, text, flags)
-        if m:
-            return m.group(group).strip()
-    return None
+def extract_text(source):
+    # Plain text only: pdfium when available (hk_pdf.backends), else pdfplumber.
+    with open_document(source) as doc:
+        if quick_reject(doc, 'zomato', MARKERS):
+            # Clearly not ours: page 1 alone makes parse_text() reject it.
+            return doc.fast_page_text(0).strip()
+        return doc.fast_text.strip()
 
 
 def parse_items(text: str):
     # Best-effort: capture lines ending with an amount.
     items = []
     for line in text.splitlines():
-        ln = re.sub(r'\s+', ' ', line).strip()
+        ln = C.ws.sub(' ', line).strip()
         if not ln:
             continue
-        if re.search(r'\b(total|grand total|total paid|tax|gst|delivery|packaging|discount)\b', ln, re.I):
+        if P.skip_line.search(ln):
             continue
-        m = re.search(r'^(.*?)(?:\s+x\s*(\d+))?\s+₹\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)\s*$', ln)
+        m = P.generic_item.search(ln)
         if not m:
             continue
         name = m.group(1).strip(' -:')
         if len(name) < 3:
             continue
         qty = int(m.group(2)) if m.group(2) else None
-        amt = norm_money(m.group(3))
+        amt = money.rupees(m.group(3))
         if amt is None:
             continue
         items.append({
@@ -71,47 +64,48 @@ def parse_items(text: str):
     return out
 
 
-def main():
-    if len(sys.argv) < 2:
-        print('Usage: parse_zomato_invoice.py <pdf>', file=sys.stderr)
-        sys.exit(2)
-
-    pdf_path = Path(sys.argv[1])
-    if not pdf_path.exists():
-        raise SystemExit(f'File not found: {pdf_path}')
-
-    try:
-        text = extract_text(pdf_path)
-    except Exception as e:
-        print(json.dumps({'ok': False, 'error': str(e)}))
-        sys.exit(1)
-
+def parse_text(text: str):
     low = text.lower()
     # Zomato invoices usually contain zomato branding or "zomato" word.
-    if 'zomato' not in low and 'zomato limited' not in low and 'zomato media' not in low:
-        print(json.dumps({'ok': False, 'reason': 'not_zomato'}))
-        return
-
-    order_id = find_first([
-        r'\bOrder\s*ID\s*[:#]?\s*([0-9]+)\b',
-        r'\bORDER\s*ID\s*[:#]?\s*([0-9]+)\b'
-    ], text)
+    if not any(k in low for k in MARKERS):
+        return {'ok': False, 'reason': 'not_zomato'}
 
-    total = find_first([
-        r'\bTotal\s*paid\s*₹\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)',
-        r'\bGrand\s*Total\s*₹\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)',
-        r'\bTotal\s*₹\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)'
-    ], text)
+    hdr = HEADER.scan(text)
+    order_id = hdr['order_id']
+    total = hdr['total']
 
     items = parse_items(text)
 
-    print(json.dumps({
+    total = money.rupees(total)
+    return money.with_paise({
         'ok': True,
         'order_id': order_id,
-        'total': norm_money(total),
-        'items': items,
+        'total': total,
+        'items': [money.with_paise(it, ('amount',)) for it in items],
+        'validation': validate.item_amounts(items, total, partial=True),
         'text_len': len(text)
-    }))
+    }, ('total',))
+
+
+def parse(source):
+    return parse_text(extract_text(source))
+
+
+def main():
+    flags, args = inputs.split_args(sys.argv[1:])
+    if not args:
+        print('Usage: parse_zomato_invoice.py [--base64url] <pdf|->', file=sys.stderr)
+        sys.exit(2)
+
+    source = inputs.source_arg(args[0], base64url='--base64url' in flags)
+
+    try:
+        text = extract_text(source)
+    except Exception as e:
+        print(json.dumps({'ok': False, 'error': str(e)}))
+        sys.exit(1)
+
+    print(json.dumps(parse_text(text)))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,219 @@
+// Runs the python invoice parsers in src/pdf.
+//
+// By default a single long-lived `python -m hk_pdf.server` is started on first use and
+// reused for every PDF, so python + pdfplumber are imported once per run instead of once
+// per invoice. Set HK_PDF_SERVER=0 to fall back to one spawnSync per PDF.
+//
+// A PDF is either a path on disk or { data, path }: data is the attachment as Gmail
+// returns it (base64url) and is parsed from memory, so nothing has to be written
+// first; path is only a label (it ends up in pdfPath / the merge keys). On Linux the
+// server gets such a PDF decoded into a /dev/shm segment it maps directly instead of
+// as base64 text over the pipe; HK_PDF_SHM=0 sends the text.
+
+const fs = require('fs');
+const path = require('path');
+const readline = require('readline');
+const { spawn, spawnSync } = require('child_process');
+
+function pythonBin(){
+  return process.env.HK_PDF_PY || path.join(process.env.HOME, 'clawd', '.venv-pdf', 'bin', 'python');
+}
+
+function pdfDir(){
+  return path.join(process.env.HOME, 'clawd', 'hisab-kitab', 'src', 'pdf');
+}
+
+// Per-PDF limits are enforced in python (hk_pdf/limits.py, HK_PDF_TIMEOUT etc.); a PDF
+// over one resolves to { ok: false, reason, error } so the run moves straight on.
+// As a backstop for a parse stuck where python cannot interrupt it, node kills the
+// server / one-shot process LIMIT_GRACE_MS after HK_PDF_TIMEOUT.
+const LIMIT_REASONS = new Set(['timeout', 'too_many_pages', 'too_large', 'oom']);
+const LIMIT_GRACE_MS = 15000;
+
+function hardTimeoutMs(){
+  const t = Number(process.env.HK_PDF_TIMEOUT || 60);
+  return t > 0 ? t * 1000 + LIMIT_GRACE_MS : 0;
+}
+
+let server = null;
+
+function setRef(s, on){
+  // Only keep node alive while a request is in flight.
+  for (const h of [s.child, s.child.stdin, s.child.stdout]) {
+    if (!h) continue;
+    if (on) h.ref?.(); else h.unref?.();
+  }
+}
+
+function failAll(s, err){
+  clearTimeout(s.timer);
+  for (const { reject } of s.pending.values()) reject(err);
+  s.pending.clear();
+}
+
+// The server answers in order, so only the oldest request in flight is timed.
+// Stuck past python's own watchdog: it times out, the server is killed (others
+// in flight fall back to one-shot runs) and restarted on demand.
+function armTimer(s){
+  clearTimeout(s.timer);
+  s.timer = null;
+  const ms = hardTimeoutMs();
+  const head = s.pending.keys().next();
+  if (!ms || head.done) return;
+  const id = head.value;
+  s.timer = setTimeout(() => {
+    const p = s.pending.get(id);
+    if (!p) return;
+    s.pending.delete(id);
+    p.resolve({ id, status: 'ok', result: { ok: false, reason: 'timeout' } });
+    s.child.kill('SIGKILL');
+  }, ms);
+}
+
+function startServer(){
+  const child = spawn(pythonBin(), ['-m', 'hk_pdf.server'], { cwd: pdfDir(), stdio: ['pipe', 'pipe', 'inherit'] });
+  const s = { child, pending: new Map(), nextId: 1, dead: false, timer: null };
+
+  const rl = readline.createInterface({ input: child.stdout });
+  rl.on('line', (line) => {
+    let res = null;
+    try { res = JSON.parse(line); } catch { return; }
+    const p = s.pending.get(res.id);
+    if (!p) return;
+    s.pending.delete(res.id);
+    armTimer(s);
+    if (!s.pending.size) setRef(s, false);
+    p.resolve(res);
+  });
+
+  const onDead = (err) => {
+    if (s.dead) return;
+    s.dead = true;
+    if (server === s) server = null;
+    failAll(s, err);
+  };
+  child.on('error', onDead);
+  child.on('exit', (code, signal) => onDead(new Error(`pdf server exited (${signal || code})`)));
+  child.stdin.on('error', onDead);
+
+  setRef(s, false);
+  return s;
+}
+
+function requestServer(req){
+  if (!server || server.dead) server = startServer();
+  const s = server;
+  return new Promise((resolve, reject) => {
+    const id = s.nextId++;
+    s.pending.set(id, { resolve, reject });
+    if (s.pending.size === 1) armTimer(s);
+    setRef(s, true);
+    s.child.stdin.write(JSON.stringify({ ...req, id }) + '\n');
+  });
+}
+
+// These print compact NDJSON with --ndjson (one line per invoice + a summary line)
+// instead of one big indented document.
+const NDJSON_PARSERS = new Set(['blinkit', 'zepto']);
+
+// Rebuild the object the parser prints without --ndjson.
+function fromNdjson(parser, stdout){
+  const invoices = [];
+  let summary = null;
+  for (const line of stdout.split('\n')) {
+    if (!line.trim()) continue;
+    const { type, ...rec } = JSON.parse(line);
+    if (type === 'invoice') invoices.push(rec);
+    else if (type === 'summary') summary = rec;
+  }
+  if (!summary) throw new Error('missing summary line');
+  if (parser === 'zepto') return invoices[0];
+  const { invoice_count, ...head } = summary;
+  return { ...head, invoices };
+}
+
+function fromResult(parsed){
+  if (parsed && parsed.ok === false && LIMIT_REASONS.has(parsed.reason)) {
+    return { ok: false, reason: parsed.reason, error: `pdf limit: ${parsed.reason}` };
+  }
+  return { ok: true, parsed };
+}
+
+function runOnce(parser, source){
+  const script = path.join(pdfDir(), `parse_${parser}_invoice.py`);
+  const ndjson = NDJSON_PARSERS.has(parser);
+  const args = [script];
+  if (ndjson) args.push('--ndjson');
+  const opts = { encoding: 'utf8', maxBuffer: 64 * 1024 * 1024, killSignal: 'SIGKILL' };
+  const ms = hardTimeoutMs();
+  if (ms) opts.timeout = ms;
+  if (typeof source === 'string') {
+    args.push(source);
+  } else {
+    args.push('--base64url', '-');
+    opts.input = source.data;
+  }
+  const r = spawnSync(pythonBin(), args, opts);
+  if (r.error?.code === 'ETIMEDOUT') return { ok: false, reason: 'timeout', error: 'pdf limit: timeout' };
+  if (r.status !== 0) return { ok: false, error: r.stderr || 'python failed' };
+  try {
+    return { ok: true, parsed: ndjson ? fromNdjson(parser, r.stdout) : JSON.parse(r.stdout) };
+  } catch {
+    return { ok: false, error: 'invalid json from python' };
+  }
+}
+
+let shmSeq = 0;
+
+function useShm(){
+  return process.platform === 'linux' && process.env.HK_PDF_SHM !== '0' && fs.existsSync('/dev/shm');
+}
+
+// Server request for a PDF; cleanup() removes the shm segment once answered.
+function serverRequest(parser, source){
+  if (typeof source === 'string') return { req: { parser, path: source }, cleanup(){} };
+  if (useShm()) {
+    const name = `hk_pdf.${process.pid}.${shmSeq++}`;
+    const shmPath = path.join('/dev/shm', name);
+    try {
+      fs.writeFileSync(shmPath, Buffer.from(source.data, 'base64url'), { mode: 0o600 });
+      return { req: { parser, shm: name }, cleanup(){ fs.rmSync(shmPath, { force: true }); } };
+    } catch {
+      fs.rmSync(shmPath, { force: true });
+    }
+  }
+  return { req: { parser, data: source.data }, cleanup(){} };
+}
+
+// parser: 'zepto' | 'blinkit' | 'swiggy' | 'zomato' | 'district' | 'eatclub' | 'redbus'
+// source: a PDF path, or { data: <base64url>, path } (see above).
+// Resolves to { ok: true, parsed } (parsed = what parse_<parser>_invoice.py prints) or
+// { ok: false, error } ({ ok: false, reason, error } when the PDF hit a limit).
+async function runPdfParser(parser, source){
+  if (process.env.HK_PDF_SERVER !== '0') {
+    const { req, cleanup } = serverRequest(parser, source);
+    let res = null;
+    try { res = await requestServer(req); } catch { res = null; } finally { cleanup(); }
+    if (res) {
+      if (res.status === 'ok') return fromResult(res.result);
+      return { ok: false, error: res.error || 'python failed' };
+    }
+    // Server could not be started or died mid-request: fall back to a one-shot process.
+  }
+  return runOnce(parser, source);
+}
+
+// What a *_pdf_v1 parser hands to runPdfParser: the in-memory attachment when the
+// caller fetched one (ctx.pdfData), else the file at ctx.pdfPath.
+function pdfSource(ctx){
+  return ctx.pdfData ? { data: ctx.pdfData, path: ctx.pdfPath } : ctx.pdfPath;
+}
+
+function closePdfServer(){
+  if (!server) return;
+  const s = server;
+  server = null;
+  try { s.child.stdin.end(); } catch {}
+}
+
+module.exports = { runPdfParser, pdfSource, closePdfServer, pythonBin, pdfDir };
@@ -0,0 +1,95 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAGE_W, PAGE_H = 595, 842
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(pages, lines=()):
+    """A minimal PDF: pages is a list of [(x, top, text), ...] (top from the page top, Helvetica 9pt).
+
+    lines: [(page_index, x0, top0, x1, top1), ...] stroked rulings, for table tests.
+    """
+    objs = []
+
+    def add(body):
+        objs.append(body)
+        return len(objs)
+
+    font = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+    pages_id = len(objs) + 1 + 2 * len(pages)
+    kids = []
+    for pi, words in enumerate(pages):
+        ops = ['BT /F1 9 Tf']
+        for x, top, text in words:
+            ops.append(f'1 0 0 1 {x} {PAGE_H - top - 9} Tm ({_escape(text)}) Tj')
+        ops.append('ET')
+        for li, x0, t0, x1, t1 in lines:
+            if li == pi:
+                ops.append(f'{x0} {PAGE_H - t0} m {x1} {PAGE_H - t1} l S')
+        stream = '\n'.join(ops).encode('latin-1')
+        content = add(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        kids.append(add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 %d 0 R >> >> >>' % (pages_id, PAGE_W, PAGE_H, content, font)
+        ))
+    assert add(b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % k for k in kids), len(kids))) == pages_id
+    catalog = add(b'<< /Type /Catalog /Pages %d 0 R >>' % pages_id)
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % i + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objs) + 1)
+    for off in offsets:
+        out += b'%010d 00000 n \n' % off
+    out += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objs) + 1, catalog, xref)
+    return bytes(out)
+
+
+BLINKIT_COLS = [30, 70, 300, 370, 440, 490, 560]
+BLINKIT_HEADER = ['Sr. no', 'Item Description', 'MRP', 'Discount', 'Qty', 'Total']
+
+
+def blinkit_invoice(items, invoice_number='INV001', order_id='1234567890', date='12-Jan-2026', total_row=True):
+    """One-page Blinkit-style invoice: header fields and a fully ruled item table.
+
+    items: [(name, mrp, discount, qty, total), ...] as printed strings.
+    """
+    rows = [BLINKIT_HEADER] + [[str(i + 1), *it] for i, it in enumerate(items)]
+    if total_row:
+        rows.append(['Total', '', '', '', '', f'{sum(float(it[4]) for it in items):.2f}'])
+    top, h = 200, 20
+    words = [(40, 60, f'Order Id : {order_id}'), (40, 80, f'Invoice Number : {invoice_number}'),
+             (40, 100, f'Invoice Date : {date}')]
+    for r, row in enumerate(rows):
+        words.extend((BLINKIT_COLS[c] + 3, top + r * h + 5, text) for c, text in enumerate(row) if text)
+    lines = [(0, BLINKIT_COLS[0], top + r * h, BLINKIT_COLS[-1], top + r * h) for r in range(len(rows) + 1)]
+    lines += [(0, x, top, x, top + len(rows) * h) for x in BLINKIT_COLS]
+    return make_pdf([words], lines)
+
+
+@pytest.fixture(autouse=True)
+def no_template_store(monkeypatch):
+    # Never learn layouts into ~/HisabKitab; tests that want a store point HK_PDF_TEMPLATES at tmp_path.
+    from hk_pdf import templates
+
+    monkeypatch.setenv('HK_PDF_TEMPLATES', '0')
+    templates.configure()
+    yield
+    templates.configure()
+
+
+@pytest.fixture
+def pdf_bytes():
+    return make_pdf
@@ -0,0 +1,89 @@
+import mmap
+
+import pytest
+
+import parse_blinkit_invoice
+from conftest import blinkit_invoice
+from hk_pdf import cache as parse_cache
+from hk_pdf import registry
+from hk_pdf.document import open_document
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = parse_cache.ParseCache(str(tmp_path / 'cache.sqlite'))
+    yield c
+    c.close()
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    calls = []
+    parse = registry._parse
+
+    def counting(mod, source, limits):
+        calls.append(mod.__name__)
+        return parse(mod, source, limits)
+
+    monkeypatch.setattr(registry, '_parse', counting)
+    return calls
+
+
+def test_digest_is_the_same_for_every_source_kind(tmp_path):
+    pdf = blinkit_invoice([('Milk', '30.00', '0.00', '1', '30.00')])
+    path = tmp_path / 'a.pdf'
+    path.write_bytes(pdf)
+    want = parse_cache.source_digest(pdf)
+    assert parse_cache.source_digest(str(path)) == want
+    assert parse_cache.file_digest(str(path)) == want
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        assert parse_cache.source_digest(mm) == want
+    with open_document(str(path)) as doc:
+        assert parse_cache.source_digest(doc) == want
+    with open_document(pdf) as doc:
+        assert parse_cache.source_digest(doc) == want
+
+
+def test_hit_skips_the_parse_regardless_of_where_the_pdf_lives(tmp_path, cache, parses):
+    pdf = blinkit_invoice([('Milk', '30.00', '0.00', '1', '30.00')])
+    path = tmp_path / 'copy.pdf'
+    path.write_bytes(pdf)
+    first = registry.parse_pdf('blinkit', pdf, cache=cache)
+    assert registry.parse_pdf(' Blinkit ', str(path), cache=cache) == first
+    assert parses == ['parse_blinkit_invoice']
+    assert first['invoices'][0]['invoice_total_paise'] == 3000
+
+
+def test_key_includes_parser_and_version(monkeypatch, cache, parses):
+    pdf = blinkit_invoice([('Milk', '30.00', '0.00', '1', '30.00')])
+    registry.parse_pdf('blinkit', pdf, cache=cache)
+    registry.parse_pdf('zomato', pdf, cache=cache)
+    assert len(parses) == 2
+
+    old = parse_blinkit_invoice.PARSER_VERSION
+    monkeypatch.setattr(parse_blinkit_invoice, 'PARSER_VERSION', old + 1)
+    registry.parse_pdf('blinkit', pdf, cache=cache)
+    assert len(parses) == 3
+    assert cache.get(parse_cache.source_digest(pdf), 'blinkit', old) is not None
+    assert cache.get(parse_cache.source_digest(pdf), 'blinkit', old + 1) is not None
+
+
+def test_prune_and_clear(cache):
+    cache.put('a' * 64, 'zepto', 1, {'v': 1})
+    cache.put('a' * 64, 'zepto', 2, {'v': 2})
+    cache.put('b' * 64, 'blinkit', 5, {'v': 5})
+    assert cache.prune({'zepto': 2, 'blinkit': 5}) == 1
+    assert cache.get('a' * 64, 'zepto', 1) is None
+    assert cache.get('a' * 64, 'zepto', 2) == {'v': 2}
+    assert cache.clear('zepto') == 1
+    assert cache.stats() == [{'parser': 'blinkit', 'version': 5, 'rows': 1}]
+
+
+def test_default_path(monkeypatch, tmp_path):
+    monkeypatch.setenv('HK_PDF_CACHE', '0')
+    assert parse_cache.default_path() is None
+    assert parse_cache.open_default() is None
+    monkeypatch.setenv('HK_PDF_CACHE', str(tmp_path / 'c.sqlite'))
+    assert parse_cache.default_path('/elsewhere') == str(tmp_path / 'c.sqlite')
+    monkeypatch.delenv('HK_PDF_CACHE')
+    assert parse_cache.default_path(str(tmp_path)) == str(tmp_path / 'pdf_parse_cache.sqlite')
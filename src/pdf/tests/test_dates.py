@@ -0,0 +1,58 @@
+import datetime as dt
+
+import pytest
+
+from hk_pdf import dates
+
+
+@pytest.mark.parametrize('text, iso', [
+    ('15-04-2025', '2025-04-15'),
+    ('13/12/2025', '2025-12-13'),
+    ('1.2.2026', '2026-02-01'),
+    ('12-Jan-2026', '2026-01-12'),
+    ('13th Jan, 2026', '2026-01-13'),
+    ('13 January 2026', '2026-01-13'),
+    ('2nd Sept. 2025', '2025-09-02'),
+    ('12-01-2026 18:05:11', '2026-01-12'),
+    ('2026-01-12', '2026-01-12'),
+    (' 2026-01-12 ', '2026-01-12'),
+])
+def test_to_iso(text, iso):
+    assert dates.to_iso(text) == iso
+
+
+@pytest.mark.parametrize('text', [None, '', 'soon', '31-02-2026', '12-13-2026', '12-Foo-2026', '2026-1-12', 'on 12-01-2026'])
+def test_to_iso_rejects(text):
+    assert dates.to_iso(text) is None
+
+
+def test_epoch_ms_is_midnight_ist():
+    ms = dates.epoch_ms('2026-01-12')
+    assert ms == int(dt.datetime(2026, 1, 11, 18, 30, tzinfo=dt.timezone.utc).timestamp()) * 1000
+    assert dt.datetime.fromtimestamp(ms / 1000, dates.IST).isoformat() == '2026-01-12T00:00:00+05:30'
+    assert dates.epoch_ms(None) is None
+
+
+def test_stamp():
+    assert dates.stamp('13th Jan, 2026') == ('2026-01-13', dates.epoch_ms('2026-01-13'))
+    assert dates.stamp('n/a') == (None, None)
+
+
+def test_memoized_by_raw_string():
+    dates.to_iso.cache_clear()
+    for _ in range(3):
+        dates.to_iso('15-04-2025')
+    info = dates.to_iso.cache_info()
+    assert (info.hits, info.misses) == (2, 1)
+
+
+def test_parsers_keep_the_printed_date_next_to_iso():
+    import parse_district_invoice
+    import parse_eatclub_invoice
+
+    out = parse_district_invoice.parse_text('TicketNew Tax Invoice\nInvoice Date: 13th Jan, 2026\nGrand Total ₹ 10.00')
+    assert (out['date'], out['invoice_date'], out['invoice_date_ms']) == (
+        '13th Jan, 2026', '2026-01-13', dates.epoch_ms('2026-01-13'))
+    # A date to_iso() cannot read is still reported as printed.
+    out = parse_eatclub_invoice.parse_text('EatClub\nOrdered At: 31-02-2026\nInvoice Total: 10.00')
+    assert (out['date'], out['invoice_date'], out['invoice_date_ms']) == ('31-02-2026', None, None)
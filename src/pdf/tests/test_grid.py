@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from hk_pdf import grid
+
+np = pytest.importorskip('numpy')
+
+CHAR_W = 4.0
+
+
+def word(text, x, top, h=9.0):
+    return {'text': text, 'x0': x, 'x1': x + CHAR_W * len(text), 'top': top, 'bottom': top + h}
+
+
+def line(text, x, top):
+    out = []
+    for w in text.split(' '):
+        out.append(word(w, x, top))
+        x += CHAR_W * (len(w) + 1)
+    return out
+
+
+# Instamart-style table: descriptions hard-wrapped at 24 characters around the numbered line.
+HEADER = line('Sr', 30, 100) + line('Description', 60, 100) + line('Qty', 200, 100) + line('Total', 260, 100)
+ROWS = [
+    (115, 'Amul Taaza Toned Fresh M', None),
+    (124, '', ('1.', '2', '56.00')),
+    (133, 'ilk 500 ml pouch of two', None),
+    (148, 'Lemon (Nimbe Hannu) 250', None),
+    (157, 'g pack', ('2.', '1', '24.00')),
+    (172, 'Onion', ('3.', '3', '90.00')),
+]
+
+
+def table_words():
+    words = list(HEADER)
+    for top, desc, nums in ROWS:
+        if desc:
+            words += line(desc, 60, top)
+        if nums:
+            sr, qty, total = nums
+            words += [word(sr, 30, top), word(qty, 200, top), word(total, 260, top)]
+    return words
+
+
+def assert_same_grid(a, b):
+    assert a.header == b.header
+    assert a.rows == b.rows
+    assert [float(t) for t in a.tops] == [float(t) for t in b.tops]
+    assert [float(x) for x in a.bounds] == [float(x) for x in b.bounds]
+
+
+def is_numbered(row):
+    return row[0].rstrip('.').isdigit()
+
+
+def test_engines_build_the_same_grid():
+    a = grid.build(table_words(), engine='numpy')
+    b = grid.build(table_words(), engine='python')
+    assert_same_grid(a, b)
+    assert a.records(is_numbered) == b.records(is_numbered)
+
+
+def test_records_rejoin_words_wrapped_mid_way():
+    g = grid.build(table_words(), engine='python')
+    i_desc = g.column('description')
+    names = [rec[i_desc] for rec in g.records(is_numbered)]
+    assert names == ['Amul Taaza Toned Fresh Milk 500 ml pouch of two', 'Lemon (Nimbe Hannu) 250 g pack', 'Onion']
+
+
+@pytest.mark.parametrize('parts, width, joined', [
+    (['Fresh M', 'ilk'], 7, 'Fresh Milk'),
+    (['Fresh M', 'ilk'], 8, 'Fresh M ilk'),       # shorter than the column's longest line
+    (['Hannu) 250', 'g pack'], 10, 'Hannu) 250 g pack'),
+    (['Toned Fresh', 'Milk'], 11, 'Toned Fresh Milk'),
+    (['a lon', 'g wrapped te', 'xt'], 12, 'a lon g wrapped text'),
+    ([], 3, ''),
+])
+def test_join_fragments(parts, width, joined):
+    assert grid.join_fragments(parts, width) == joined
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_engines_agree_on_random_tables(seed):
+    rnd = random.Random(seed)
+    cols = sorted(rnd.sample(range(20, 500, 8), rnd.randint(2, 7)))
+    words = []
+    top = 50.0
+    for _ in range(rnd.randint(1, 25)):
+        for x in cols:
+            if rnd.random() < 0.8:
+                words.append(word(rnd.choice(['1.', '12', 'NOS', 'Milk', '0.00', 'x']), x + rnd.uniform(0, 3),
+                                  top + rnd.uniform(-1, 1), h=rnd.choice([7.5, 9.0])))
+        top += rnd.choice([4.5, 9.0, 15.0])
+    kwargs = {'header_height': rnd.choice([None, 10.0]), 'top': rnd.choice([None, 60.0])}
+    a = grid.build(words, engine='numpy', **kwargs)
+    b = grid.build(words, engine='python', **kwargs)
+    if a is None:
+        assert b is None
+        return
+    assert_same_grid(a, b)
+    anchor = (lambda row: bool(row[0]))
+    assert a.records(anchor) == b.records(anchor)
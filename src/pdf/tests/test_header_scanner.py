@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+import parse_blinkit_invoice
+import parse_district_invoice
+import parse_eatclub_invoice
+import parse_redbus_invoice
+import parse_swiggy_invoice
+import parse_zepto_invoice
+import parse_zomato_invoice
+from hk_pdf.patterns import HeaderScanner, find_first
+
+SCANNERS = {
+    'blinkit': parse_blinkit_invoice.HEADER,
+    'blinkit_page': parse_blinkit_invoice.PAGE_HEADER,
+    'district': parse_district_invoice.HEADER,
+    'eatclub': parse_eatclub_invoice.HEADER,
+    'redbus': parse_redbus_invoice.HEADER,
+    'swiggy': parse_swiggy_invoice.HEADER,
+    'zepto': parse_zepto_invoice.HEADER,
+    'zomato': parse_zomato_invoice.HEADER,
+}
+
+# Header lines as the merchants print them, plus near misses and keywords
+# that overlap ("Invoice Total" / "Total", "Order ID" / "ORDER ID" / "Order No").
+SNIPPETS = [
+    'Order Id: 1234', 'ORDER ID 998877', 'Order No # 42', 'Order', 'Handling Fees for Order 5566',
+    'Order Number: ZP1234', 'Order No.: 7788',
+    'Invoice Number: INV123', 'Invoice Number', 'Invoice No.: RB-9 12/01/2026', 'Invoice No. Date\nTS-1 13/01/2026',
+    'Invoice No : ABC', 'Invoice Date: 13th Jan, 2026', 'Invoice Date 12-01-2026', 'Invoice Date: soon',
+    'Date : 15-04-2025', 'Date: 2026-01-12', '12-Jan-2026', 'Ordered At: 12-01-2026',
+    'Invoice Value 1,234.50', 'Invoice Value', 'Invoice Total ₹ 99.00', 'Invoice Total 88', 'Invoice Total: 77.5',
+    'Grand Total ₹ 1,000', 'Grand Total: 55.00', 'Total ₹ 12.00', 'Total paid ₹ 300', 'Total Amount: 41.00',
+    'Total Invoice Value 640.00', 'Total Taxable Value 600.00', 'CGST @ 2.5% 15.00', 'SGST @2.5% 15.00',
+    'Booking Charge 1 2 ₹ 40', 'Booking Charge 1 ₹ 20',
+    'Integrated Goods and Service Tax @ 18% ₹ 7.20', 'Tracking ID: EC12AB',
+    'Item Total 210.00', 'Handling Fee 10.00', 'Item Total', 'Total', 'tax invoice', 'Rupees Ten Only',
+]
+
+
+def _reference(scanner, text):
+    return {name: find_first(pats, text) for name, pats in scanner.fields.items()}
+
+
+@pytest.mark.parametrize('name', sorted(SCANNERS))
+def test_scan_matches_find_first_on_random_headers(name):
+    scanner = SCANNERS[name]
+    rng = random.Random(name)
+    for _ in range(300):
+        parts = rng.sample(SNIPPETS, rng.randint(1, 12))
+        text = rng.choice(('\n', '  ', ' | ')).join(parts)
+        assert scanner.scan(text) == _reference(scanner, text), text
+
+
+@pytest.mark.parametrize('name', sorted(SCANNERS))
+def test_scan_matches_find_first_on_each_snippet(name):
+    scanner = SCANNERS[name]
+    for text in SNIPPETS + ['']:
+        assert scanner.scan(text) == _reference(scanner, text), text
+
+
+def test_lower_priority_match_earlier_in_text_loses():
+    scanner = parse_swiggy_invoice.HEADER
+    text = 'Total ₹ 12.00\nGrand Total ₹ 50.00\nOrder ID 1\nHandling Fees for Order 2'
+    assert scanner.scan(text) == {'order_id': '2', 'total': '50.00'}
+
+
+def test_pattern_without_leading_word_falls_back_to_search():
+    scanner = HeaderScanner({'date': [parse_blinkit_invoice.P.invoice_date]})
+    assert scanner.scan('Printed on 12-Jan-2026 at noon') == {'date': '12-Jan-2026'}
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import parse_blinkit_invoice
+from hk_pdf import limits, registry, server, validate
+from hk_pdf.cache import ParseCache, source_digest
+from hk_pdf.document import open_document
+
+
+def _breach_on_last_page(monkeypatch, n_pages):
+    def page_invoice(doc, pi):
+        if pi == n_pages - 1:
+            raise limits.LimitExceeded('timeout')
+        return {'page_index': pi, 'invoice_total': 75.0, 'invoice_total_paise': 7500,
+                'validation': validate.validate([75.0], total=75.0)}
+
+    monkeypatch.setattr(parse_blinkit_invoice, 'page_invoice', page_invoice)
+
+
+def test_breach_is_not_swallowed_or_cached(monkeypatch, tmp_path, pdf_bytes):
+    pdf = pdf_bytes([[(40, 40, f'Tax Invoice page {i}')] for i in range(3)])
+    _breach_on_last_page(monkeypatch, 3)
+    cache = ParseCache(str(tmp_path / 'cache.sqlite'))
+
+    out = registry.parse_pdf('blinkit', pdf, cache=cache, limits=limits.Limits())
+
+    assert out == {'ok': False, 'reason': 'timeout'}
+    assert cache.get(source_digest(pdf), 'blinkit', parse_blinkit_invoice.PARSER_VERSION) is None
+
+
+def test_breach_stops_ndjson_records(monkeypatch, pdf_bytes):
+    pdf = pdf_bytes([[(40, 40, f'Tax Invoice page {i}')] for i in range(3)])
+    _breach_on_last_page(monkeypatch, 3)
+
+    def records(doc):
+        return list(parse_blinkit_invoice.iter_records(doc))
+
+    with open_document(pdf) as doc:
+        assert limits.Limits().run(records, doc) == {'ok': False, 'reason': 'timeout'}
+
+
+def test_watchdog_gets_through_broad_handlers(pdf_bytes):
+    def spin(doc):
+        for _ in range(500):
+            try:
+                time.sleep(0.01)
+            except Exception:
+                pass
+        return {'ok': True}
+
+    with open_document(pdf_bytes([[(40, 40, 'x')]])) as doc:
+        started = time.monotonic()
+        assert limits.Limits(timeout=0.3).run(spin, doc) == {'ok': False, 'reason': 'timeout'}
+    assert time.monotonic() - started < 5
+
+
+def test_socket_thread_parse_gets_the_watchdog(pdf_bytes):
+    # A connection thread's parse runs on the main thread, where SIGALRM can stop it.
+    def spin(doc):
+        while True:
+            try:
+                time.sleep(0.01)
+            except Exception:
+                pass
+
+    main = server._MainThread()
+    out = {}
+
+    def client():
+        with open_document(pdf_bytes([[(40, 40, 'x')]])) as doc:
+            out['result'] = main.call(limits.Limits(timeout=0.3).run, spin, doc)
+        main.stop()
+
+    t = threading.Thread(target=client)
+    t.start()
+    main.run()
+    t.join(5)
+    assert out['result'] == {'ok': False, 'reason': 'timeout'}
+
+
+def test_document_limits(pdf_bytes):
+    pdf = pdf_bytes([[(40, 40, 'x')], [(40, 40, 'y')]])
+    with open_document(pdf) as doc:
+        assert limits.Limits(max_pages=1).run(lambda d: {}, doc) == {'ok': False, 'reason': 'too_many_pages'}
+        assert limits.Limits(max_bytes=len(pdf) - 1).run(lambda d: {}, doc) == {'ok': False, 'reason': 'too_large'}
+        assert limits.Limits(max_pages=2, max_bytes=len(pdf)).run(lambda d: {'ok': True}, doc) == {'ok': True}
+
+
+def test_is_failure_only_for_limit_reasons():
+    assert limits.is_failure(limits.failure('oom'))
+    assert not limits.is_failure({'ok': False, 'reason': 'not_an_invoice'})
+    assert not limits.is_failure({'ok': True})
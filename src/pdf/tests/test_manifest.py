@@ -0,0 +1,144 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from conftest import blinkit_invoice
+from hk_pdf import backfill, manifest, orders, registry, store
+
+PDF_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_journal_replay_cuts_torn_tail(tmp_path):
+    path = str(tmp_path / manifest.JOURNAL_NAME)
+    j = manifest.Journal(path)
+    j.append({'path': 'a.pdf', 'events': []})
+    j.append({'path': 'b.pdf', 'events': [{'messageId': 'm'}]})
+    j.close()
+    good = os.path.getsize(path)
+    with open(path, 'ab') as f:
+        f.write(b'{"path": "c.pd')
+
+    j = manifest.Journal(path)
+    assert [e['path'] for e in j.replay()] == ['a.pdf', 'b.pdf']
+    assert os.path.getsize(path) == good
+    j.append({'path': 'c.pdf', 'events': []})
+    assert [e['path'] for e in j.replay()] == ['a.pdf', 'b.pdf', 'c.pdf']
+    j.truncate()
+    assert j.replay() == []
+    j.close()
+
+
+def test_journal_replay_stops_at_a_garbled_line(tmp_path):
+    path = tmp_path / manifest.JOURNAL_NAME
+    path.write_bytes(b'{"path": "a.pdf"}\nnot json\n{"path": "b.pdf"}\n')
+    j = manifest.Journal(str(path))
+    assert j.replay() == [{'path': 'a.pdf'}]
+    j.close()
+    assert path.read_bytes() == b'{"path": "a.pdf"}\n'
+
+
+def test_manifest_unchanged(tmp_path):
+    pdf = tmp_path / 'x.pdf'
+    pdf.write_bytes(b'%PDF-1.4 x')
+    size, mtime_ns = manifest.stat_key(str(pdf))
+    m = manifest.Manifest(str(tmp_path / manifest.MANIFEST_NAME))
+    m.record([{'path': str(pdf), 'size': size, 'mtime_ns': mtime_ns, 'sha256': 'ab', 'parser_id': 'P', 'version': 3}])
+    prev = m.load()[str(pdf)]
+    m.close()
+    assert manifest.unchanged(prev, size, mtime_ns, 'P', 3)
+    assert not manifest.unchanged(prev, size, mtime_ns, 'P', 4)
+    assert not manifest.unchanged(prev, size + 1, mtime_ns, 'P', 3)
+    assert not manifest.unchanged(None, size, mtime_ns, 'P', 3)
+
+
+@pytest.fixture
+def base_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv('HK_PDF_STORE', raising=False)
+    for i in range(3):
+        d = tmp_path / 'attachments' / 'blinkit' / f'msg{i}'
+        d.mkdir(parents=True)
+        item = (f'Item {i}', '50.00', '0.00', '1', f'{10 + i}.00')
+        (d / 'invoice.pdf').write_bytes(blinkit_invoice([item], invoice_number=f'INV{i}', order_id=f'10{i}'))
+    return tmp_path
+
+
+def _run(base_dir, capsys, *args):
+    capsys.readouterr()
+    assert backfill.main(['--base-dir', str(base_dir), '--workers', '1', '--no-cache', *args]) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_backfill_resumes_after_sigkill(base_dir, capsys, monkeypatch):
+    # Kill the run (SIGKILL: no cleanup at all) right after the second PDF is journaled.
+    script = textwrap.dedent(f'''
+        import os, signal, sys
+        sys.path.insert(0, {PDF_DIR!r})
+        from hk_pdf import backfill
+        add = backfill._Checkpoints.add
+        def add_then_die(self, entry):
+            add(self, entry)
+            if len(self.pending) == 2:
+                os.kill(os.getpid(), signal.SIGKILL)
+        backfill._Checkpoints.add = add_then_die
+        backfill.main(['--base-dir', {str(base_dir)!r}, '--workers', '1', '--no-cache'])
+    ''')
+    env = dict(os.environ, HK_PDF_TEMPLATES='0')
+    killed = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True)
+    assert killed.returncode == -9, killed.stderr
+    journal = base_dir / manifest.JOURNAL_NAME
+    with open(journal, 'ab') as f:
+        f.write(b'{"path": "torn')  # as if killed mid-append
+
+    parsed = []
+    parse_pdf = registry.parse_pdf
+    monkeypatch.setattr(registry, 'parse_pdf', lambda name, src, **kw: parsed.append(src) or parse_pdf(name, src, **kw))
+    summary = _run(base_dir, capsys)
+
+    assert (summary['resumed'], summary['parsed'], summary['total']) == (2, 1, 3)
+    assert [os.path.basename(os.path.dirname(p)) for p in parsed] == ['msg2']
+    assert journal.read_bytes() == b''
+    exported = json.loads((base_dir / 'orders_parsed.json').read_text())
+    assert [o['messageId'] for o in exported['orders']] == ['msg0', 'msg1', 'msg2']
+    assert [o['total'] for o in exported['orders']] == [10.0, 11.0, 12.0]
+
+    again = _run(base_dir, capsys)
+    assert (again['parsed'], again['skipped'], again['resumed']) == (0, 3, 0)
+
+
+def test_backfill_reparses_only_changed_pdfs(base_dir, capsys):
+    _run(base_dir, capsys)
+    changed = base_dir / 'attachments' / 'blinkit' / 'msg1' / 'invoice.pdf'
+    changed.write_bytes(blinkit_invoice([('Other', '80.00', '0.00', '1', '80.00')], invoice_number='INV1'))
+    touched = base_dir / 'attachments' / 'blinkit' / 'msg2' / 'invoice.pdf'
+    os.utime(touched, ns=(1, 1))  # new mtime, same bytes: hashed, not parsed
+
+    summary = _run(base_dir, capsys)
+    assert (summary['parsed'], summary['skipped']) == (1, 2)
+    s = store.OrderStore(str(base_dir / store.FILE_NAME))
+    assert [o['total'] for o in s.query()] == [10.0, 80.0, 12.0]
+    s.close()
+
+
+@pytest.mark.parametrize('parser_id', ['ZEPTO_PDF_V1', 'BLINKIT_PDF_V1', 'ZOMATO_PDF_V1'])
+def test_limit_breach_is_an_error_event(parser_id):
+    [event] = orders.to_order_events(parser_id, {'ok': False, 'reason': 'timeout'}, 'm1', '/a.pdf')
+    assert event['parse_status'] == 'error'
+    assert event['parse_error'] == 'pdf limit: timeout'
+    assert orders.to_order_events('ZOMATO_PDF_V1', {'ok': False, 'reason': 'not_zomato'}, 'm1', '/a.pdf') == []
+
+
+def test_backfill_retries_pdfs_over_a_limit(base_dir, capsys, monkeypatch):
+    monkeypatch.setenv('HK_PDF_MAX_BYTES', '100')
+    summary = _run(base_dir, capsys)
+    assert (summary['parsed'], summary['errors']) == (3, 3)
+    # Nothing was recorded in the manifest, so all three are parsed again.
+    retry = _run(base_dir, capsys, '--no-limits')
+    assert (retry['parsed'], retry['errors']) == (3, 0)
+
+    monkeypatch.delenv('HK_PDF_MAX_BYTES')
+    again = _run(base_dir, capsys)
+    assert (again['parsed'], again['skipped'], again['errors']) == (0, 3, 0)
@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+import pytest
+
+from hk_pdf import money
+
+
+@pytest.mark.parametrize('text, paise', [
+    ('₹ 1,234.50', 123450),
+    ('Rs. 99', 9900),
+    ('INR 12.', 1200),
+    ('.5', 50),
+    ('+5.00', 500),
+    ('+ 5', 500),
+    ('-20.25', -2025),
+    ('- ₹ 7', -700),
+    ('0', 0),
+    (' 1,00,000.00 ', 10000000),
+])
+def test_to_paise_text(text, paise):
+    assert money.to_paise(text) == paise
+
+
+@pytest.mark.parametrize('text', [None, '', 'abc', '1.2.3', '5 -', '--5', '+-5', True, float('nan'), float('inf')])
+def test_to_paise_rejects(text):
+    assert money.to_paise(text) is None
+
+
+def test_search_takes_first_amount_and_ignores_its_sign():
+    assert money.to_paise('Total 40.00 incl. GST', search=True) == 4000
+    assert money.to_paise('Discount - 12.50 applied', search=True) == 1250
+    assert money.to_paise('Tip + 20', search=True) == 2000
+    assert money.to_paise('no amount here', search=True) is None
+
+
+@pytest.mark.parametrize('value, paise', [
+    ('12.345', 1235),
+    ('12.344', 1234),
+    ('12.3449', 1234),
+    ('-0.005', -1),
+    ('-12.345', -1235),
+    ('0.004', 0),
+    (0.1 + 0.2, 30),
+    (2.675, 268),         # str(2.675) is '2.675': rounded as printed, not as the binary float
+    (Decimal('1.005'), 101),
+    (7, 700),
+])
+def test_rounding_is_half_up_away_from_zero(value, paise):
+    assert money.ROUNDING == 'ROUND_HALF_UP'
+    assert money.to_paise(value) == paise
+
+
+def test_strict_refuses_sub_paisa_text():
+    assert money.to_paise('12.345', strict=True) is None
+    assert money.to_paise('12.340', strict=True) == 1234
+    assert money.to_paise('12.3', strict=True) == 1230
+    assert money.to_paise('+12.00', strict=True) == 1200
+    assert money.to_paise(0.1 + 0.2, strict=True) == 30
+
+
+def test_rupees_and_number():
+    assert money.rupees('1,234.5') == 1234.5
+    assert money.rupees('+3') == 3.0
+    assert money.to_rupees(None) is None
+    assert money.number('18.5') == 18.5
+    assert money.number('+2.5') == 2.5
+
+
+def test_total_is_exact():
+    assert money.total([10, None, 20]) == 30
+    assert money.total([None, None]) is None
+    assert money.total([]) is None
+    cents = [1] * 10 + [None]
+    assert money.to_rupees(money.total(cents)) == 0.1  # float sum of 0.01s would not be exactly 0.1
+
+
+def test_total_numpy_batches_match_python():
+    np = pytest.importorskip('numpy')
+    values = list(range(-3000, 3000, 3))
+    assert money.total(values * 3) == sum(values) * 3  # over NUMPY_MIN: numpy path
+    assert money.total(np.array(values, dtype=np.int64)) == sum(values)
+    assert money.total(np.array([], dtype=np.int64)) is None
+
+
+def test_with_paise_adds_twins_in_place():
+    out = money.with_paise({'name': 'x', 'total': 12.5, 'mrp': None, 'qty': 2}, ('total', 'mrp'))
+    assert list(out) == ['name', 'total', 'total_paise', 'mrp', 'mrp_paise', 'qty']
+    assert (out['total_paise'], out['mrp_paise']) == (1250, None)
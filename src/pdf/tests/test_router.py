@@ -0,0 +1,52 @@
+import pytest
+
+import parse_district_invoice
+import parse_swiggy_invoice
+from conftest import make_pdf
+from hk_pdf import router
+from hk_pdf.document import open_document
+
+
+def test_squash_ignores_spacing_and_case():
+    assert router.squash('Bundl  Technologies\nPvt') == 'bundltechnologiespvt'
+    assert router.squash(' Order\n ID ') == router.squash('order id')
+
+
+def test_marker_broken_across_lines_is_not_rejected():
+    pdf = make_pdf([[(40, 40, 'TAX'), (40, 60, 'INVOICE'), (40, 80, 'Total 100.00')]])
+    with open_document(pdf) as doc:
+        assert 'tax invoice' not in doc.fast_page_text(0).lower()
+        assert not router.quick_reject(doc, 'district', parse_district_invoice.MARKERS)
+
+
+def test_foreign_single_page_is_rejected():
+    pdf = make_pdf([[(40, 40, 'Terms and conditions'), (40, 60, 'Nothing to see here')]])
+    with open_document(pdf) as doc:
+        assert router.quick_reject(doc, 'district', parse_district_invoice.MARKERS)
+
+
+def test_other_merchant_on_page_one_rejects_a_long_pdf():
+    pdf = make_pdf([[(40, 40, 'Zepto Tax Invoice')], [(40, 40, 'more')]])
+    with open_document(pdf) as doc:
+        assert router.quick_reject(doc, 'swiggy', parse_swiggy_invoice.MARKERS)
+        assert not router.quick_reject(doc, 'zepto', ('zepto',))
+
+
+def test_fast_false_reads_page_one_with_pdfplumber(monkeypatch):
+    pdf = make_pdf([[(40, 40, 'Bundl'), (40, 60, 'Technologies')]])
+    with open_document(pdf) as doc:
+        def no_fast(i):
+            raise AssertionError('fast backend used')
+        monkeypatch.setattr(doc, 'fast_page_text', no_fast)
+        assert not router.quick_reject(doc, 'swiggy', parse_swiggy_invoice.MARKERS, fast=False)
+
+
+@pytest.mark.parametrize('words, expected', [
+    ([(40, 40, 'Swiggy'), (40, 60, 'Order'), (40, 80, 'ID: 1')], ['swiggy']),
+    ([(40, 40, 'Blinkit'), (40, 60, 'Zepto')], []),
+])
+def test_route(words, expected):
+    with open_document(make_pdf([words])) as doc:
+        fp = router.fingerprint(doc)
+        assert fp['invoice'] == bool(expected)
+        assert router.route(doc) == (expected[0] if expected else None)
@@ -0,0 +1,38 @@
+import parse_blinkit_invoice
+from conftest import blinkit_invoice
+from hk_pdf import schema
+
+
+def test_blinkit_result_round_trips():
+    pdf = blinkit_invoice([('Milk', '30.00', '2.00', '1', '28.00'), ('Eggs', '80.00', '0.00', '2', '160.00')])
+    rec = schema.canonical('blinkit', parse_blinkit_invoice.parse(pdf))
+    assert rec['schema'] == schema.SCHEMA_VERSION and rec['ok']
+    [inv] = rec['invoices']
+    assert inv['merchant'] == 'BLINKIT'
+    assert inv['invoice_date'] == '2026-01-12'
+    assert inv['total_paise'] == 18800
+    assert [(it['name'], it['qty'], it['amount_paise'], it['mrp_paise']) for it in inv['items']] == [
+        ('Milk', 1, 2800, 3000), ('Eggs', 2, 16000, 8000)]
+    assert schema.to_record(schema.from_record(rec)) == rec
+
+
+def test_failure_passes_its_reason_through():
+    assert schema.canonical('zepto', {'ok': False, 'reason': 'timeout'}) == {
+        'schema': schema.SCHEMA_VERSION, 'ok': False, 'reason': 'timeout', 'invoices': []}
+    assert schema.from_result('zepto', {'ok': False}) == []
+
+
+def test_text_result_without_figures_is_no_invoice():
+    assert schema.from_result('zomato', {'order_id': '1', 'total': None, 'items': []}) == []
+    [inv] = schema.from_result('eatclub', {'tracking_id': 'EC1', 'total': 12.5, 'total_paise': 1250, 'items': [
+        {'name': 'Pizza', 'qty': 1, 'amount': 12.5}]})
+    assert (inv.merchant, inv.order_id, inv.total_paise) == ('EATCLUB', 'EC1', 1250)
+    assert inv.items[0].amount_paise == 1250
+
+
+def test_from_event_prefers_paise_twins():
+    [inv] = schema.from_event({'merchant': 'SWIGGY', 'order_id': '9', 'total': 10.0, 'total_paise': 1001,
+                               'items': [{'name': 'Dosa', 'qty': 1, 'amount': 10.0}, 'junk']})
+    assert inv.total_paise == 1001
+    assert [it.name for it in inv.items] == ['Dosa']
+    assert schema.from_event({'merchant': 'SWIGGY', 'parse_status': 'failed'}) == []
@@ -0,0 +1,107 @@
+import io
+import json
+
+import pytest
+
+from hk_pdf import orders, store
+
+ZEPTO = {
+    'merchant': 'ZEPTO', 'parse_status': 'ok', 'messageId': 'm1', 'pdfPath': '/a/zepto/m1/inv.pdf',
+    'order_id': 'ZP1', 'invoice_number': 'INV-1', 'invoice_date': '2026-01-12', 'invoice_date_ms': 1768156200000,
+    'total': 220.0, 'total_paise': 22000, 'items': [{'name': 'Amul Milk', 'qty': 1, 'total': 51.0}],
+}
+SWIGGY = {
+    'merchant': 'SWIGGY', 'parse_status': 'ok', 'messageId': 'm2', 'order_id': 'SW9',
+    'invoice_date': '2026-02-03', 'total': 99.5, 'items': [{'name': 'Dosa', 'qty': 2, 'amount': 99.5}],
+    'internalDateMs': 1770000000000,
+}
+FAILED = {'merchant': 'BLINKIT', 'parse_status': 'error', 'messageId': 'm3', 'parse_error': 'boom'}
+
+
+@pytest.fixture
+def order_store(tmp_path):
+    s = store.OrderStore(str(tmp_path / store.FILE_NAME))
+    yield s
+    s.close()
+
+
+def test_export_matches_merge_orders(tmp_path, order_store):
+    first, second = [ZEPTO, SWIGGY], [FAILED, dict(SWIGGY, total=100.0)]
+    order_store.ingest(first, unknown=[{'messageId': 'u1'}])
+    order_store.ingest(second)
+
+    merged = str(tmp_path / 'merged.json')
+    orders.merge_orders(merged, first, unknown=[{'messageId': 'u1'}])
+    orders.merge_orders(merged, second)
+    exported = str(tmp_path / 'orders_parsed.json')
+    order_store.export_json(exported)
+
+    with open(merged) as a, open(exported) as b:
+        assert json.load(a) == json.load(b)
+
+
+def test_upsert_keeps_position_and_internal_date(order_store):
+    order_store.ingest([SWIGGY, ZEPTO])
+    res = order_store.ingest([{k: v for k, v in SWIGGY.items() if k != 'internalDateMs'}])
+    assert res == {'added': 0, 'updated': 1}
+    got = order_store.query()
+    assert [o['messageId'] for o in got] == ['m2', 'm1']
+    assert got[0]['internalDateMs'] == SWIGGY['internalDateMs']
+    assert order_store.count() == 2
+
+
+def test_query_filters(order_store):
+    order_store.ingest([ZEPTO, SWIGGY, FAILED])
+    assert [o['messageId'] for o in order_store.query(merchants=['zepto'])] == ['m1']
+    assert [o['messageId'] for o in order_store.query(date_from='2026-02-01', date_to='2026-02-28')] == ['m2', 'm3']
+    assert [o['messageId'] for o in order_store.query(invoice_number='INV-1')] == ['m1']
+    assert [o['messageId'] for o in order_store.query(total_paise=9950)] == ['m2']
+
+
+def test_seed_imports_only_a_changed_json(tmp_path, order_store):
+    seed = tmp_path / 'orders_parsed.json'
+    seed.write_text(json.dumps({'ok': True, 'orders': [ZEPTO], 'unknown': [{'messageId': 'u0'}]}))
+    assert order_store.seed(str(seed)) == {'added': 1, 'updated': 0}
+    assert order_store.seed(str(seed)) is None
+    assert order_store.seed(str(tmp_path / 'missing.json')) is None
+
+    # Our own export is not imported back.
+    order_store.ingest([SWIGGY])
+    order_store.export_json(str(seed))
+    assert order_store.seed(str(seed)) is None
+
+    # Written while the store was off (HK_PDF_STORE=0): imported, nothing dropped by the next export.
+    doc = json.loads(seed.read_text())
+    doc['orders'].append(FAILED)
+    doc['unknown'].append({'messageId': 'u9'})
+    seed.write_text(json.dumps(doc))
+    assert order_store.seed(str(seed)) == {'added': 1, 'updated': 2}
+    order_store.export_json(str(seed))
+    assert [o['messageId'] for o in json.loads(seed.read_text())['orders']] == ['m1', 'm2', 'm3']
+    assert order_store.unknown() == [{'messageId': 'u0'}, {'messageId': 'u9'}]
+
+
+def test_unknown_replace_or_merge(order_store):
+    order_store.ingest([], unknown=[{'messageId': 'u0'}, {'messageId': 'u1'}])
+    order_store.ingest([], unknown=[{'messageId': 'u2'}, {'messageId': 'u0', 'error': 'again'}], merge=True)
+    assert order_store.unknown() == [{'messageId': 'u0', 'error': 'again'}, {'messageId': 'u1'}, {'messageId': 'u2'}]
+    order_store.ingest([])
+    assert len(order_store.unknown()) == 3
+    order_store.ingest([], unknown=[])
+    assert order_store.unknown() == []
+
+
+def test_cli_ingest_exports_by_default(tmp_path, monkeypatch, capsys):
+    monkeypatch.delenv('HK_PDF_STORE', raising=False)
+    out_json = tmp_path / 'orders_parsed.json'
+
+    monkeypatch.setattr('sys.stdin', io.StringIO(json.dumps(ZEPTO) + '\n'))
+    assert store.main(['--base-dir', str(tmp_path), 'ingest', '--no-export']) == 0
+    assert not out_json.exists()
+    capsys.readouterr()
+
+    monkeypatch.setattr('sys.stdin', io.StringIO(json.dumps(SWIGGY) + '\n' + json.dumps({'unknown': []}) + '\n'))
+    assert store.main(['--base-dir', str(tmp_path), 'ingest']) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert summary['exported'] == str(out_json)
+    assert [o['messageId'] for o in json.loads(out_json.read_text())['orders']] == ['m1', 'm2']
@@ -0,0 +1,68 @@
+import json
+
+import pdfplumber.page
+import pytest
+
+import parse_blinkit_invoice
+from conftest import blinkit_invoice
+from hk_pdf import templates
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    path = tmp_path / 'pdf_layout_templates.json'
+    monkeypatch.setenv('HK_PDF_TEMPLATES', str(path))
+    templates.configure()
+    return path
+
+
+@pytest.fixture
+def finder_calls(monkeypatch):
+    calls = []
+    find_tables = pdfplumber.page.Page.find_tables
+
+    def counting(self, *args, **kwargs):
+        calls.append(self.page_number)
+        return find_tables(self, *args, **kwargs)
+
+    monkeypatch.setattr(pdfplumber.page.Page, 'find_tables', counting)
+    return calls
+
+
+MILK = ('Amul Taaza Toned Milk', '30.00', '2.00', '1', '28.00')
+EGGS = ('Farm Eggs 6 pcs', '60.00', '0.00', '2', '120.00')
+ATTA = ('Aashirvaad Atta 5 kg', '300.00', '25.00', '1', '275.00')
+
+
+def test_same_layout_shares_one_template(store_path, finder_calls):
+    first = parse_blinkit_invoice.parse(blinkit_invoice([MILK, EGGS]))
+    assert len(finder_calls) == 1
+
+    second_pdf = blinkit_invoice([ATTA, EGGS, MILK], invoice_number='INV002')
+    second = parse_blinkit_invoice.parse(second_pdf)
+    assert len(finder_calls) == 1, 'known layout must skip the table finder'
+
+    saved = json.loads(store_path.read_text())
+    assert saved['version'] == templates.FILE_VERSION
+    assert len(saved['templates']) == 1
+    (tpl,) = saved['templates'].values()
+    assert tpl['header'] == ['Sr. no', 'Item Description', 'MRP', 'Discount', 'Qty', 'Total']
+
+    assert first['overall_total_paise'] == 14800
+    assert [it['name'] for it in second['invoices'][0]['items']] == [ATTA[0], EGGS[0], MILK[0]]
+    assert second['overall_total_paise'] == 42300
+
+
+def test_template_output_matches_table_finder(store_path, monkeypatch):
+    parse_blinkit_invoice.parse(blinkit_invoice([MILK]))
+    pdf = blinkit_invoice([ATTA, EGGS], invoice_number='INV003')
+    via_template = parse_blinkit_invoice.parse(pdf)
+
+    monkeypatch.setenv('HK_PDF_TEMPLATES', '0')
+    templates.configure()
+    assert parse_blinkit_invoice.parse(pdf) == via_template
+
+
+def test_other_file_versions_are_ignored(store_path):
+    store_path.write_text(json.dumps({'version': 1, 'templates': {'blinkit:stale': {'cols': [0, 1]}}}))
+    assert len(templates.TemplateStore(str(store_path))) == 0
@@ -0,0 +1,87 @@
+import pytest
+
+import parse_blinkit_invoice
+from conftest import blinkit_invoice
+from hk_pdf import validate
+
+
+def test_matching_total_is_full_confidence():
+    v = validate.validate([100.0, 260.0], total=375.0, fees=[15.0])
+    assert v['confidence'] == 1.0
+    assert (v['items_paise'], v['fees_paise']) == (36000, 1500)
+    assert v['discrepancies'] == []
+
+
+def test_float_sums_do_not_drift():
+    # 0.1 + 0.2 != 0.3 in floats; in paise it is exact.
+    v = validate.validate([0.1, 0.2], item_total=0.3)
+    assert v['items_paise'] == 30
+    assert v['confidence'] == 1.0
+
+
+def test_mismatch_is_reported_in_paise():
+    v = validate.validate([100.0, 200.0], total=375.0)
+    assert v['confidence'] == 0.0
+    assert v['discrepancies'] == [{'check': 'total', 'ok': False, 'expected_paise': 37500,
+                                   'actual_paise': 30000, 'diff_paise': -7500}]
+
+
+def test_tolerance_and_partial_totals():
+    assert validate.validate([100.0], total=101.0)['confidence'] == 1.0
+    assert validate.validate([100.0], total=101.01)['confidence'] == 0.0
+    v = validate.validate([100.0], total=150.0, partial=True)
+    assert v['confidence'] == validate.PARTIAL_SCORE
+    assert v['discrepancies'][0]['ok']
+    assert validate.validate([200.0], total=150.0, partial=True)['confidence'] == 0.0
+
+
+def test_discounts_and_item_tax():
+    v = validate.validate([90.0], gross=[100.0], line_discounts=[10.0],
+                          lines=[('Milk', 90.0, 85.72, (2.14, 2.14, None))])
+    assert v['confidence'] == 1.0
+    assert v['discounts_paise'] == 1000
+    assert v['taxes_paise'] == 428
+    bad = validate.validate([90.0], lines=[('Milk', 90.0, 80.0, (2.14, 2.14, None))])
+    assert bad['confidence'] == 0.0
+    assert bad['discrepancies'][0]['bad_lines'] == ['Milk']
+
+
+def test_unchecked_missing_and_notes():
+    assert validate.validate([10.0])['confidence'] == validate.UNCHECKED
+    assert validate.validate([])['confidence'] == 0.0
+    assert validate.validate([10.0], notes=['fallback', 'another'])['confidence'] == validate.UNCHECKED
+    v = validate.validate([10.0, None], total=10.0, notes=['fallback'])
+    assert v['notes'] == ['fallback', '1 item(s) without an amount']
+    assert v['confidence'] == round(validate.NOTE_PENALTY ** 2, 2)
+
+
+def test_combine_keeps_the_weakest():
+    a = validate.validate([10.0], total=10.0)
+    b = validate.validate([10.0], total=20.0)
+    c = validate.combine([a, b, None])
+    assert c['confidence'] == 0.0
+    assert c['items_paise'] == 2000
+    assert [d['invoice'] for d in c['discrepancies']] == [1]
+    assert validate.combine([])['confidence'] == 0.0
+
+
+def test_reconciles():
+    assert validate.reconciles([100.0, 50.0], item_total=150.0)
+    assert validate.reconciles([100.0, 50.0], fees=[10.0], total=160.0)
+    assert not validate.reconciles([100.0, None], item_total=100.0)
+    assert not validate.reconciles([], total=0)
+
+
+@pytest.mark.parametrize('item, confidence', [
+    (('Milk', '30.00', '0.00', '1', '30.00'), 0.8),  # the discounts check still runs
+    (('Milk', '', '', '1', '30.00'), validate.UNCHECKED),  # nothing to check
+])
+def test_blinkit_without_total_row_stays_at_or_above_the_threshold(item, confidence):
+    # No Total row is no reason to drop the invoice below the consumers'
+    # default --min-confidence (LOW_CONFIDENCE).
+    out = parse_blinkit_invoice.parse(blinkit_invoice([item], total_row=False))
+    [inv] = out['invoices']
+    assert inv['invoice_total_paise'] == 3000
+    assert inv['validation']['notes'] == ['no Total row; invoice_total is the item sum']
+    assert inv['validation']['confidence'] == confidence
+    assert out['validation']['confidence'] >= validate.LOW_CONFIDENCE
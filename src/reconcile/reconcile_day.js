@@ -2,13 +2,15 @@
 /* Reconcile a day (IST) across:
  * - Hisab entries (hisab/YYYY-MM-DD.txt -> hisab_entries/YYYY-MM-DD.json)
  * - Payment events (payments_parsed.json)
- * - Orders/events (orders_parsed.json)
+ * - Orders/events (orders_parsed.json, via the order store when there is one)
  *
  * v1 goals:
  * - Match hisab entries to payments (amount + source hint)
  * - Match payments to orders (amount + date window)
  * - Flag missing hisab entries (payments with no hisab)
  * - Flag unmatched orders (orders with no payment yet; likely COD or delayed)
+ * - Keep PDF invoices whose arithmetic does not check out (validation.confidence below
+ *   --min-confidence, from hk_pdf/validate.py) out of matching; they are listed separately
  *
  * Usage:
  *   node src/reconcile/reconcile_day.js --base-dir ~/HisabKitab --date YYYY-MM-DD
@@ -18,6 +20,7 @@ const fs = require('fs');
 const path = require('path');
 const os = require('os');
 const { DateTime } = require('luxon');
+const { loadOrders } = require('../pdf/order_store');
 
 const IST = 'Asia/Kolkata';
 
@@ -41,6 +44,7 @@ function parseArgs(argv){
     orderTol: Number(get('--order-tol') || 10),
     orderWindowDays: Number(get('--order-window-days') || 7),
     maxOrderPaymentGapDays: Number(get('--max-order-payment-gap-days') || 5),
+    minConfidence: Number(get('--min-confidence') || 0.5),
     // sources that may not have any payment email trail (manual-only)
     nonVerifiableSources: (get('--non-verifiable-sources') || 'SBI,mk').split(',').map(s=>s.trim()).filter(Boolean)
   };
@@ -50,10 +54,34 @@ function amtClose(a,b,tol){
   return Math.abs(Number(a) - Number(b)) <= tol;
 }
 
+// Integer paise: PDF orders carry exact *_paise fields (hk_pdf/money.py); other amounts are rounded once.
+function toPaise(x){
+  return Math.round(Number(x) * 100);
+}
+
+function orderPaise(o){
+  return o.total_paise ?? toPaise(o.total);
+}
+
+// Orders without a validation (email parsers) are taken as they are.
+function lowConfidence(order, minConfidence){
+  const c = order.validation?.confidence;
+  return c != null && Number(c) < minConfidence;
+}
+
+// PDF parsers emit invoice_date_ms (midnight IST, hk_pdf/dates.py); older records and
+// email parsers only have a date string, parsed through Luxon once per distinct string.
+const dateMsMemo = new Map();
+
 function parseOrderDateMs(order){
+  if(order.invoice_date_ms != null) return Number(order.invoice_date_ms);
   const s = order.invoice_date || order.date || '';
   if(!s) return null;
+  if(!dateMsMemo.has(s)) dateMsMemo.set(s, parseDateMs(s));
+  return dateMsMemo.get(s);
+}
 
+function parseDateMs(s){
   // Zepto: 15-04-2025
   let dt = DateTime.fromFormat(s, 'dd-MM-yyyy', { zone: IST });
   if(dt.isValid) return dt.toMillis();
@@ -77,7 +105,7 @@ function paymentSourceMatchesHint(payment, sourceHint){
 }
 
 function main(){
-  const { baseDir, date, payTol, payWindowDays, orderTol, orderWindowDays, maxOrderPaymentGapDays, nonVerifiableSources } = parseArgs(process.argv);
+  const { baseDir, date, payTol, payWindowDays, orderTol, orderWindowDays, maxOrderPaymentGapDays, minConfidence, nonVerifiableSources } = parseArgs(process.argv);
   if(!date){
     console.error('Usage: node reconcile_day.js --date YYYY-MM-DD [--base-dir ~/HisabKitab]');
     process.exit(2);
@@ -97,7 +125,11 @@ function main(){
   const hisab = readJsonSafe(hisabJsonPath, { entries: [], errors: [{ error: 'missing hisab_entries json', file: hisabJsonPath }] });
 
   const paymentsDoc = readJsonSafe(path.join(baseDir, 'payments_parsed.json'), { payments: [], unknown: [] });
-  const ordersDoc = readJsonSafe(path.join(baseDir, 'orders_parsed.json'), { orders: [], unknown: [] });
+  // Only orders the invoice-date window below can pick (the store narrows by date; the file is read whole).
+  const ordersDoc = loadOrders(baseDir, {
+    from: dayStart.minus({ days: orderWindowDays }).toISODate(),
+    to: dayStart.plus({ days: orderWindowDays }).toISODate(),
+  }) || { orders: [], unknown: [] };
 
   const payments = paymentsDoc.payments || [];
   const orders = ordersDoc.orders || [];
@@ -119,10 +151,14 @@ function main(){
   // Orders near this day (invoice date window)
   const winStart = dayStart.minus({ days: orderWindowDays });
   const winEnd = dayEnd.plus({ days: orderWindowDays });
-  const ordWin = orders.filter(o => {
+  const ordInWin = orders.filter(o => {
     const ms = parseOrderDateMs(o);
     return ms != null && ms >= winStart.toMillis() && ms <= winEnd.toMillis();
   });
+  const ordWin = ordInWin.filter(o => !lowConfidence(o, minConfidence));
+  const lowConfidenceOrders = ordInWin
+    .filter(o => lowConfidence(o, minConfidence))
+    .map(o => ({ merchant: o.merchant, invoice_date: o.invoice_date, order_id: o.order_id, invoice_number: o.invoice_number, total: o.total, confidence: o.validation.confidence }));
 
   // 1) Match hisab entries -> payments (cross-day window)
   const hisabToPayment = [];
@@ -180,20 +216,23 @@ function main(){
     if(o.total == null) continue;
     const oMs = parseOrderDateMs(o);
 
+    const oPaise = orderPaise(o);
     const candidates = payWin
       .filter(p => p.amount != null && amtClose(p.amount, o.total, orderTol))
       .map(p => ({
         p,
+        exact: toPaise(p.amount) === oPaise,
         dist: (oMs != null && p.internalDateMs != null) ? Math.abs(Number(p.internalDateMs) - oMs) : null
       }))
       .filter(x => x.dist == null || x.dist <= maxGapMs)
-      .sort((a,b)=>(a.dist ?? 0) - (b.dist ?? 0));
+      // exact amounts first, then nearest in time
+      .sort((a,b)=>(b.exact - a.exact) || ((a.dist ?? 0) - (b.dist ?? 0)));
 
     const picked = candidates.find(x => !usedPaymentForOrder.has(x.p.messageId)) || null;
     if(!picked) continue;
 
     usedPaymentForOrder.add(picked.p.messageId);
-    paymentToOrder.push({ payment: picked.p, order: o, confidence: 'amount+cross_day_window+gap' });
+    paymentToOrder.push({ payment: picked.p, order: o, confidence: picked.exact ? 'exact_amount+cross_day_window+gap' : 'amount+cross_day_window+gap' });
   }
 
   // Orders in window not linked to any payment (possible COD or payment via non-verifiable source)
@@ -206,14 +245,15 @@ function main(){
     ok: true,
     date,
     payments_in_day: payDay.length,
-    orders_in_window: ordWin.length,
+    orders_in_window: ordInWin.length,
     hisab_entries: (hisab.entries || []).length,
     matched_hisab_payments: hisabToPayment.length,
     matched_payment_orders: paymentToOrder.length,
     unmatchedPayments: unmatchedPayments.map(p => ({ source: p.source, amount: p.amount, subject: p.subject })),
     unmatchedHisab: unmatchedHisab.map(h => ({ amount: h.amount, raw: h.raw, source_hint: h.source_hint })),
     manualOnlyHisab: manualOnlyHisab.map(h => ({ amount: h.amount, raw: h.raw, source_hint: h.source_hint })),
-    unmatchedOrders
+    unmatchedOrders,
+    lowConfidenceOrders
   };
 
   const outPath = path.join(baseDir, 'reconcile', `${date}.json`);
@@ -253,6 +293,12 @@ function main(){
     lines.push('');
   }
 
+  if(report.lowConfidenceOrders.length){
+    lines.push(`Invoices whose items do not add up (confidence < ${minConfidence}; not matched):`);
+    for(const o of report.lowConfidenceOrders.slice(0, 30)) lines.push(`- ${o.merchant} ${o.total} :: ${o.invoice_number||o.order_id||''} (${o.invoice_date||''}) confidence ${o.confidence}`);
+    lines.push('');
+  }
+
   const txtPath = path.join(baseDir, 'reconcile', `${date}.txt`);
   fs.writeFileSync(txtPath, lines.join('\n') + '\n', 'utf8');
 
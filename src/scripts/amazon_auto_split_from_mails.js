@@ -19,6 +19,7 @@ Notes:
 const fs = require('node:fs');
 const path = require('node:path');
 const XLSX = require('xlsx');
+const { loadOrders } = require('../pdf/order_store');
 
 function getArg(args, name) {
   const i = args.indexOf(name);
@@ -51,7 +52,7 @@ function daysBetween(a,b){
 }
 
 function buildAmazonOrdersIndex(baseDir){
-  const ordersDoc = readJson(path.join(baseDir,'orders_parsed.json'), { orders: [] });
+  const ordersDoc = loadOrders(baseDir, { merchants: ['AMAZON'] }) || { orders: [] };
   const all = Array.isArray(ordersDoc.orders) ? ordersDoc.orders : [];
   const amazon = all
     .filter(o => String(o?.merchant||'').toUpperCase()==='AMAZON')